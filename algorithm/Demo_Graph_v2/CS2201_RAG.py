@@ -1,6 +1,8 @@
 import time
 
 from graph_database import GraphData
+from fulltext_index import ensure_fulltext_indexes
+from schema_snapshot import refresh_snapshot as refresh_schema_snapshot
 from module import QueryRewriter, CypherGenerator, CypherQuerier, Formatter, AnswerGenerator
 
 
@@ -18,12 +20,34 @@ class CS2201_RAG:
                         user=neo4j_config.username,
                         password=neo4j_config.password)
         
+        self.__refresh_schema_snapshot()
         self.query_rewriter = QueryRewriter()
-        self.cypher_generator = CypherGenerator()
+        self.cypher_generator = CypherGenerator(mode=self.__init_search_mode())
         self.cypher_querier = CypherQuerier(graph = self.graph)
         self.formatter = Formatter()
         self.answer_generator = AnswerGenerator()
         
+    def __refresh_schema_snapshot(self):
+        """ 图谱计数指纹变化时重新生成模式快照, 失败时沿用已有快照或内置模式
+        """
+        try:
+            snapshot = refresh_schema_snapshot(self.graph)
+            print(f"[DEBUG] 图谱模式快照版本 {snapshot['version']}")
+        except Exception as e:
+            print(f"[ERROR] 刷新图谱模式快照失败: {str(e)}")
+
+    def __init_search_mode(self):
+        """ 全文索引模式下创建索引, 创建失败时退回UNWIND查询
+        """
+        mode = getattr(neo4j_config, 'search_mode', 'unwind')
+        if mode == 'fulltext':
+            try:
+                ensure_fulltext_indexes(self.graph)
+            except Exception as e:
+                print(f"[ERROR] 创建全文索引失败, 使用UNWIND查询: {str(e)}")
+                mode = 'unwind'
+        return mode
+
     def chat(self, query, stream='no'):
         """ 对话
 
@@ -111,6 +135,13 @@ class CS2201_RAG:
         """
         self.cypher_generator.change_limit(limit=limit)
 
+    def graph_stats(self, refresh=False):
+        """ 图谱统计信息（各标签节点数、各关系类型关系数）
+
+        refresh: 是否忽略缓存重新查询
+        """
+        return self.cypher_querier.database_stats(refresh=refresh)
+
     def process_query(self, question):
         try:
             # 执行查询
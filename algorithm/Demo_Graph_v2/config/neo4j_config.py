@@ -6,3 +6,7 @@ username = "你的neo4j用户名"
 
 password = "你的neo4j密码"
 
+
+# 图谱检索方式: "unwind" 所有关键词作为参数一次查询; "contains" 逐个关键词生成CONTAINS语句;
+# "fulltext" 使用全文索引（启动时自动创建，见fulltext_index.py）
+search_mode = "unwind"
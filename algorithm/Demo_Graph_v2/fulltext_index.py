@@ -0,0 +1,190 @@
+"""
+knowledgePoint / values 节点的全文索引
+
+默认的查询语句用 toLower(n.name) CONTAINS '...' 过滤，Neo4j无法用索引加速，
+每个关键词都要扫描整个标签的节点，耗时随图谱规模线性增长。
+全文索引模式（neo4j_config.search_mode = "fulltext"）：
+- 启动时创建 knowledgePoint.name 和 values.name 的全文索引（cjk分词器，中文按二元组切分，IF NOT EXISTS）
+- 所有关键词合并为一个Lucene查询，每个索引只查一次（db.index.fulltext.queryNodes），
+  结果带相关度score，按score从高到低返回
+
+命令行：
+    python fulltext_index.py create                                # 创建索引并等待索引构建完成
+    python fulltext_index.py benchmark --sizes 1000,10000,100000    # CONTAINS扫描与全文索引的规模对比
+"""
+import argparse
+import random
+import re
+import time
+
+# 标签 -> 全文索引名
+FULLTEXT_INDEXES = {
+    "knowledgePoint": "knowledgePointName",
+    "values": "valuesName",
+}
+ANALYZER = "cjk"
+
+_LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+
+def create_index_statements(indexes=None, analyzer=ANALYZER):
+    statements = []
+    for label, index_name in (indexes or FULLTEXT_INDEXES).items():
+        statements.append(
+            f"CREATE FULLTEXT INDEX {index_name} IF NOT EXISTS FOR (n:{label}) ON EACH [n.name] "
+            f"OPTIONS {{indexConfig: {{`fulltext.analyzer`: '{analyzer}'}}}}"
+        )
+    return statements
+
+
+def ensure_fulltext_indexes(graph, indexes=None, wait_seconds=300):
+    """创建全文索引（已存在时跳过）并等待索引可用
+
+    graph: GraphData
+    """
+    for statement in create_index_statements(indexes):
+        graph.execute_query(statement)
+    graph.execute_query(f"CALL db.awaitIndexes({int(wait_seconds)})")
+
+
+def lucene_query(keywords):
+    """关键词转为Lucene查询串（转义特殊字符，多个关键词为OR关系）；没有关键词时返回空字符串"""
+    terms = [_LUCENE_SPECIAL.sub(r"\\\1", k.strip()) for k in keywords if k and k.strip()]
+    return " ".join(f'"{t}"' if " " in t else t for t in terms)
+
+
+def fulltext_cyphers(keywords, limit=10, indexes=None):
+    """生成全文索引查询语句：知识点名称和内容各一条，返回 knowledge_point, content, score
+
+    return: [(cypher语句, 参数)]；Lucene查询串和limit作为参数传入，语句只随索引名变化，
+        不同问题复用同一个查询计划
+    """
+    query = lucene_query(keywords)
+    if not query:
+        return []
+    indexes = indexes or FULLTEXT_INDEXES
+    params = {"query": query, "limit": limit}
+    kp_index, values_index = indexes["knowledgePoint"], indexes["values"]
+    return [
+        (f"""
+            CALL db.index.fulltext.queryNodes('{kp_index}', $query) YIELD node AS n, score
+            MATCH (n)-[:values]->(v)
+            RETURN n.name as knowledge_point, v.name as content, score
+            ORDER BY score DESC
+            LIMIT $limit
+            """, params),
+        (f"""
+            CALL db.index.fulltext.queryNodes('{values_index}', $query) YIELD node AS v, score
+            MATCH (n)-[:values]->(v)
+            RETURN n.name as knowledge_point, v.name as content, score
+            ORDER BY score DESC
+            LIMIT $limit
+            """, params),
+    ]
+
+
+# ---------------- 基准：不同规模图谱上的CONTAINS扫描与全文索引 ----------------
+
+BENCH_INDEXES = {"BenchKnowledgePoint": "benchKnowledgePointName", "BenchValues": "benchValuesName"}
+_BENCH_TERMS = ("枚举", "接口", "继承", "多态", "封装", "泛型", "异常", "线程", "集合", "反射",
+                "注解", "流", "数组", "字符串", "类", "对象", "方法", "变量", "循环", "递归")
+
+
+def contains_cyphers(keyword, limit=10, kp_label="knowledgePoint"):
+    """与CypherGenerator的contains模式相同的一对CONTAINS查询（按知识点名称、按内容）"""
+    return [f"""
+            MATCH (n:{kp_label})-[:values]->(v)
+            WHERE toLower({field}.name) CONTAINS '{keyword}'
+            RETURN n.name as knowledge_point, v.name as content
+            LIMIT {limit}
+            """ for field in ("n", "v")]
+
+
+def _populate(graph, start, stop, batch=5000):
+    """补足到stop个知识点（已有start个），每个知识点一个values节点；名称由随机术语拼成，后缀编号保证唯一"""
+    for begin in range(start, stop, batch):
+        rng = random.Random(begin)
+        rows = [{"name": "".join(rng.sample(_BENCH_TERMS, 2)) + str(i),
+                 "content": "".join(rng.sample(_BENCH_TERMS, 4)) + str(i)}
+                for i in range(begin, min(stop, begin + batch))]
+        graph.execute_query(
+            "UNWIND $rows AS row "
+            "CREATE (:BenchKnowledgePoint {name: row.name})-[:values]->(:BenchValues {name: row.content})",
+            {"rows": rows})
+
+
+def _clear(graph):
+    for index_name in BENCH_INDEXES.values():
+        graph.execute_query(f"DROP INDEX {index_name} IF EXISTS")
+    for label in BENCH_INDEXES:
+        while graph.execute_query(
+                f"MATCH (n:{label}) WITH n LIMIT 10000 DETACH DELETE n RETURN count(*) AS deleted")[0]["deleted"]:
+            pass
+
+
+def _median_ms(graph, statements, repeat):
+    statements = [s if isinstance(s, tuple) else (s, None) for s in statements]
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for statement, params in statements:
+            graph.execute_query(statement, params)
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def benchmark(graph, sizes, keywords, limit=10, repeat=5):
+    """在BenchKnowledgePoint/BenchValues标签上逐级扩大图谱，比较两种方式查询全部关键词的耗时（中位数）"""
+    bench_indexes = dict(zip(("knowledgePoint", "values"), BENCH_INDEXES.values()))
+    results = []
+    _clear(graph)
+    try:
+        populated = 0
+        for size in sorted(sizes):
+            _populate(graph, populated, size)
+            populated = size
+            ensure_fulltext_indexes(graph, BENCH_INDEXES)
+            contains = [c for k in keywords for c in contains_cyphers(k.lower(), limit, "BenchKnowledgePoint")]
+            fulltext = fulltext_cyphers(keywords, limit, bench_indexes)
+            # 预热一次，排除查询计划编译
+            _median_ms(graph, contains + fulltext, 1)
+            results.append({
+                "size": size,
+                "contains_ms": round(_median_ms(graph, contains, repeat), 2),
+                "fulltext_ms": round(_median_ms(graph, fulltext, repeat), 2),
+            })
+            print(f"{size:>9} 个知识点  CONTAINS: {results[-1]['contains_ms']:>9.2f} ms"
+                  f"  全文索引: {results[-1]['fulltext_ms']:>9.2f} ms")
+    finally:
+        _clear(graph)
+    return results
+
+
+def main():
+    from config import neo4j_config
+    from graph_database import GraphData
+
+    parser = argparse.ArgumentParser(description="knowledgePoint/values全文索引")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("create", help="创建全文索引")
+    bench = sub.add_parser("benchmark", help="CONTAINS扫描与全文索引的规模对比（使用独立的Bench*标签，结束后删除）")
+    bench.add_argument("--sizes", default="1000,10000,100000", help="知识点数量，逗号分隔")
+    bench.add_argument("--keywords", default="枚举,接口,多态", help="查询关键词，逗号分隔")
+    bench.add_argument("--limit", type=int, default=10)
+    bench.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    graph = GraphData(uri=neo4j_config.url, user=neo4j_config.username, password=neo4j_config.password)
+    try:
+        if args.command == "create":
+            ensure_fulltext_indexes(graph)
+            print("全文索引已就绪:", ", ".join(FULLTEXT_INDEXES.values()))
+        else:
+            benchmark(graph, [int(s) for s in args.sizes.split(",")], args.keywords.split(","),
+                      args.limit, args.repeat)
+    finally:
+        graph.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ class GraphData:
         user: 用户名
         password: 密码
         """
+        self.uri = uri
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
 
     def close(self):
@@ -36,7 +37,7 @@ class GraphData:
         return result.data()
     
 
-     #获取图schema，该项目实际不跑该代码，需要用户自己根据readme.md中的说明生成schema
+     #获取图schema，由schema_snapshot.py在图谱计数变化时调用并保存为快照
     def schema_text(self,node_props, rel_props, rels) -> str:
         return f"""
                 This is the schema representation of the Neo4j database.
@@ -53,7 +54,7 @@ class GraphData:
     ) -> str:
         """获取图schema
         """
-        #获取图schema，该项目实际不跑该代码，需要用户自己根据readme.md中的说明生成schema
+        #获取图schema，由schema_snapshot.py在图谱计数变化时调用并保存为快照
         print("loading graph schema")
 
         node_props = [el["output"] for el in self.execute_query(node_properties_query)]
@@ -91,16 +92,15 @@ RETURN "(:" + label + ")-[:" + property + "]->(:" + toString(other[0]) + ")" AS
 
 if __name__ == '__main__':
     '''
-    运行以生成图谱schema
+    运行以生成图谱schema并保存为模式快照（prompt.py从快照读取）
     '''
+    from schema_snapshot import SNAPSHOT_FILE, refresh_snapshot
+
     graph = GraphData(uri=neo4j_config.url,
                       user=neo4j_config.username,
                       password=neo4j_config.password)
     
-    print(graph.get_schema())
+    print(refresh_snapshot(graph, force=True)["schema"])
+    print("已保存到", SNAPSHOT_FILE)
 
     graph.close()
-
-
- 
-
@@ -0,0 +1,106 @@
+"""
+图谱统计信息（各标签的节点数、各关系类型的关系数）
+
+只查询计数，MATCH (n:`标签`) RETURN count(n) 和 MATCH ()-[r:`类型`]->() RETURN count(r)
+由Neo4j的计数存储直接给出，不扫描节点，耗时与图谱规模无关。
+结果按数据库地址缓存到本地文件（graph_cache/graph_stats.json），在ttl秒内直接读取文件；
+第一次调用get()时才查询，启动时不访问数据库。
+"""
+import json
+import os
+import threading
+import time
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "graph_cache")
+
+
+def _quote(name):
+    """标签/关系类型名用反引号包裹（名称中的反引号写两次）"""
+    return "`" + name.replace("`", "``") + "`"
+
+
+def fetch_stats(graph):
+    """查询各标签的节点数和各关系类型的关系数
+
+    graph: GraphData
+    return: {"labels": {标签: 节点数}, "relationship_types": {类型: 关系数}}
+    """
+    labels = [r["label"] for r in graph.execute_query("CALL db.labels() YIELD label RETURN label")]
+    rel_types = [r["relationshipType"] for r in graph.execute_query(
+        "CALL db.relationshipTypes() YIELD relationshipType RETURN relationshipType")]
+    return {
+        "labels": {label: graph.execute_query(f"MATCH (n:{_quote(label)}) RETURN count(n) AS count")[0]["count"]
+                   for label in sorted(labels)},
+        "relationship_types": {t: graph.execute_query(
+            f"MATCH ()-[r:{_quote(t)}]->() RETURN count(r) AS count")[0]["count"] for t in sorted(rel_types)},
+    }
+
+
+class GraphStats:
+    """带文件缓存的图谱统计信息"""
+
+    def __init__(self, graph, ttl=3600, cache_file=None):
+        """
+        graph: GraphData；其数据库地址记录在缓存文件中，地址不同时不使用缓存
+        ttl: 缓存有效时间（秒）
+        cache_file: 缓存文件路径，默认 graph_cache/graph_stats.json
+        """
+        self.graph = graph
+        self.uri = getattr(graph, "uri", "")
+        self.ttl = ttl
+        self.cache_file = cache_file or os.path.join(CACHE_DIR, "graph_stats.json")
+        self._stats = None
+        self._lock = threading.Lock()
+
+    def get(self, refresh=False):
+        """返回统计信息，含fetched_at（查询时间戳）；refresh为True时忽略缓存重新查询"""
+        with self._lock:
+            if not refresh:
+                if self._stats is None:
+                    self._stats = self._load()
+                if self._fresh(self._stats):
+                    return self._stats
+            stats = fetch_stats(self.graph)
+            stats.update(uri=self.uri, fetched_at=time.time())
+            self._save(stats)
+            self._stats = stats
+            return stats
+
+    def _fresh(self, stats):
+        return (stats is not None and stats.get("uri") == self.uri
+                and time.time() - stats.get("fetched_at", 0) < self.ttl)
+
+    def _load(self):
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, stats):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp = self.cache_file + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(stats, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.cache_file)
+        except OSError as e:
+            print(f"[ERROR] 保存图谱统计缓存失败: {str(e)}")
+
+
+def format_stats(stats):
+    lines = ["节点:"] + [f"- {label}: {count}" for label, count in stats["labels"].items()]
+    lines += ["关系:"] + [f"- {t}: {count}" for t, count in stats["relationship_types"].items()]
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    '''
+    运行以刷新并打印图谱统计信息
+    '''
+    from config import neo4j_config
+    from graph_database import GraphData
+
+    graph = GraphData(uri=neo4j_config.url, user=neo4j_config.username, password=neo4j_config.password)
+    print(format_stats(GraphStats(graph).get(refresh=True)))
+    graph.close()
@@ -1,7 +1,8 @@
-import requests
-from image_analyze.util import encode_image
+from image_analyze.util import chat_with_image
 from config import openai_config
 
+PROVIDER = dict(name="openai", base_url=openai_config.base_url, api_key=openai_config.OPENAI_API_KEY)
+
 def analyze_image(image, text):
     """图像分析
 
@@ -9,44 +10,8 @@ def analyze_image(image, text):
     text: 文本
     """
     print("image_path:", image)
-    
-    # 获取图片类型
-    image_type = image.type
-    base64_image = encode_image(image)  # 进行图片编码
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {openai_config.OPENAI_API_KEY}"
-    }
-
-    payload = {
-        "model": "gpt-4o",
-        "messages": [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": text},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:{image_type};base64,{base64_image}"
-                        }
-                    }
-                ]
-            }
-        ],
-        "max_tokens": 300
-    }
 
-    try:
-        response = requests.post(f"{openai_config.base_url}/chat/completions", headers=headers, json=payload)
-        response.raise_for_status()  # 如果响应有错误, 会抛出异常
-        result = response.json()
-        if 'choices' in result:
-            return result['choices'][0]['message']['content']
-        else:
-            return "No result found."
-    except requests.exceptions.RequestException as e:
-        return f"Request failed: {e}"
+    return chat_with_image(PROVIDER, image, text, model="gpt-4o", max_tokens=300)
 
 if __name__ == '__main__':
     image = 'path_to_image'  # 替换为实际的图像文件路径
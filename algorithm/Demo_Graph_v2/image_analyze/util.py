@@ -1,6 +1,8 @@
 import base64
 from streamlit.runtime.uploaded_file_manager import UploadedFile
-import os
+
+# 大模型调用通过llm_gateway共用的网关客户端（由algorithm目录安装，见requirements.txt）
+
 def encode_image(image: UploadedFile):
   """ 对图像进行编码
     
@@ -13,4 +15,37 @@ def encode_image(image: UploadedFile):
 
 def write_image(image:UploadedFile, filename:str):
   with open(filename, "wb") as f:
-    f.write(image.getbuffer())
\ No newline at end of file
+    f.write(image.getbuffer())
+
+def image_messages(image: UploadedFile, text: str):
+  """ 构造OpenAI兼容接口的图文消息（图片以data URL内嵌）
+
+  image: streamlit UploadedFile格式
+  text: 文本
+  """
+  return [
+    {
+      "role": "user",
+      "content": [
+        {"type": "text", "text": text},
+        {"type": "image_url", "image_url": {"url": f"data:{image.type};base64,{encode_image(image)}"}}
+      ]
+    }
+  ]
+
+def chat_with_image(provider: dict, image: UploadedFile, text: str, model: str, **params):
+  """ 通过网关调用提供方的图文对话接口，各提供方共用同一错误约定
+
+  provider: 提供方配置（name、base_url、api_key及网关选项），首次调用时注册，配置不变时不会重建连接池
+  image: streamlit UploadedFile格式
+  text: 文本
+  return: 回答文本；请求失败时返回 "Request failed: ..."
+  """
+  from llm_gateway import GatewayError, get_gateway
+
+  gateway = get_gateway()
+  gateway.register(**provider)
+  try:
+    return gateway.chat(provider["name"], image_messages(image, text), model=model, **params)
+  except GatewayError as e:
+    return f"Request failed: {e}"
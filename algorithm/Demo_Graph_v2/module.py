@@ -4,11 +4,14 @@ from langchain_openai.chat_models import ChatOpenAI
 from langchain_community.chat_models.tongyi import ChatTongyi
 from langchain.memory import ConversationBufferWindowMemory
 from langchain.llms.base import LLM
+from concurrent.futures import ThreadPoolExecutor
 from graph_database import GraphData
+from graph_stats import GraphStats, format_stats
+from fulltext_index import fulltext_cyphers
 from config import neo4j_config
 from config import tongyi_config
 from config import openai_config
-from prompt import REWRITE_QUERY_PROMPT, CYPHER_GENERATION_PROMPT, TO_FORMAT_PROMPT, ANSWER_GENERATION_PROMPT_HUMAN, ANSWER_GENERATION_PROMPT_SYSTEM
+from prompt import REWRITE_QUERY_PROMPT, cypher_generation_prompt, TO_FORMAT_PROMPT, ANSWER_GENERATION_PROMPT_HUMAN, ANSWER_GENERATION_PROMPT_SYSTEM
 
 class QueryRewriter:
     """ 问题改写器
@@ -41,17 +44,48 @@ class QueryRewriter:
         chain = prompt | llm    
         return chain
     
+# 一次查询所有关键词变体：每个关键词分别按知识点名称、内容和java组合匹配，各取$limit条，结果带keyword列
+UNWIND_KEYWORDS_CYPHER = """
+UNWIND $keywords AS keyword
+CALL {
+    WITH keyword
+    MATCH (n:knowledgePoint)-[:values]->(v)
+    WHERE toLower(n.name) CONTAINS keyword
+    RETURN n.name as knowledge_point, v.name as content
+    LIMIT $limit
+    UNION
+    WITH keyword
+    MATCH (n:knowledgePoint)-[:values]->(v)
+    WHERE toLower(v.name) CONTAINS keyword
+    RETURN n.name as knowledge_point, v.name as content
+    LIMIT $limit
+    UNION
+    WITH keyword
+    MATCH (n:knowledgePoint)-[:values]->(v)
+    WHERE keyword IN $combo_keywords
+      AND ((toLower(n.name) CONTAINS 'java' AND toLower(v.name) CONTAINS keyword)
+        OR (toLower(n.name) CONTAINS keyword AND toLower(v.name) CONTAINS 'java'))
+    RETURN n.name as knowledge_point, v.name as content
+    LIMIT $limit
+}
+RETURN keyword, knowledge_point, content
+"""
+
 class CypherGenerator:
     """ Cyphers语句生成器
 
     根据提问, 生成对应的查询语句
     """
-    def __init__(self, limit = 10):
+    def __init__(self, limit = 10, mode = "unwind"):
        """初始化Cypher语句生成器
 
        limit: 语句查询结果限制数
+       mode: "unwind" 所有关键词变体作为参数传给一条UNWIND查询;
+             "contains" 按关键词逐条生成CONTAINS查询（关键词直接拼入语句）;
+             "fulltext" 所有关键词合并为全文索引查询（见fulltext_index.py）
        """
        self.__limit = limit
+       self.mode = mode
        self.__chain = self.__get_cypher_generation_chain()
        
     def generate_cyphers(self, query):
@@ -59,7 +93,7 @@ class CypherGenerator:
         
         query: 问题
         limit: cyphers 查询语句的limit限制
-        return: list[str] cypher语句 
+        return: list[str] cypher语句; unwind和fulltext模式为 [(cypher语句, 参数)]
         """
         print(f"\n[DEBUG] CypherGenerator.generate_cyphers - 开始生成查询语句")
         print(f"[DEBUG] 输入查询: {query}")
@@ -83,6 +117,22 @@ class CypherGenerator:
         for q in queries:
             print(f"- {q}")
         
+        if self.mode == "fulltext":
+            cyphers = fulltext_cyphers(queries, self.__limit)
+            print(f"[DEBUG] 生成了 {len(cyphers)} 个全文索引查询语句")
+            return cyphers
+
+        if self.mode == "unwind":
+            # 语句固定不变，Neo4j只需解析和规划一次，之后复用查询计划缓存
+            params = {
+                "keywords": list(dict.fromkeys(queries)),
+                # 含java时，其余关键词再与java做组合查询
+                "combo_keywords": [k for k in keywords if k != 'java'] if 'java' in keywords else [],
+                "limit": self.__limit,
+            }
+            print(f"[DEBUG] 生成UNWIND查询，参数: {params}")
+            return [(UNWIND_KEYWORDS_CYPHER, params)] if params["keywords"] else []
+
         cyphers = []
         for q in queries:
             # 生成基本的查询语句
@@ -129,7 +179,7 @@ class CypherGenerator:
     def __get_cypher_generation_chain(self):
         """获取cyper语句生成链
         """
-        prompt = ChatPromptTemplate.from_template(CYPHER_GENERATION_PROMPT)
+        prompt = ChatPromptTemplate.from_template(cypher_generation_prompt())
         llm = ChatTongyi(api_key=tongyi_config.DASHSCOPE_API_KEY)
         chain = prompt | llm
         return chain
@@ -140,78 +190,38 @@ class CypherQuerier:
     对图数据库执行查询
     """
 
-    def __init__(self, graph):
+    def __init__(self, graph, max_workers=8, max_results=50, stats_ttl=3600):
+        """
+        graph: 图数据库
+        max_workers: 并发执行查询语句的线程数
+        max_results: kg_serach 去重后的结果数上限，达到后不再等待其余查询，0表示不限制
+        stats_ttl: 图谱统计信息缓存的有效时间（秒）
+        """
         print("\n[DEBUG] CypherQuerier.__init__ - 初始化查询器")
         self.graph = graph
+        self.max_results = max_results
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kg_serach")
         try:
             print("[DEBUG] 尝试检查数据库连接")
             self.graph.execute_query("MATCH (n) RETURN count(n) as count LIMIT 1")
             print("[DEBUG] 数据库连接正常")
         except Exception as e:
             print(f"[ERROR] 数据库连接失败: {str(e)}")
-        self._check_database_content()
+        self.stats = GraphStats(graph, ttl=stats_ttl)
 
-    def _check_database_content(self):
-        """检查数据库内容，打印节点和关系信息"""
-        print("\n[DEBUG] CypherQuerier._check_database_content - 开始检查数据库内容")
-        try:
-            # 检查所有知识点节点
-            query = """
-            MATCH (n:knowledgePoint)
-            RETURN n.name as name
-            """
-            result = self.graph.execute_query(query)
-            print("\n[DEBUG] 所有知识点节点:")
-            for record in result:
-                print(f"- {record['name']}")
-
-            # 检查所有values节点
-            query = """
-            MATCH (v:values)
-            RETURN v.name as name
-            """
-            result = self.graph.execute_query(query)
-            print("\n[DEBUG] 所有values节点:")
-            for record in result:
-                print(f"- {record['name']}")
-
-            # 检查所有关系
-            query = """
-            MATCH (n:knowledgePoint)-[r:values]->(v)
-            RETURN n.name as knowledge_point, v.name as content
-            """
-            result = self.graph.execute_query(query)
-            print("\n[DEBUG] 所有关系:")
-            for record in result:
-                print(f"- {record['knowledge_point']} -> {record['content']}")
-
-            # 检查是否有关键词相关的节点
-            query = """
-            MATCH (n:knowledgePoint)
-            WHERE toLower(n.name) CONTAINS '枚举' 
-               OR toLower(n.name) CONTAINS 'enum'
-               OR toLower(n.name) CONTAINS 'java'
-            RETURN n.name as name
-            """
-            result = self.graph.execute_query(query)
-            print("\n[DEBUG] 包含关键词的知识点节点:")
-            for record in result:
-                print(f"- {record['name']}")
-
-            query = """
-            MATCH (v:values)
-            WHERE toLower(v.name) CONTAINS '枚举'
-               OR toLower(v.name) CONTAINS 'enum'
-               OR toLower(v.name) CONTAINS 'java'
-            RETURN v.name as name
-            """
-            result = self.graph.execute_query(query)
-            print("\n[DEBUG] 包含关键词的values节点:")
-            for record in result:
-                print(f"- {record['name']}")
+    def database_stats(self, refresh=False):
+        """图谱统计信息（各标签节点数、各关系类型关系数），第一次调用时才查询，结果有文件缓存
 
+        refresh: 是否忽略缓存重新查询
+        """
+        try:
+            stats = self.stats.get(refresh=refresh)
+            print("\n[DEBUG] 图谱统计信息:")
+            print(format_stats(stats))
+            return stats
         except Exception as e:
-            print(f"[ERROR] 检查数据库内容时出错: {str(e)}")
+            print(f"[ERROR] 获取图谱统计信息时出错: {str(e)}")
+            return None
 
     def execute_query(self, question):
         print(f"\n[DEBUG] CypherQuerier.execute_query - 开始执行查询")
@@ -282,44 +292,63 @@ class CypherQuerier:
     def close(self):
         """ 关闭图数据库连接
         """
+        self.__executor.shutdown(wait=False, cancel_futures=True)
         self.graph.close()
 
-    def kg_serach(self, cyphers):
+    def kg_serach(self, cyphers, max_results=None):
         """查询图数据库
 
-        cyphers (list(str)): cyphers语句列表
+        各语句在线程池中并发执行（图数据库驱动的连接池线程安全，每条语句使用独立的会话），
+        结果按语句顺序合并并按 (知识点, 内容) 去重，与各查询完成的先后无关；
+        合并到某条语句后结果达到max_results条时，取消其后尚未开始的查询。
+
+        cyphers (list(str | tuple(str, dict))): cyphers语句列表，带参数的语句为 (语句, 参数)
+        max_results: 结果数上限，None时使用初始化时的设置
         return: 查询结果列表
         """
         print(f"\n[DEBUG] CypherQuerier.kg_serach - 开始执行图数据库查询")
         print(f"[DEBUG] 收到 {len(cyphers)} 个查询语句")
-        
-        count = len(cyphers)
+        max_results = self.max_results if max_results is None else max_results
+
         neo4jRes = []
-        
-        # 初始化图谱查询
-        if count == 0:  # 为空，查询结果为空
+        seen = {}  # 去重键 -> 在neo4jRes中的位置
+        if len(cyphers) == 0:  # 为空，查询结果为空
             print("[DEBUG] 没有查询语句，返回空结果")
-            neo4jRes = []
-        elif count == 1:  # 1个，查询一次
-            print("\n[DEBUG] 执行单个查询:")
-            print(cyphers[0])
-            result = self.graph.execute_query(cyphers[0])
-            if result:  # 确保结果不为空
-                print(f"[DEBUG] 查询成功，找到 {len(result)} 条结果")
-                neo4jRes = result
-            else:
-                print("[DEBUG] 查询成功但没有找到匹配结果")
-        else:  # 多个，循环处理
-            for i, cypher in enumerate(cyphers):
-                print(f"\n[DEBUG] 执行查询 {i+1}:")
-                print(cypher)
-                result = self.graph.execute_query(cypher)
-                if result:  # 确保结果不为空
-                    print(f"[DEBUG] 查询成功，找到 {len(result)} 条结果")
-                    neo4jRes.extend(result)
-                else:
-                    print("[DEBUG] 查询成功但没有找到匹配结果")
-        
+            return neo4jRes
+
+        statements = [cypher if isinstance(cypher, tuple) else (cypher, None) for cypher in cyphers]
+        futures = [self.__executor.submit(self.graph.execute_query, cypher, params) for cypher, params in statements]
+        try:
+            for i, future in enumerate(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"[ERROR] 查询 {i+1} 执行错误: {str(e)}")
+                    continue
+                if not result:
+                    print(f"[DEBUG] 查询 {i+1} 成功但没有找到匹配结果")
+                    continue
+                print(f"[DEBUG] 查询 {i+1} 成功，找到 {len(result)} 条结果")
+                for record in result:
+                    # 全文索引查询带相关度score，UNWIND查询带匹配的keyword，去重时忽略这两列，保留score较高的一条
+                    key = tuple(sorted((k, str(v)) for k, v in record.items() if k not in ("score", "keyword")))
+                    if key not in seen:
+                        seen[key] = len(neo4jRes)
+                        neo4jRes.append(record)
+                    elif record.get("score", 0) > neo4jRes[seen[key]].get("score", 0):
+                        neo4jRes[seen[key]] = record
+                if max_results and len(neo4jRes) >= max_results:
+                    print(f"[DEBUG] 前 {i+1} 个查询已得到 {len(neo4jRes)} 条结果，停止其余查询")
+                    break
+        finally:
+            for future in futures:
+                future.cancel()
+
+        if any("score" in record for record in neo4jRes):
+            neo4jRes.sort(key=lambda record: record.get("score", 0), reverse=True)
+        if max_results:
+            neo4jRes = neo4jRes[:max_results]
+
         print(f"\n[DEBUG] 查询完成，总共找到 {len(neo4jRes)} 条结果")
         return neo4jRes
     
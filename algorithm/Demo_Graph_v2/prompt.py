@@ -1,13 +1,19 @@
-# Neo4j 图数据库模式定义
-SCHEMA = """
+from schema_snapshot import load_schema
+
+# 内置的 Neo4j 图数据库模式定义，没有模式快照（schema_snapshot.py）时使用
+DEFAULT_SCHEMA = """
 Node: knowledgePoint: name (STRING)
 Node: values: name (STRING)
 
 Relationship: (:knowledgePoint)-[:values]->(:values)
 """
 
+# Neo4j 图数据库模式定义：优先读取模式快照
+SCHEMA = load_schema(DEFAULT_SCHEMA)
+
 # 基础系统提示信息
-PRE_MSG = f"""   
+def pre_msg(schema):
+    return f"""   
 System: 您的任务是将关于 Neo4j 数据库内容的问题转换为 Cypher 查询语句。
 
 规则：
@@ -20,11 +26,13 @@ System: 您的任务是将关于 Neo4j 数据库内容的问题转换为 Cypher
 7. 内容存储在 values 节点的 name 属性中
 
 数据库模式：
-{SCHEMA}
+{schema}
 """
 
+PRE_MSG = pre_msg(SCHEMA)
+
 # Cypher 查询生成提示
-CYPHER_GENERATION_PROMPT = PRE_MSG + """
+CYPHER_GENERATION_RULES = """
 问题: '{query}'
 
 生成规则：
@@ -53,6 +61,12 @@ RETURN n.name as knowledge_point, v.name as content LIMIT 10
 ```
 """
 
+CYPHER_GENERATION_PROMPT = PRE_MSG + CYPHER_GENERATION_RULES
+
+def cypher_generation_prompt():
+    """按最新的模式快照生成Cypher生成提示（快照可能在导入本模块后才刷新）"""
+    return pre_msg(load_schema(DEFAULT_SCHEMA)) + CYPHER_GENERATION_RULES
+
 EXAMPLES = """
 Example 1: Find what Java枚举 is
 MATCH (n:knowledgePoint)-[r:values]->(v)
@@ -0,0 +1,77 @@
+"""
+图谱模式（schema）快照
+
+GraphData.get_schema 需要三次 apoc.meta.data() 全图采样，不适合每次启动都运行。
+快照文件（graph_cache/schema_snapshot.json）保存模式文本和生成时的指纹：
+- 指纹：各标签节点数和各关系类型关系数（graph_stats.fetch_stats，只读计数存储）的哈希
+- 启动时只计算指纹，与快照一致时直接使用快照；不一致时重新生成模式，版本号加一
+prompt.py 从快照读取数据库模式，没有快照时使用内置的模式。
+
+命令行（强制重新生成并打印）：
+    python graph_database.py
+backend/core/llm/rag/schema_snapshot.py 以相同的文件格式为后端的知识图谱生成快照。
+"""
+import hashlib
+import json
+import os
+import time
+
+from graph_stats import CACHE_DIR, fetch_stats
+
+SNAPSHOT_FILE = os.path.join(CACHE_DIR, "schema_snapshot.json")
+
+
+def fingerprint(stats):
+    """标签/关系类型计数的哈希，计数不变时认为模式不变"""
+    counts = {"labels": stats["labels"], "relationship_types": stats["relationship_types"]}
+    return hashlib.sha1(json.dumps(counts, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def read_snapshot(path=SNAPSHOT_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        return snapshot if isinstance(snapshot.get("schema"), str) else None
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def load_schema(default, path=SNAPSHOT_FILE):
+    """快照中的模式文本，没有快照时返回default"""
+    snapshot = read_snapshot(path)
+    return snapshot["schema"] if snapshot else default
+
+
+def write_snapshot(schema, stats, uri="", path=SNAPSHOT_FILE):
+    previous = read_snapshot(path)
+    snapshot = {
+        "version": (previous or {}).get("version", 0) + 1,
+        "fingerprint": fingerprint(stats),
+        "uri": uri,
+        "created_at": time.time(),
+        "labels": stats["labels"],
+        "relationship_types": stats["relationship_types"],
+        "schema": schema,
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    return snapshot
+
+
+def refresh_snapshot(graph, path=SNAPSHOT_FILE, force=False):
+    """指纹变化（或force）时重新生成快照，返回当前快照
+
+    graph: GraphData
+    """
+    stats = fetch_stats(graph)
+    uri = getattr(graph, "uri", "")
+    snapshot = read_snapshot(path)
+    if (not force and snapshot and snapshot.get("fingerprint") == fingerprint(stats)
+            and snapshot.get("uri") == uri):
+        return snapshot
+    print("[DEBUG] 图谱模式指纹变化，重新生成模式快照")
+    return write_snapshot(graph.get_schema(), stats, uri, path)
+
@@ -0,0 +1,84 @@
+"""
+批量知识库问答
+
+用于评测和常见问题预计算：所有问题一次计算嵌入、一次多向量检索，再以有限并发调用大语言模型。
+
+命令行用法：
+    python batch_qa.py questions.txt --collection museum_docs --output answers.jsonl
+    python batch_qa.py questions.txt --collection museum_docs --retrieval-only --compare   # 对比逐条检索与批量检索的耗时
+"""
+import argparse
+import json
+import time
+
+
+def load_questions(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def compare_retrieval(rag, questions, collection, host, port, top_k):
+    """逐条检索与批量检索的每问题耗时对比"""
+    start = time.perf_counter()
+    for question in questions:
+        rag.query_documents(question, collection, host, port, top_k)
+    serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rag.query_documents_batch(questions, collection, host, port, top_k)
+    batch = time.perf_counter() - start
+
+    n = len(questions)
+    print(f"逐条检索: 共 {serial:.2f}s，每问题 {serial / n * 1000:.1f}ms")
+    print(f"批量检索: 共 {batch:.2f}s，每问题 {batch / n * 1000:.1f}ms，加速 {serial / batch:.1f} 倍")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量知识库问答")
+    parser.add_argument("questions", help="问题文件，每行一个问题")
+    parser.add_argument("--collection", default="default_collection")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", default=None)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=4, help="大语言模型并发数")
+    parser.add_argument("--retrieval-only", action="store_true", help="只检索，不调用大语言模型")
+    parser.add_argument("--compare", action="store_true", help="同时测量逐条检索的耗时作对比")
+    parser.add_argument("--output", default="", help="结果写入JSONL文件")
+    args = parser.parse_args()
+
+    import main as rag
+    host = args.host or rag.MILVUS_HOST
+    port = args.port or rag.MILVUS_PORT
+    connected, msg = rag.check_milvus_connection(host, port)
+    if not connected:
+        print(msg)
+        return
+
+    questions = load_questions(args.questions)
+    print(f"共 {len(questions)} 个问题")
+    if args.compare:
+        compare_retrieval(rag, questions, args.collection, host, port, args.top_k)
+
+    start = time.perf_counter()
+    if args.retrieval_only:
+        docs_batch = rag.query_documents_batch(questions, args.collection, host, port, args.top_k)
+        results = [{"question": q, "answer": None, "docs": docs} for q, docs in zip(questions, docs_batch)]
+    else:
+        results = rag.rag_qa_batch(questions, args.collection, host, port, args.top_k, args.concurrency)
+    elapsed = time.perf_counter() - start
+    print(f"完成，耗时 {elapsed:.2f}s，每问题 {elapsed / max(1, len(questions)) * 1000:.1f}ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps({
+                    "question": r["question"],
+                    "answer": r["answer"],
+                    "docs": [{"content": doc.page_content, "source": doc.metadata.get("source"), "score": float(score)}
+                             for doc, score in r["docs"]],
+                }, ensure_ascii=False) + "\n")
+        print(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
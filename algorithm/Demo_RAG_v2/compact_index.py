@@ -0,0 +1,259 @@
+"""
+量化向量索引（紧凑模式）与全精度重打分
+
+默认的HNSW索引在Milvus查询节点内存中保存完整的float32向量（384维每条1536字节）。
+紧凑模式（COMPACT_INDEX=IVF_SQ8 或 IVF_PQ）新建的集合改用量化索引：
+- IVF_SQ8：每维量化为1字节，内存约为float32的1/4
+- IVF_PQ：向量切成m段，每段用8位码本编号表示，每条只占m字节（384维、m=48时约为1/32）
+
+量化后的距离有误差，检索时先多取 RESCORE_FACTOR 倍的候选，再用全精度向量重新计算
+L2距离并排序。全精度向量按文本块内容从嵌入缓存（rag_common/embedding_cache.py，磁盘上的
+内存映射文件）读取，入库时已经写入，不占Milvus内存，检索时不经过嵌入模型；
+缓存中没有的候选保留量化距离，关闭嵌入缓存时不做重打分。
+
+命令行基准（NumPy模拟量化，暴力检索，只反映量化本身的影响；IVF的nprobe影响见index_tuner.py）：
+    python compact_index.py --n 100000 --dim 384 --k 10
+    python compact_index.py --collection museum_docs --sample 50000
+    python compact_index.py --embedding-cache embedding_cache/sentence-transformers_paraphrase-multilingual-MiniLM-L12-v2
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+COMPACT_INDEX_TYPES = ("IVF_SQ8", "IVF_PQ")
+PQ_NBITS = 8
+
+
+def pq_m(dim):
+    """PQ分段数：每段8维（不能整除时取不超过dim/8的最大约数）"""
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def compact_index_params(index_type, dim, nlist=1024):
+    index_type = index_type.upper()
+    if index_type == "IVF_SQ8":
+        params = {"nlist": nlist}
+    elif index_type == "IVF_PQ":
+        params = {"nlist": nlist, "m": pq_m(dim), "nbits": PQ_NBITS}
+    else:
+        raise ValueError(f"不支持的紧凑索引类型: {index_type}（可选 {', '.join(COMPACT_INDEX_TYPES)}）")
+    return {"metric_type": "L2", "index_type": index_type, "params": params}
+
+
+def compact_search_params(nprobe=32):
+    return {"metric_type": "L2", "params": {"nprobe": nprobe}}
+
+
+def bytes_per_vector(index_type, dim):
+    """索引中每条向量占用的字节数（不含IVF倒排表的id和码本等固定开销）"""
+    if index_type == "FLAT":
+        return dim * 4
+    if index_type == "IVF_SQ8":
+        return dim
+    if index_type == "IVF_PQ":
+        return pq_m(dim) * PQ_NBITS // 8
+    raise ValueError(f"未知索引类型: {index_type}")
+
+
+def squared_l2(query_vector, vectors):
+    """与Milvus的L2度量一致的平方欧氏距离"""
+    q = np.asarray(query_vector, dtype=np.float32)
+    m = np.asarray(vectors, dtype=np.float32).reshape(-1, q.shape[0])
+    return ((m - q) ** 2).sum(axis=1).tolist()
+
+
+def stored_distances(cache, query_vector):
+    """返回distance_fn：按文本块内容从嵌入缓存读取入库时的全精度向量，计算与问题的平方L2距离
+
+    cache: rag_common.embedding_cache.EmbeddingCache；只读缓存，不调用嵌入模型，缓存中没有的文本块距离为None
+    """
+    def distance_fn(texts):
+        vectors = cache.get_many(texts)
+        found = [i for i, vector in enumerate(vectors) if vector is not None]
+        distances = [None] * len(texts)
+        if found:
+            for i, distance in zip(found, squared_l2(query_vector, np.stack([vectors[i] for i in found]))):
+                distances[i] = distance
+        return distances
+    return distance_fn
+
+
+def rescore(query_vector, docs_with_scores, top_k, distance_fn):
+    """用全精度向量重新计算候选的L2距离，返回距离最小的前top_k个 [(Document, L2距离)]
+
+    distance_fn(texts): 返回这些文本块与问题的平方L2距离（与Milvus的L2度量一致），
+        为None的候选保留原有的量化距离
+    """
+    if not docs_with_scores:
+        return []
+    distances = distance_fn([doc.page_content for doc, _ in docs_with_scores])
+    distances = [score if distance is None else distance
+                 for distance, (_, score) in zip(distances, docs_with_scores)]
+    order = np.argsort(np.asarray(distances, dtype=np.float64), kind="stable")[:top_k]
+    return [(docs_with_scores[i][0], float(distances[i])) for i in order]
+
+
+# ---------------- 基准：NumPy模拟SQ8/PQ量化 ----------------
+
+def squared_distances(base, queries):
+    return (base ** 2).sum(axis=1)[None, :] - 2 * queries @ base.T + (queries ** 2).sum(axis=1)[:, None]
+
+
+def top_k_ids(distances, k):
+    idx = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    rows = np.arange(len(distances))[:, None]
+    return idx[rows, np.argsort(distances[rows, idx], axis=1)]
+
+
+def sq8_reconstruct(base):
+    """每维按最小值/最大值线性量化为uint8后还原"""
+    low, high = base.min(axis=0), base.max(axis=0)
+    scale = np.where(high > low, (high - low) / 255, 1.0)
+    codes = np.round((base - low) / scale).astype(np.uint8)
+    return codes.astype(np.float32) * scale + low
+
+
+def kmeans(data, k, iters=15, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = squared_distances(centroids, data).argmin(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        counts = np.bincount(assign, minlength=k)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+def pq_distances(base, queries, m, train_size=20000, seed=0):
+    """训练PQ码本、编码base，并用查表法（ADC）计算查询到编码向量的距离"""
+    dim = base.shape[1]
+    sub = dim // m
+    ksub = min(1 << PQ_NBITS, len(base))
+    rng = np.random.default_rng(seed)
+    train = base[rng.choice(len(base), min(train_size, len(base)), replace=False)]
+    distances = np.zeros((len(queries), len(base)), dtype=np.float32)
+    for j in range(m):
+        part = slice(j * sub, (j + 1) * sub)
+        codebook = kmeans(train[:, part], ksub, seed=seed + j)
+        codes = squared_distances(codebook, base[:, part]).argmin(axis=1)
+        table = squared_distances(codebook, queries[:, part])  # (查询数, ksub)
+        distances += table[:, codes]
+    return distances
+
+
+def recall(found, truth):
+    k = truth.shape[1]
+    return float(np.mean([len(set(f[:k]) & set(t)) / k for f, t in zip(found.tolist(), truth.tolist())]))
+
+
+def benchmark(base, queries, k=10, factors=(1, 2, 4, 8)):
+    """返回每种索引的内存占用和不同重打分倍数下的recall@k"""
+    n, dim = base.shape
+    exact = squared_distances(base, queries)
+    truth = top_k_ids(exact, k)
+    results = []
+    for index_type in ("FLAT",) + COMPACT_INDEX_TYPES:
+        start = time.perf_counter()
+        if index_type == "FLAT":
+            approx = exact
+        elif index_type == "IVF_SQ8":
+            approx = squared_distances(sq8_reconstruct(base), queries)
+        else:
+            approx = pq_distances(base, queries, pq_m(dim))
+        quantize_s = time.perf_counter() - start
+        row = {
+            "index_type": index_type,
+            "bytes_per_vector": bytes_per_vector(index_type, dim),
+            "memory_mb": round(n * bytes_per_vector(index_type, dim) / 1024 ** 2, 2),
+            "quantize_s": round(quantize_s, 2),
+            "recall": {},
+        }
+        for factor in factors:
+            candidates = top_k_ids(approx, min(n, k * factor))
+            # 重打分：候选按全精度距离重新排序
+            rows = np.arange(len(queries))[:, None]
+            order = np.argsort(exact[rows, candidates], axis=1, kind="stable")
+            rescored = candidates[rows, order][:, :k]
+            row["recall"][factor] = round(recall(rescored, truth), 4)
+            if index_type == "FLAT":
+                break
+        results.append(row)
+    return results
+
+
+def print_results(results, n, dim, k):
+    flat_mb = results[0]["memory_mb"]
+    print(f"{n} 个向量，{dim} 维，recall@{k}（候选数 = k × 重打分倍数，倍数1即不重打分）")
+    for row in results:
+        ratio = flat_mb / row["memory_mb"] if row["memory_mb"] else float("inf")
+        recalls = "  ".join(f"×{factor}: {value:.3f}" for factor, value in row["recall"].items())
+        print(f"{row['index_type']:<8} {row['bytes_per_vector']:>5} B/向量  {row['memory_mb']:>9.1f} MB"
+              f"（{ratio:>4.1f}倍压缩）  {recalls}")
+
+
+def synthetic_vectors(n, dim, latent_dim=48, clusters=200, seed=0):
+    """带簇结构、有效维度较低的单位向量，近似句向量的分布（各向同性的随机向量对量化最不利）"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, latent_dim)).astype(np.float32)
+    latent = centers[rng.integers(0, clusters, n)] + 0.7 * rng.standard_normal((n, latent_dim)).astype(np.float32)
+    projection = rng.standard_normal((latent_dim, dim)).astype(np.float32)
+    vectors = latent @ projection + 0.3 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def cached_vectors(cache_dir, limit):
+    """读取嵌入缓存（某个模型的目录）中的向量"""
+    with open(os.path.join(cache_dir, "meta.json"), "r", encoding="utf-8") as f:
+        dim = json.load(f)["dim"]
+    vectors = np.fromfile(os.path.join(cache_dir, "vectors.f32"), dtype=np.float32)
+    vectors = vectors[:len(vectors) // dim * dim].reshape(-1, dim)
+    return vectors[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="量化索引的内存/召回率基准")
+    parser.add_argument("--collection", help="从Milvus集合抽样向量")
+    parser.add_argument("--embedding-cache", help="从嵌入缓存的模型目录读取向量")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", default=None)
+    parser.add_argument("--n", type=int, default=50000, help="合成数据的向量数")
+    parser.add_argument("--dim", type=int, default=384, help="合成数据的维度")
+    parser.add_argument("--sample", type=int, default=50000, help="从集合或缓存读取的最大向量数")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--factors", default="1,2,4,8", help="重打分倍数，逗号分隔")
+    args = parser.parse_args()
+
+    if args.collection:
+        from dotenv import load_dotenv
+        from pymilvus import connections
+        from index_tuner import sample_vectors
+        load_dotenv()
+        connections.connect(host=args.host or os.getenv("MILVUS_HOST", "127.0.0.1"),
+                            port=args.port or os.getenv("MILVUS_PORT", "19530"), timeout=5)
+        vectors = sample_vectors(args.collection, args.sample + args.queries)
+    elif args.embedding_cache:
+        vectors = cached_vectors(args.embedding_cache, args.sample + args.queries)
+    else:
+        vectors = synthetic_vectors(args.n + args.queries, args.dim)
+    if len(vectors) <= args.queries + args.k * 8:
+        raise SystemExit(f"只有 {len(vectors)} 个向量，不足以测试")
+
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(vectors))
+    queries, base = vectors[order[:args.queries]], vectors[order[args.queries:]]
+    factors = tuple(int(f) for f in args.factors.split(","))
+    results = benchmark(np.ascontiguousarray(base), np.ascontiguousarray(queries), args.k, factors)
+    print_results(results, len(base), base.shape[1], args.k)
+
+
+if __name__ == "__main__":
+    main()
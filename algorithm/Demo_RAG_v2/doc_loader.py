@@ -0,0 +1,92 @@
+import os
+from langchain_community.document_loaders import TextLoader, PyPDFLoader, Docx2txtLoader
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# 支持的文件类型
+SUPPORTED_EXTENSIONS = (".txt", ".pdf", ".docx", ".doc")
+
+# 超过该大小的文件逐页流式解析，不再整份加载到内存
+STREAM_MIN_BYTES = int(os.getenv("STREAM_MIN_BYTES", str(20 * 1024 * 1024)))
+
+# 流式读取文本文件时每段的字符数
+TEXT_BLOCK_CHARS = 256 * 1024
+
+# 根据文件类型选择合适的加载器
+def _get_loader(file_path):
+    _, file_extension = os.path.splitext(file_path)
+
+    if file_extension.lower() == ".txt":
+        return TextLoader(file_path, encoding="utf-8")
+    elif file_extension.lower() == ".pdf":
+        return PyPDFLoader(file_path)
+    elif file_extension.lower() in [".docx", ".doc"]:
+        return Docx2txtLoader(file_path)
+    else:
+        raise ValueError(f"不支持的文件类型: {file_extension}")
+
+# 文档加载函数 - 整份加载，文本文件不分段，文本块的切分与文件大小无关
+def load_document(file_path):
+    return _get_loader(file_path).load()
+
+# 逐页加载文档（供流式解析的大文件使用）：PDF每次产出一页；文本文件按段落边界切成固定大小的段；
+# DOCX由docx2txt整体解析，只能一次产出
+def iter_document_pages(file_path):
+    if file_path.lower().endswith(".txt"):
+        yield from _iter_text_blocks(file_path)
+        return
+    yield from _get_loader(file_path).lazy_load()
+
+# 文本文件分段读取，在段落（空行）边界处切分，避免一段文字被截断在两段之间
+# 缓冲区满一段时在其后半段之后的最后一个空行处切分，剩余部分与下一次读取的内容拼接；
+# 没有空行时按段长硬切，读到文件末尾时剩余部分整体产出
+def _iter_text_blocks(file_path, block_chars=TEXT_BLOCK_CHARS):
+    if os.path.getsize(file_path) <= block_chars:
+        yield from TextLoader(file_path, encoding="utf-8").lazy_load()
+        return
+    metadata = {"source": file_path}
+    buffer = ""
+    with open(file_path, "r", encoding="utf-8") as f:
+        while True:
+            data = f.read(block_chars)
+            buffer += data
+            if not data:
+                if buffer.strip():
+                    yield Document(page_content=buffer, metadata=dict(metadata))
+                return
+            while len(buffer) >= block_chars:
+                cut = buffer.rfind("\n\n", block_chars // 2)
+                cut = block_chars if cut < 0 else cut + 2
+                piece, buffer = buffer[:cut], buffer[cut:]
+                if piece.strip():
+                    yield Document(page_content=piece, metadata=dict(metadata))
+
+# 文件页数（仅PDF，无法快速获取时返回None），用于显示逐页进度
+def count_pages(file_path):
+    if not file_path.lower().endswith(".pdf"):
+        return None
+    try:
+        from pypdf import PdfReader
+        return len(PdfReader(file_path).pages)
+    except Exception:
+        return None
+
+# 文档分块
+def split_documents(documents, chunk_size=1000, chunk_overlap=150):
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+    )
+    chunks = text_splitter.split_documents(documents)
+    return chunks
+
+# 逐页分块：每加载一页就分块并产出 (页序号, 该页的文本块)，内存中只保留当前页
+def iter_page_chunks(file_path, chunk_size=1000, chunk_overlap=150):
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+    )
+    for page_no, page in enumerate(iter_document_pages(file_path), start=1):
+        yield page_no, text_splitter.split_documents([page])
@@ -0,0 +1,131 @@
+"""
+增量索引清单
+
+每个集合一个JSON清单，记录每个源文件的大小、修改时间、内容哈希和文本块哈希列表。
+文本块以内容哈希（rag_common.chunk_id.chunk_hash）作为Milvus主键，因此：
+- 文件大小和修改时间都未变化时直接跳过，不解析也不计算嵌入
+- 文件内容变化时只写入新出现的文本块，不再被任何文件引用的旧文本块从Milvus删除
+- 不同文件中内容相同的文本块只存一份
+- 与已有文本块近似重复而未写入的文本块作为别名记录（文本、元数据和所匹配的文本块），
+  所匹配的文本块失效时重新入库
+"""
+import hashlib
+import json
+import os
+import re
+import time
+
+MANIFEST_DIR = os.getenv("INDEX_MANIFEST_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "index_manifest"))
+MANIFEST_VERSION = 1
+
+
+def file_hash(file_path):
+    """文件内容哈希"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IndexManifest:
+    def __init__(self, path, files=None):
+        self.path = path
+        # 源文件 -> {"size", "mtime", "file_hash", "chunks": [文本块哈希],
+        #           "aliases": {文本块哈希: {"of": 所匹配的文本块哈希, "text", "metadata"}}}
+        self.files = files or {}
+        self._refcount = {}
+        for entry in self.files.values():
+            for h in entry["chunks"]:
+                self._refcount[h] = self._refcount.get(h, 0) + 1
+
+    @classmethod
+    def manifest_path(cls, collection_name, host, port, manifest_dir=MANIFEST_DIR):
+        name = re.sub(r"[^\w.-]", "_", f"{host}_{port}_{collection_name}")
+        return os.path.join(manifest_dir, f"{name}.json")
+
+    @classmethod
+    def load(cls, collection_name, host, port, manifest_dir=MANIFEST_DIR):
+        path = cls.manifest_path(collection_name, host, port, manifest_dir)
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            print(f"索引清单版本不匹配，忽略旧清单: {path}")
+            return cls(path)
+        return cls(path, data.get("files", {}))
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "updated_at": time.time(), "files": self.files},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def has_chunk(self, h):
+        return self._refcount.get(h, 0) > 0
+
+    def is_unchanged(self, source, file_path):
+        """文件是否与上次入库时相同；大小和修改时间变化但内容不变时，仅更新记录"""
+        entry = self.files.get(source)
+        if entry is None:
+            return False
+        stat = os.stat(file_path)
+        if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return True
+        if entry["size"] == stat.st_size and entry["file_hash"] == file_hash(file_path):
+            entry["mtime"] = stat.st_mtime
+            return True
+        return False
+
+    def chunks_of(self, source):
+        return self.files.get(source, {}).get("chunks", [])
+
+    def update_file(self, source, file_path, chunk_hashes, aliases=None):
+        """记录文件的新文本块列表和近似重复别名，返回不再被任何文件引用的旧文本块哈希"""
+        stat = os.stat(file_path)
+        old = self.chunks_of(source)
+        self.files[source] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "file_hash": file_hash(file_path),
+            "chunks": list(chunk_hashes),
+            "aliases": dict(aliases or {}),
+        }
+        for h in chunk_hashes:
+            self._refcount[h] = self._refcount.get(h, 0) + 1
+        return self._release(old)
+
+    def remove_file(self, source):
+        """移除文件记录，返回不再被引用的文本块哈希"""
+        entry = self.files.pop(source, None)
+        return self._release(entry["chunks"]) if entry else []
+
+    def orphaned_aliases(self, stale):
+        """所匹配的文本块已失效的别名，返回 [(源文件, 文本块哈希, 别名记录)]"""
+        return [(source, h, alias) for source, entry in self.files.items()
+                for h, alias in entry.get("aliases", {}).items() if alias["of"] in stale]
+
+    def resolve_alias(self, source, h, duplicate_of=None):
+        """别名改为指向duplicate_of；duplicate_of为空时转为文件的文本块（重新入库）"""
+        entry = self.files[source]
+        if duplicate_of is not None:
+            entry["aliases"][h]["of"] = duplicate_of
+            return
+        del entry["aliases"][h]
+        if h not in entry["chunks"]:
+            entry["chunks"].append(h)
+            self._refcount[h] = self._refcount.get(h, 0) + 1
+
+    def _release(self, hashes):
+        stale = []
+        for h in hashes:
+            count = self._refcount.get(h, 0) - 1
+            if count > 0:
+                self._refcount[h] = count
+            else:
+                self._refcount.pop(h, None)
+                stale.append(h)
+        return stale
@@ -0,0 +1,218 @@
+"""
+Milvus索引参数自动调优
+
+从已有集合中抽取一部分向量，写入临时集合，依次构建候选索引：
+- HNSW：多组 M / efConstruction，每组再测试多个检索参数ef
+- IVF_FLAT、IVF_SQ8：nlist取约4√n，测试多个nprobe
+对每个候选，用留出的向量作为查询，以NumPy暴力检索的结果为准计算recall@k，
+并逐条检索测量p50/p95延迟（含网络往返，与应用实际看到的一致）。
+
+在满足 --target-recall 的候选中选p95延迟最低的一个（都不满足时选召回率最高的），
+写入推荐配置 index_config.json，create_empty_collection 建索引、查询时的检索参数都读取该配置。
+
+命令行用法：
+    python index_tuner.py --collection museum_docs --sample 20000 --queries 200 --k 10
+    python index_tuner.py --collection museum_docs --target-recall 0.98 --output index_config.json
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+INDEX_CONFIG_PATH = os.getenv("INDEX_CONFIG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "index_config.json"))
+
+# 未调优时使用的索引参数
+DEFAULT_INDEX_PARAMS = {"metric_type": "L2", "index_type": "HNSW", "params": {"M": 8, "efConstruction": 64}}
+
+HNSW_BUILD_PARAMS = [(8, 64), (16, 128), (32, 256)]
+HNSW_EF = [16, 32, 64, 128, 256]
+IVF_NPROBE = [4, 8, 16, 32, 64]
+
+
+def load_index_config(path=INDEX_CONFIG_PATH):
+    """返回 (建索引参数, 检索参数)；没有调优配置时为默认HNSW参数和None（使用默认检索参数）"""
+    if not path or not os.path.exists(path):
+        return DEFAULT_INDEX_PARAMS, None
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    return config["index_params"], config.get("search_params")
+
+
+def candidate_configs(n, k):
+    """[(建索引参数, [检索参数, ...])]；Milvus拒绝ef小于k的HNSW检索，只测试ef >= k的取值"""
+    configs = []
+    efs = [ef for ef in HNSW_EF if ef >= k] or [k]
+    for m, ef_construction in HNSW_BUILD_PARAMS:
+        configs.append((
+            {"metric_type": "L2", "index_type": "HNSW", "params": {"M": m, "efConstruction": ef_construction}},
+            [{"metric_type": "L2", "params": {"ef": ef}} for ef in efs],
+        ))
+    nlist = int(max(16, min(65536, 4 * np.sqrt(n))))
+    for index_type in ("IVF_FLAT", "IVF_SQ8"):
+        configs.append((
+            {"metric_type": "L2", "index_type": index_type, "params": {"nlist": nlist}},
+            [{"metric_type": "L2", "params": {"nprobe": nprobe}} for nprobe in IVF_NPROBE if nprobe <= nlist],
+        ))
+    return configs
+
+
+def vector_field_of(collection):
+    from pymilvus import DataType
+    for field in collection.schema.fields:
+        if field.dtype == DataType.FLOAT_VECTOR:
+            return field.name
+    raise ValueError(f"集合 {collection.name} 中没有FLOAT_VECTOR字段")
+
+
+def sample_vectors(collection_name, limit, batch_size=1000):
+    """从集合中读取最多limit个向量"""
+    from pymilvus import Collection
+    collection = Collection(collection_name)
+    collection.load()
+    field = vector_field_of(collection)
+    iterator = collection.query_iterator(batch_size=batch_size, limit=limit, output_fields=[field])
+    vectors = []
+    try:
+        while True:
+            rows = iterator.next()
+            if not rows:
+                break
+            vectors.extend(row[field] for row in rows)
+    finally:
+        iterator.close()
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def exact_neighbors(base, queries, k):
+    """暴力检索的前k个近邻（平方L2）"""
+    distances = (base ** 2).sum(axis=1)[None, :] - 2 * queries @ base.T
+    idx = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    return [set(row.tolist()) for row in idx]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def create_tuning_collection(name, base):
+    from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, utility
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    schema = CollectionSchema([
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=False),
+        FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=base.shape[1]),
+    ], description="index tuning sample")
+    collection = Collection(name, schema)
+    for i in range(0, len(base), 5000):
+        collection.insert([list(range(i, min(i + 5000, len(base)))), base[i:i + 5000].tolist()])
+    collection.flush()
+    return collection
+
+
+def benchmark_index(collection, index_params, search_params_list, queries, truth, k):
+    from pymilvus import utility
+    collection.release()
+    if collection.has_index():
+        collection.drop_index()
+    start = time.perf_counter()
+    collection.create_index(field_name="vector", index_params=index_params)
+    utility.wait_for_index_building_complete(collection.name)
+    build_time = time.perf_counter() - start
+    collection.load()
+
+    results = []
+    for search_params in search_params_list:
+        # 预热
+        collection.search(data=queries[:1].tolist(), anns_field="vector", param=search_params, limit=k)
+        latencies, found = [], []
+        for q in queries:
+            start = time.perf_counter()
+            hits = collection.search(data=[q.tolist()], anns_field="vector", param=search_params, limit=k)[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+            found.append({hit.id for hit in hits})
+        recall = float(np.mean([len(f & t) / k for f, t in zip(found, truth)]))
+        results.append({
+            "index_params": index_params,
+            "search_params": search_params,
+            "recall": round(recall, 4),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "build_s": round(build_time, 2),
+        })
+        print(f"{index_params['index_type']:<9} {json.dumps(index_params['params']):<34} "
+              f"{json.dumps(search_params['params']):<16} recall@{k} {recall:.3f}  "
+              f"p50 {results[-1]['p50_ms']:.1f}ms  p95 {results[-1]['p95_ms']:.1f}ms")
+    return results
+
+
+def recommend(results, target_recall):
+    qualified = [r for r in results if r["recall"] >= target_recall]
+    if qualified:
+        return min(qualified, key=lambda r: (r["p95_ms"], -r["recall"]))
+    return max(results, key=lambda r: (r["recall"], -r["p95_ms"]))
+
+
+def tune(collection_name, sample=20000, queries=200, k=10, target_recall=0.95, output=INDEX_CONFIG_PATH):
+    from pymilvus import utility
+    vectors = sample_vectors(collection_name, sample + queries)
+    if len(vectors) <= queries + k:
+        raise ValueError(f"集合 {collection_name} 只有 {len(vectors)} 个向量，不足以调优")
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(vectors))
+    query_vectors, base = vectors[order[:queries]], vectors[order[queries:]]
+    print(f"样本 {len(base)} 个向量，查询 {len(query_vectors)} 个，k={k}，目标召回率 {target_recall}")
+    truth = exact_neighbors(base, query_vectors, k)
+
+    tuning_name = f"{collection_name}__index_tuning"
+    collection = create_tuning_collection(tuning_name, base)
+    try:
+        results = []
+        for index_params, search_params_list in candidate_configs(len(base), k):
+            results.extend(benchmark_index(collection, index_params, search_params_list, query_vectors, truth, k))
+    finally:
+        utility.drop_collection(tuning_name)
+
+    best = recommend(results, target_recall)
+    config = {
+        "index_params": best["index_params"],
+        "search_params": best["search_params"],
+        "recall": best["recall"],
+        "p95_ms": best["p95_ms"],
+        "tuned_on": {"collection": collection_name, "sample": len(base), "queries": len(query_vectors),
+                     "k": k, "target_recall": target_recall, "time": time.strftime("%Y-%m-%d %H:%M:%S")},
+        "candidates": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    print(f"推荐: {best['index_params']['index_type']} {json.dumps(best['index_params']['params'])} "
+          f"检索参数 {json.dumps(best['search_params']['params'])}，recall@{k} {best['recall']:.3f}，"
+          f"p95 {best['p95_ms']:.1f}ms，已写入 {output}")
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Milvus索引参数自动调优")
+    parser.add_argument("--collection", required=True, help="用于抽样的已有集合")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", default=None)
+    parser.add_argument("--sample", type=int, default=20000, help="抽样向量数")
+    parser.add_argument("--queries", type=int, default=200, help="留出作为查询的向量数")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--output", default=INDEX_CONFIG_PATH)
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    from pymilvus import connections
+    load_dotenv()
+    host = args.host or os.getenv("MILVUS_HOST", "127.0.0.1")
+    port = args.port or os.getenv("MILVUS_PORT", "19530")
+    connections.connect(host=host, port=port, timeout=5)
+    tune(args.collection, args.sample, args.queries, args.k, args.target_recall, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,536 @@
+"""
+批量文档入库
+
+流水线分三级并行：
+1. 进程池并行解析、分块文件
+2. 主线程按批次计算嵌入向量（批大小按CPU吞吐调整）
+3. 后台线程按批次写入Milvus，与下一批的嵌入计算重叠
+
+文本块以内容哈希为主键，配合索引清单（index_manifest.py）增量入库：
+未变化的文件直接跳过，只有新出现的文本块会计算嵌入并写入，失效的旧文本块会被删除。
+本地BM25倒排索引（rag_common/lexical_index.py）随入库同步更新，供混合检索使用。
+每个文本块的元数据中加入馆名、朝代、材质和来源文件名（rag_common/metadata_filter.py），供过滤检索使用。
+
+命令行用法：
+    python ingest.py ./catalogue --collection museum_docs
+    python ingest.py "./pdfs/**/*.pdf" --collection museum_docs --workers 8 --embed-batch-size 128
+    python ingest.py ./catalogue --collection bench --dry-run   # 只解析和计算嵌入，测量吞吐
+    python ingest.py ./catalogue --collection museum_docs --prune   # 同时删除已不存在的文件的文本块
+"""
+import argparse
+import glob
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from doc_loader import (SUPPORTED_EXTENSIONS, STREAM_MIN_BYTES, count_pages, iter_page_chunks,
+                        load_document, split_documents)
+from index_manifest import IndexManifest
+from near_dedup import NearDuplicateIndex
+
+# BM25倒排索引和元数据抽取与后端共用rag_common（由algorithm目录安装，见requirements.txt）
+from rag_common.chunk_id import chunk_hash
+from rag_common.lexical_index import LexicalIndex
+from rag_common.metadata_filter import FileMetadata
+
+DEFAULT_PARSE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+DEFAULT_EMBED_BATCH_SIZE = 64
+DEFAULT_INSERT_BATCH_SIZE = 512
+
+
+@dataclass
+class IngestStats:
+    """入库统计"""
+    files: int = 0
+    skipped_files: int = 0    # 未变化而跳过的文件
+    failed_files: int = 0
+    chunks: int = 0
+    duplicate_chunks: int = 0  # 已入库或重复而跳过的文本块
+    near_duplicates: int = 0   # 与已有文本块近似重复而跳过的文本块
+    near_duplicate_bytes: int = 0  # 跳过的近似重复文本的字节数
+    readmitted: int = 0        # 所匹配的文本块失效后重新入库的近似重复文本块
+    vector_dim: int = 0
+    inserted: int = 0
+    deleted: int = 0
+    cached_embeddings: int = 0  # 命中嵌入缓存、未经过模型的文本块
+    parse_time: float = 0.0   # 各解析进程耗时之和
+    embed_time: float = 0.0
+    insert_time: float = 0.0
+    wall_time: float = 0.0
+
+    @property
+    def docs_per_sec(self):
+        return self.files / self.wall_time if self.wall_time else 0.0
+
+    @property
+    def chunks_per_sec(self):
+        return self.chunks / self.wall_time if self.wall_time else 0.0
+
+    def summary(self):
+        return (f"文件 {self.files} 个（未变化跳过 {self.skipped_files} 个，失败 {self.failed_files} 个），"
+                f"文本块 {self.chunks} 个（已存在 {self.duplicate_chunks} 个），"
+                f"写入 {self.inserted} 个（命中嵌入缓存 {self.cached_embeddings} 个），删除 {self.deleted} 个，"
+                f"耗时 {self.wall_time:.1f}s，"
+                f"{self.docs_per_sec:.2f} docs/s，{self.chunks_per_sec:.1f} chunks/s"
+                f"（解析 {self.parse_time:.1f}s，嵌入 {self.embed_time:.1f}s，写入 {self.insert_time:.1f}s）"
+                f"{self.near_duplicate_summary()}")
+
+    def near_duplicate_summary(self):
+        readmitted = f"\n重新入库原文本块已失效的近似重复文本块 {self.readmitted} 个" if self.readmitted else ""
+        if not self.near_duplicates:
+            return readmitted
+        # 节省的索引大小按文本字节和float32向量估算
+        saved = self.near_duplicate_bytes + self.near_duplicates * self.vector_dim * 4
+        return (f"\n近似重复跳过 {self.near_duplicates} 个文本块（占新文本块的 "
+                f"{self.near_duplicates / max(1, self.near_duplicates + self.inserted) * 100:.1f}%），"
+                f"节省索引约 {saved / 1024 / 1024:.2f} MB{readmitted}")
+
+
+def discover_files(inputs):
+    """展开目录和通配符，返回去重排序后的待入库文件列表"""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                for name in names:
+                    paths.add(os.path.join(root, name))
+        elif any(ch in item for ch in "*?["):
+            paths.update(glob.glob(item, recursive=True))
+        elif os.path.isfile(item):
+            paths.add(item)
+    return sorted(p for p in paths if os.path.splitext(p)[1].lower() in SUPPORTED_EXTENSIONS)
+
+
+def parse_file(file_path, chunk_size=1000, chunk_overlap=150):
+    """加载并分块单个文件（在解析进程中执行）
+
+    返回 (文件路径, [(文本, 元数据), ...], 耗时, 错误信息)
+    """
+    start = time.perf_counter()
+    try:
+        chunks = split_documents(load_document(file_path), chunk_size, chunk_overlap)
+        records = [(chunk.page_content, dict(chunk.metadata)) for chunk in chunks]
+        return file_path, records, time.perf_counter() - start, None
+    except Exception as e:
+        return file_path, [], time.perf_counter() - start, str(e)
+
+
+class _ParsedFile:
+    """一个文件的解析结果，迭代产出 (文本, 元数据)"""
+
+    def __init__(self, path, records, parse_time, error):
+        self.path = path
+        self.records = records
+        self.parse_time = parse_time
+        self.error = error
+
+    def __iter__(self):
+        return iter(self.records)
+
+
+class _StreamedFile(_ParsedFile):
+    """大文件在当前进程逐页解析，边解析边产出文本块，内存中只保留当前页
+
+    解析耗时和错误在迭代结束后才确定；on_page(文件) 在每页的文本块产出后调用。
+    """
+
+    def __init__(self, path, chunk_size, chunk_overlap, on_page=None):
+        super().__init__(path, None, 0.0, None)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.on_page = on_page
+        self.pages = 0
+        self.total_pages = count_pages(path)
+
+    def __iter__(self):
+        pages = iter_page_chunks(self.path, self.chunk_size, self.chunk_overlap)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(pages, None)
+            except Exception as e:
+                self.error = str(e)
+                item = None
+            self.parse_time += time.perf_counter() - start
+            if item is None:
+                return
+            self.pages, chunks = item
+            for chunk in chunks:
+                yield chunk.page_content, dict(chunk.metadata)
+            if self.on_page is not None:
+                self.on_page(self)
+
+
+def _iter_parsed(paths, workers, chunk_size, chunk_overlap, on_page=None):
+    """产出各文件的解析结果
+
+    小文件在进程池中并行解析，按完成顺序产出；超过STREAM_MIN_BYTES的大文件在当前进程逐页流式解析，
+    与进程池中小文件的解析重叠。单文件或单进程时直接在当前进程解析。
+    """
+    large = [p for p in paths if os.path.getsize(p) >= STREAM_MIN_BYTES]
+    small = [p for p in paths if os.path.getsize(p) < STREAM_MIN_BYTES]
+    if workers <= 1 or len(small) <= 1:
+        for path in large:
+            yield _StreamedFile(path, chunk_size, chunk_overlap, on_page)
+        for path in small:
+            yield _ParsedFile(*parse_file(path, chunk_size, chunk_overlap))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(parse_file, path, chunk_size, chunk_overlap) for path in small]
+        for path in large:
+            yield _StreamedFile(path, chunk_size, chunk_overlap, on_page)
+        for future in as_completed(futures):
+            yield _ParsedFile(*future.result())
+
+
+class _PipelinedWriter:
+    """后台写入线程，队列有界以限制内存中待写入的批次数"""
+
+    def __init__(self, write_batch, stats, max_pending=2):
+        self.write_batch = write_batch
+        self.stats = stats
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name="milvus-writer", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                return
+            if self.error is not None:
+                continue
+            try:
+                start = time.perf_counter()
+                self.write_batch(*batch)
+                self.stats.insert_time += time.perf_counter() - start
+                self.stats.inserted += len(batch[0])
+            except Exception as e:
+                self.error = e
+
+    def put(self, ids, texts, vectors, metadatas):
+        if self.error is not None:
+            raise self.error
+        self.queue.put((ids, texts, vectors, metadatas))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+def create_milvus_writer(embeddings, collection_name, host, port, index_params=None, search_params=None,
+                         partition_key_field=None):
+    """返回写入和按主键删除Milvus文本块的函数，集合不存在时在首次写入时创建
+
+    未指定索引参数时使用index_tuner.py的推荐配置；partition_key_field为新建集合的分区键字段
+    """
+    from langchain_milvus import Milvus
+    from index_tuner import load_index_config
+    from milvus_manager import PRIMARY_FIELD, TEXT_FIELD, VECTOR_FIELD
+
+    if index_params is None:
+        index_params, search_params = load_index_config()
+    vectorstore = Milvus(
+        embedding_function=embeddings,
+        collection_name=collection_name,
+        connection_args={"host": host, "port": port},
+        index_params=index_params,
+        search_params=search_params,
+        partition_key_field=partition_key_field,
+        primary_field=PRIMARY_FIELD,
+        text_field=TEXT_FIELD,
+        vector_field=VECTOR_FIELD,
+    )
+
+    def write_batch(ids, texts, vectors, metadatas):
+        vectorstore.add_embeddings(texts=texts, embeddings=vectors, metadatas=metadatas, ids=ids)
+
+    def delete_ids(ids):
+        for i in range(0, len(ids), DEFAULT_INSERT_BATCH_SIZE):
+            vectorstore.delete(ids=ids[i:i + DEFAULT_INSERT_BATCH_SIZE])
+
+    return write_batch, delete_ids
+
+
+def create_local_writer(embeddings, collection_name):
+    """返回写入和按主键删除本地向量存储文本块的函数，集合不存在时在首次写入时创建"""
+    from local_vectorstore import get_store
+
+    store = get_store(collection_name, embeddings)
+
+    def write_batch(ids, texts, vectors, metadatas):
+        store.add_embeddings(texts=texts, embeddings=vectors, metadatas=metadatas, ids=ids)
+
+    def delete_ids(ids):
+        store.delete(ids=ids)
+
+    return write_batch, delete_ids
+
+
+def ingest_files(paths, collection_name, embeddings, host, port,
+                 workers=DEFAULT_PARSE_WORKERS, embed_batch_size=DEFAULT_EMBED_BATCH_SIZE,
+                 insert_batch_size=DEFAULT_INSERT_BATCH_SIZE, chunk_size=1000, chunk_overlap=150,
+                 write_batch=None, delete_ids=None, manifest=None, lexical=None, near_dup=None, source_keys=None,
+                 prune_missing=False, progress=None, page_progress=None):
+    """并行解析、批量嵌入、流水线写入
+
+    write_batch(ids, texts, vectors, metadatas) 和 delete_ids(ids) 为空时读写Milvus；
+    manifest 为空时只在本次入库内去重；
+    lexical 为本地BM25倒排索引（rag_common.lexical_index.LexicalIndex），随入库同步增删；
+    near_dup 为近似重复检测索引（near_dedup.NearDuplicateIndex），与已有文本块近似重复的新文本块不写入，
+        作为别名记入清单，所匹配的文本块在本次或之后的入库中失效时重新入库；
+    source_keys 为文件路径到清单中来源名的映射，默认使用绝对路径；
+    prune_missing 为True时删除清单中已不存在的文件及其文本块；
+    progress(已完成文件数, 文件总数, 文件路径, 统计) 在每个文件解析完成后调用；
+    page_progress(文件路径, 已解析页数, 总页数或None, 统计) 在流式解析的大文件每解析完一页后调用。
+
+    内存占用与文件大小无关：大文件逐页解析，待嵌入和待写入的文本块都按批次有界。
+    """
+    stats = IngestStats()
+    start = time.perf_counter()
+    if write_batch is None:
+        write_batch, milvus_delete = create_milvus_writer(embeddings, collection_name, host, port)
+        delete_ids = delete_ids or milvus_delete
+    source_keys = source_keys or {}
+
+    def source_of(path):
+        return source_keys.get(path) or os.path.abspath(path)
+
+    # 跳过与清单记录一致的文件
+    stale = []
+    if manifest is not None:
+        if prune_missing:
+            # 只检查以绝对路径记录的来源，界面上传的文件没有对应的本地路径
+            for source in [s for s in manifest.files if os.path.isabs(s) and not os.path.exists(s)]:
+                stale.extend(manifest.remove_file(source))
+        changed = [p for p in paths if not manifest.is_unchanged(source_of(p), p)]
+        stats.skipped_files = len(paths) - len(changed)
+        stats.files = stats.skipped_files
+        paths = changed
+
+    writer = _PipelinedWriter(write_batch, stats)
+    queued = set()  # 本次已排队写入的文本块哈希
+    orphans = []    # 流式解析中途失败的文件已写入的文本块，入库结束后删除
+
+    pending = []    # 待嵌入的 (id, 文本, 元数据)
+    embedded = ([], [], [], [])  # 待写入的 ids, texts, vectors, metadatas
+
+    def embed_pending():
+        if not pending:
+            return
+        t = time.perf_counter()
+        hits = getattr(embeddings, "hits", 0)
+        vectors = embeddings.embed_documents([text for _, text, _ in pending])
+        stats.vector_dim = len(vectors[0]) if len(vectors) else stats.vector_dim
+        stats.embed_time += time.perf_counter() - t
+        stats.cached_embeddings += getattr(embeddings, "hits", 0) - hits
+        for (chunk_id, text, metadata), vector in zip(pending, vectors):
+            embedded[0].append(chunk_id)
+            embedded[1].append(text)
+            embedded[2].append(vector)
+            embedded[3].append(metadata)
+        pending.clear()
+
+    def flush_embedded(force=False):
+        while embedded[0] and (force or len(embedded[0]) >= insert_batch_size):
+            batch = tuple(column[:insert_batch_size] for column in embedded)
+            for column in embedded:
+                del column[:insert_batch_size]
+            writer.put(*batch)
+
+    def queue_chunk(h, text, metadata):
+        queued.add(h)
+        pending.append((h, text, metadata))
+        if len(pending) >= embed_batch_size:
+            embed_pending()
+            flush_embedded()
+
+    def readmit_aliases(released):
+        """所匹配的文本块已失效的别名重新检测：与其他文本块近似重复时改为指向它，否则重新入库"""
+        if near_dup is not None:
+            near_dup.remove(released)
+        for source, h, alias in manifest.orphaned_aliases(released):
+            exists = h in queued or manifest.has_chunk(h)
+            duplicate_of = None
+            if near_dup is not None and not exists:
+                duplicate_of = near_dup.check_and_add(h, alias["text"])
+            manifest.resolve_alias(source, h, duplicate_of)
+            if duplicate_of is not None:
+                continue
+            stats.readmitted += 1
+            if near_dup is not None:
+                near_dup.add(h, alias["text"])
+            if lexical is not None:
+                lexical.add([h], [alias["text"]], [alias["metadata"]])
+            if not exists:
+                queue_chunk(h, alias["text"], alias["metadata"])
+
+    def on_page(parsed):
+        if page_progress is not None:
+            stats.wall_time = time.perf_counter() - start
+            page_progress(parsed.path, parsed.pages, parsed.total_pages, stats)
+
+    try:
+        for done, parsed in enumerate(_iter_parsed(paths, workers, chunk_size, chunk_overlap, on_page), start=1):
+            path = parsed.path
+            file_hashes = {}  # 保持顺序的去重集合
+            new_hashes = []   # 本文件新排队写入的文本块
+            aliases = {}      # 近似重复而未写入的文本块 -> 别名记录
+            file_metadata = FileMetadata(source_of(path))
+            # 本次入库中已失效的文本块和本文件原有的文本块不作为近似重复的匹配对象，
+            # 否则修改后的文本块匹配到自身的旧版本而被跳过，旧版本随后失效，两者都不在索引中
+            released = set(stale)
+            if manifest is not None:
+                released.update(manifest.chunks_of(source_of(path)))
+            for text, metadata in parsed:
+                metadata.update(file_metadata.extract(text))
+                h = chunk_hash(text)
+                if h in file_hashes or h in aliases:
+                    stats.duplicate_chunks += 1
+                    continue
+                stats.chunks += 1
+                exists = h in queued or (manifest is not None and manifest.has_chunk(h))
+                if near_dup is not None:
+                    if exists:
+                        near_dup.add(h, text)
+                    else:
+                        duplicate_of = near_dup.check_and_add(h, text, released)
+                        if duplicate_of is not None:
+                            aliases[h] = {"of": duplicate_of, "text": text, "metadata": metadata}
+                            stats.near_duplicates += 1
+                            stats.near_duplicate_bytes += len(text.encode("utf-8"))
+                            continue
+                file_hashes[h] = None
+                if lexical is not None:
+                    # 已入库但索引中缺失的文本块（如启用混合检索前入库的）也补进倒排索引
+                    lexical.add([h], [text], [metadata])
+                if exists:
+                    stats.duplicate_chunks += 1
+                    continue
+                new_hashes.append(h)
+                queue_chunk(h, text, metadata)
+            stats.files += 1
+            stats.parse_time += parsed.parse_time
+            error = parsed.error
+            if error:
+                stats.failed_files += 1
+                orphans.extend(new_hashes)
+                print(f"解析文件失败 {path}: {error}")
+            if manifest is not None and not error:
+                stale.extend(manifest.update_file(source_of(path), path, file_hashes, aliases))
+            stats.wall_time = time.perf_counter() - start
+            if progress is not None:
+                progress(done, len(paths), path, stats)
+        # 同一批内重新出现的文本块不删除
+        stale = [h for h in dict.fromkeys(stale) if h not in queued and not (manifest and manifest.has_chunk(h))]
+        # 解析失败的文件不记入清单，其已写入且没有被其他文件引用的文本块一并删除，下次入库时重新处理
+        stale += [h for h in orphans if manifest is not None and not manifest.has_chunk(h)]
+        if manifest is not None and stale:
+            readmit_aliases(set(stale))
+            stale = [h for h in stale if not manifest.has_chunk(h)]
+        embed_pending()
+        flush_embedded(force=True)
+    finally:
+        writer.close()
+
+    # 先写入新文本块（含重新入库的别名）再删除旧文本块，避免检索出现空窗
+    if stale and delete_ids is not None:
+        delete_ids(stale)
+        stats.deleted = len(stale)
+    if lexical is not None:
+        lexical.remove(stale)
+        lexical.save()
+    if near_dup is not None and near_dup.path is not None:
+        near_dup.remove(stale)
+        near_dup.save()
+    if manifest is not None:
+        manifest.save()
+    stats.wall_time = time.perf_counter() - start
+    return stats
+
+
+def print_page_progress(path, pages, total_pages, stats):
+    total = f"/{total_pages}" if total_pages else ""
+    print(f"  {os.path.basename(path)} 第 {pages}{total} 页 | 文本块 {stats.chunks} | 已写入 {stats.inserted}")
+
+
+def print_progress(done, total, path, stats):
+    print(f"[{done}/{total}] {os.path.basename(path)} | 文本块 {stats.chunks} | 已写入 {stats.inserted} | "
+          f"{stats.docs_per_sec:.2f} docs/s, {stats.chunks_per_sec:.1f} chunks/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量解析文档并写入Milvus")
+    parser.add_argument("inputs", nargs="+", help="文件、目录或通配符（如 './pdfs/**/*.pdf'）")
+    parser.add_argument("--collection", default="default_collection")
+    parser.add_argument("--host", default=None, help="默认读取MILVUS_HOST")
+    parser.add_argument("--port", default=None, help="默认读取MILVUS_PORT")
+    parser.add_argument("--workers", type=int, default=DEFAULT_PARSE_WORKERS, help="解析进程数")
+    parser.add_argument("--embed-batch-size", type=int, default=DEFAULT_EMBED_BATCH_SIZE)
+    parser.add_argument("--insert-batch-size", type=int, default=DEFAULT_INSERT_BATCH_SIZE)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=150)
+    parser.add_argument("--dry-run", action="store_true", help="不写入Milvus，仅测量解析和嵌入吞吐")
+    parser.add_argument("--no-cache", action="store_true", help="不使用嵌入缓存（测量模型吞吐时使用）")
+    parser.add_argument("--full", action="store_true", help="忽略索引清单，重新解析所有文件（同时补全BM25倒排索引）")
+    parser.add_argument("--prune", action="store_true", help="删除清单中已不存在的文件的文本块")
+    parser.add_argument("--near-dup-threshold", type=float, default=None,
+                        help="近似重复检测阈值，默认读取NEAR_DUP_THRESHOLD（0.85），0为关闭")
+    args = parser.parse_args()
+
+    paths = discover_files(args.inputs)
+    if not paths:
+        print("没有找到可入库的文件")
+        return
+    print(f"共 {len(paths)} 个文件，解析进程 {args.workers} 个，嵌入批大小 {args.embed_batch_size}")
+
+    # 延迟导入，避免解析子进程加载嵌入模型和界面
+    import main as rag
+    host = args.host or rag.MILVUS_HOST
+    port = args.port or rag.MILVUS_PORT
+    write_batch, delete_ids = (lambda *batch: None), None
+    # 试运行不读写清单，保证每次都测量完整的解析和嵌入
+    manifest = None
+    lexical = None
+    near_dup = None
+    threshold = rag.NEAR_DUP_THRESHOLD if args.near_dup_threshold is None else args.near_dup_threshold
+    if threshold > 0:
+        # 试运行时只在本次内检测，不读写已保存的签名
+        near_dup = NearDuplicateIndex(threshold=threshold)
+    if not args.dry_run:
+        manifest = IndexManifest.load(args.collection, host, port)
+        lexical = LexicalIndex.load(args.collection, host, port, rag.LEXICAL_INDEX_DIR)
+        if threshold > 0:
+            near_dup = NearDuplicateIndex.load(args.collection, host, port, threshold)
+        if args.full:
+            manifest = IndexManifest(manifest.path, {
+                source: dict(entry, size=-1) for source, entry in manifest.files.items()
+            })
+    if not args.dry_run:
+        connected, msg = rag.check_milvus_connection(host, port)
+        if not connected:
+            print(msg)
+            return
+        write_batch, delete_ids = rag.create_writer(args.collection, host, port)
+
+    embeddings = rag.embeddings
+    if args.no_cache and hasattr(embeddings, "cache"):
+        embeddings = embeddings.embeddings
+    stats = ingest_files(
+        paths, args.collection, embeddings, host, port,
+        workers=args.workers, embed_batch_size=args.embed_batch_size,
+        insert_batch_size=args.insert_batch_size, chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap, write_batch=write_batch, delete_ids=delete_ids, manifest=manifest,
+        lexical=lexical, near_dup=near_dup, prune_missing=args.prune, progress=print_progress, page_progress=print_page_progress,
+    )
+    print(stats.summary())
+
+
+if __name__ == "__main__":
+    main()
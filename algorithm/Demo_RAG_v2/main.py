@@ -1,13 +1,30 @@
 import os
 from dotenv import load_dotenv
-from langchain_community.document_loaders import TextLoader, PyPDFLoader, Docx2txtLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_milvus import Milvus
 import gradio as gr
 from pymilvus import connections, Collection, FieldSchema, CollectionSchema, DataType, utility
-import requests
+import asyncio
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.documents import Document
+from ingest import ingest_files, create_milvus_writer, create_local_writer
+from index_manifest import IndexManifest
+# 大模型调用通过llm_gateway共用的网关客户端，嵌入缓存、BM25倒排索引、重排序和元数据过滤等检索模块与后端共用rag_common
+# （两者由algorithm目录安装，见requirements.txt）
+from rag_common.embedding_cache import EmbeddingCache, CachedEmbeddings
+from rag_common import lexical_index
+from rag_common.chunk_id import chunk_hash
+from rag_common.reranker import CrossEncoderReranker
+from rag_common.metadata_filter import (FILTER_FIELDS, MAX_FIELD_LENGTH, FileMetadata, build_filter_expr,
+                                        metadata_matcher, parse_filters)
+import local_vectorstore
+from index_tuner import load_index_config
+from compact_index import compact_index_params, compact_search_params, rescore, squared_l2, stored_distances
+from near_dedup import NearDuplicateIndex
+from milvus_manager import MilvusConnectionManager, PRIMARY_FIELD, PRIMARY_KEY_LENGTH, TEXT_FIELD, VECTOR_FIELD
+from llm_gateway import GatewayError, get_gateway
 
 # 加载环境变量
 load_dotenv()
@@ -21,6 +38,53 @@ ONEAPI_BASE_URL = os.getenv("ONEAPI_BASE_URL", "https://api.siliconflow.cn/v1")
 ONEAPI_API_KEY = os.getenv("ONEAPI_API_KEY", "")  # 从环境变量加载API密钥
 ONEAPI_MODEL = os.getenv("ONEAPI_MODEL", "Qwen/Qwen2.5-VL-72B-Instruct") 
 
+# 大语言模型请求超时（秒）、并发上限（同时也是连接池大小）和失败重试次数
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+llm_gateway = get_gateway()
+llm_gateway.register("oneapi", ONEAPI_BASE_URL, ONEAPI_API_KEY, max_concurrency=LLM_MAX_CONNECTIONS,
+                     timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES)
+
+# 向量存储：milvus，或local（进程内向量存储，不需要Milvus服务，见local_vectorstore.py）
+VECTOR_STORE = os.getenv("VECTOR_STORE", "milvus").lower()
+USE_LOCAL_STORE = VECTOR_STORE == "local"
+
+# Milvus健康检查结果的缓存时间（秒），期间各请求不再重复连接和列出集合
+MILVUS_RECHECK_INTERVAL = float(os.getenv("MILVUS_RECHECK_INTERVAL", "30"))
+milvus_manager = MilvusConnectionManager(recheck_interval=MILVUS_RECHECK_INTERVAL)
+
+# 以某个元数据字段（如museum）作为Milvus分区键，新建的集合按该字段分区，带该字段的过滤检索只搜索相应分区；为空时不分区
+MILVUS_PARTITION_KEY = os.getenv("MILVUS_PARTITION_KEY", "")
+
+# 紧凑模式：新建的Milvus集合使用量化索引（IVF_SQ8 或 IVF_PQ），内存占用为float32的1/4到1/32；
+# 检索时先取RESCORE_FACTOR倍的候选，再用嵌入缓存中的全精度向量重新计算距离排序（见compact_index.py），
+# 关闭嵌入缓存时没有全精度向量，不做重打分
+COMPACT_INDEX = os.getenv("COMPACT_INDEX", "").upper()
+COMPACT_NLIST = int(os.getenv("COMPACT_NLIST", "1024"))
+COMPACT_NPROBE = int(os.getenv("COMPACT_NPROBE", "32"))
+RESCORE_FACTOR = int(os.getenv("RESCORE_FACTOR", "4"))
+USE_COMPACT_INDEX = bool(COMPACT_INDEX) and not USE_LOCAL_STORE
+
+# 混合检索：向量检索结果与本地BM25倒排索引做倒数排名融合，设为false时只用向量检索
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+
+# 交叉编码器重排序：设置RERANK_MODEL后开启，先检索RERANK_CANDIDATES个候选，
+# 重排序后取前top_k个交给大语言模型；RERANK_TIME_BUDGET_MS限制每次重排序的耗时
+RERANK_MODEL = os.getenv("RERANK_MODEL", "")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_TIME_BUDGET_MS = int(os.getenv("RERANK_TIME_BUDGET_MS", "300"))
+
+# 入库时的近似重复检测阈值（MinHash估计的Jaccard相似度），与已有文本块相似度不低于该值的文本块不写入；设为0关闭
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.85"))
+
+# 嵌入向量缓存目录，设为空字符串时关闭缓存；与后端指向同一目录可共享缓存
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_cache"))
+
+# BM25倒排索引目录；后端的LEXICAL_INDEX_DIR指向同一目录即可读取
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "lexical_index"))
+
 # 初始化嵌入模型 - 使用可靠的公开模型，带错误处理
 def initialize_embedding_model():
     # 首选模型列表，按优先级排序
@@ -56,12 +120,28 @@ def get_embedding_dimension(model_name):
 try:
     embeddings, actual_model_name, EMBEDDING_DIMENSION = initialize_embedding_model()
     print(f"使用嵌入模型: {actual_model_name}, 维度: {EMBEDDING_DIMENSION}")
+    # 入库和查询共用持久化缓存，已计算过的文本不再经过模型
+    if EMBEDDING_CACHE_DIR:
+        embeddings = CachedEmbeddings(embeddings, EmbeddingCache(EMBEDDING_CACHE_DIR, actual_model_name))
+        print(f"嵌入缓存: {EMBEDDING_CACHE_DIR}（已缓存 {len(embeddings.cache)} 条）")
 except Exception as e:
     print(f"初始化嵌入模型失败: {str(e)}")
     print("使用默认值，但程序可能无法正常运行")
     actual_model_name = "加载失败"
     EMBEDDING_DIMENSION = 384
 
+# 紧凑模式重打分读取的全精度向量（入库时写入嵌入缓存），检索时不经过嵌入模型
+RESCORE_CACHE = embeddings.cache if USE_COMPACT_INDEX and isinstance(embeddings, CachedEmbeddings) else None
+USE_RESCORE = RESCORE_CACHE is not None
+if USE_COMPACT_INDEX and not USE_RESCORE:
+    print("紧凑模式未开启嵌入缓存（EMBEDDING_CACHE_DIR），没有全精度向量，检索结果不做重打分")
+
+# 初始化重排序模型（首次重排序时加载）
+reranker = None
+if RERANK_MODEL:
+    reranker = CrossEncoderReranker(RERANK_MODEL, batch_size=RERANK_BATCH_SIZE, time_budget_ms=RERANK_TIME_BUDGET_MS)
+    print(f"重排序模型: {RERANK_MODEL}，候选数 {RERANK_CANDIDATES}，时间预算 {RERANK_TIME_BUDGET_MS}ms")
+
 # Milvus部署信息
 MILVUS_DEPLOYMENT_GUIDE = """
 ## Milvus部署指南
@@ -90,50 +170,137 @@ docker-compose down
 ```
 """
 
-# 调用大语言模型API
+# 大语言模型API的请求体
+def llm_payload(prompt, temperature=0.7, max_tokens=1024):
+    return {
+        "model": ONEAPI_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "stream": False,
+        "max_tokens": max_tokens,
+        "enable_thinking": False,
+        "thinking_budget": 512,
+        "min_p": 0.05,
+        "stop": None,
+        "temperature": temperature,
+        "top_p": 0.7,
+        "top_k": 50,
+        "frequency_penalty": 0.5,
+        "n": 1,
+        "response_format": {"type": "text"}
+    }
+
+# 网关请求失败时的错误提示
+def llm_error_message(error):
+    if error.status_code == 401:
+        # 处理认证错误，如令牌额度用尽
+        try:
+            error_message = json.loads(error.body).get("error", {}).get("message", "未知错误")
+        except (ValueError, TypeError, AttributeError):
+            error_message = "未知错误"
+        return f"API认证错误: {error_message}\n\n请检查API密钥是否有效或账户余额是否充足。"
+    if error.status_code is not None:
+        return f"API调用失败: {error.status_code} - {error.body}"
+    return f"调用LLM时出错: {str(error)}"
+
+# 调用大语言模型API（经网关：连接复用、并发限制、429/5xx退避重试、熔断）
 def query_llm(prompt, temperature=0.7, max_tokens=1024):
     try:
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {ONEAPI_API_KEY}"
-        }
+        result = llm_gateway.chat_completions("oneapi", llm_payload(prompt, temperature, max_tokens))
+        return result["choices"][0]["message"]["content"]
+    except GatewayError as e:
+        return llm_error_message(e)
+    except Exception as e:
+        return f"调用LLM时出错: {str(e)}"
+
+# 流式调用大语言模型API，逐段产出回答文本；出错时产出错误提示
+async def query_llm_stream(prompt, temperature=0.7, max_tokens=1024):
+    try:
+        async for content in llm_gateway.stream_chat_completions("oneapi", llm_payload(prompt, temperature, max_tokens)):
+            yield content
+    except GatewayError as e:
+        yield llm_error_message(e)
+    except Exception as e:
+        yield f"调用LLM时出错: {str(e)}"
+
+# 文档去重，使用文档内容的前100个字符作为去重键
+def dedupe_docs(docs_with_scores):
+    unique_docs = {}
+    for doc, score in docs_with_scores:
+        unique_docs.setdefault(doc.page_content[:100], (doc, score))
+    return list(unique_docs.values())
+
+# 文档去重和过滤，返回作为上下文的文档
+# 开启重排序时由交叉编码器选出前top_k个，否则按相似度阈值过滤
+def select_context_docs(docs_with_scores, query=None, top_k=None):
+    if reranker is not None and query is not None:
+        return reranker.rerank(query, dedupe_docs(docs_with_scores), top_k or len(docs_with_scores))
+    
+    filtered_docs = []
+    for doc, score in dedupe_docs(docs_with_scores):
+        # 相似度过滤（可选）：只保留相似度较高的文档
+        similarity = max(0, min(100, 100 * (1 - score / 100)))
+        if similarity > 60:  # 只保留相似度高于60%的文档
+            filtered_docs.append((doc, score))
+    
+    # 如果过滤后没有文档，使用原始文档集
+    if not filtered_docs:
+        filtered_docs = docs_with_scores[:1]  # 至少保留最相关的一个
+    return filtered_docs
+
+# 检索数量：开启重排序时取更宽的候选集
+def retrieval_k(top_k):
+    return max(top_k, RERANK_CANDIDATES) if reranker is not None else top_k
+
+# 构建知识库问答提示词
+def build_qa_prompt(query, filtered_docs):
+    context_texts = []
+    for i, (doc, score) in enumerate(filtered_docs):
+        # 计算相似度用于在上下文中显示
+        similarity = max(0, min(100, 100 * (1 - score / 100)))
+        # 加入相似度信息帮助模型判断内容可靠性
+        context_texts.append(f"文档 {i+1} (相似度: {similarity:.2f}%):\n{doc.page_content}")
+    
+    context = "\n\n".join(context_texts)
+    
+    # 改进提示词模板，更明确地指导模型
+    prompt = f"""请作为一个专业的文档问答助手，基于以下参考文档回答用户的问题。
+        如果参考文档中包含问题的答案，请详细解释。
+        如果参考文档中没有与问题直接相关的信息，请明确回答"根据提供的文档无法回答这个问题"。
         
-        payload = {
-            "model": ONEAPI_MODEL,
-            "messages": [{"role": "user", "content": prompt}],
-            "stream": False,
-            "max_tokens": max_tokens,
-            "enable_thinking": False,
-            "thinking_budget": 512,
-            "min_p": 0.05,
-            "stop": None,
-            "temperature": temperature,
-            "top_p": 0.7,
-            "top_k": 50,
-            "frequency_penalty": 0.5,
-            "n": 1,
-            "response_format": {"type": "text"}
-        }
+        请仔细分析每个参考文档的内容和相关性，重点关注相似度较高的文档。
+        不要编造信息，如果不确定，请说明。
         
-        response = requests.post(f"{ONEAPI_BASE_URL}/chat/completions", 
-                                headers=headers, 
-                                json=payload)
+        用户问题: {query}
         
-        if response.status_code == 200:
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-        elif response.status_code == 401:
-            # 处理认证错误，如令牌额度用尽
-            error_data = response.json()
-            error_message = error_data.get("error", {}).get("message", "未知错误")
-            return f"API认证错误: {error_message}\n\n请检查API密钥是否有效或账户余额是否充足。"
-        else:
-            return f"API调用失败: {response.status_code} - {response.text}"
-    except Exception as e:
-        return f"调用LLM时出错: {str(e)}"
+        参考文档:
+        {context}
+        
+        基于上述文档的专业回答:"""
+    return prompt
+
+# 构建问答结果显示
+def format_qa_result(query, answer, filtered_docs):
+    result = f"### 问题: {query}\n\n"
+    result += f"### 回答:\n{answer}\n\n"
+    result += "### 参考文档:\n"
+    
+    for i, (doc, score) in enumerate(filtered_docs):
+        # 计算相似度百分比
+        similarity = max(0, min(100, 100 * (1 - score / 100)))
+        metadata = doc.metadata if hasattr(doc, "metadata") else {}
+        source = metadata.get("source", "未知来源")
+        
+        result += f"#### 文档 {i+1} (相似度: {similarity:.2f}%)\n"
+        if "rerank_score" in metadata:
+            result += f"**重排序得分**: {metadata['rerank_score']:.3f}\n"
+        result += f"**来源**: {source}\n"
+        result += f"**内容**: {doc.page_content[:200]}...\n\n"
+    
+    return result
 
 # 基于检索增强生成的知识库问答
-def rag_qa(query, collection_name, host=MILVUS_HOST, port=MILVUS_PORT, top_k=3):
+# filters为元数据过滤条件，见rag_common/metadata_filter.py
+def rag_qa(query, collection_name, host=MILVUS_HOST, port=MILVUS_PORT, top_k=3, filters=None):
     try:
         # 检查连接
         connected, msg = check_milvus_connection(host, port)
@@ -141,53 +308,16 @@ def rag_qa(query, collection_name, host=MILVUS_HOST, port=MILVUS_PORT, top_k=3):
             return f"错误: {msg}"
             
         # 检索相关文档
-        docs_with_scores = query_documents(query, collection_name, host, port, top_k)
+        docs_with_scores = query_documents(query, collection_name, host, port, retrieval_k(top_k), filters)
         
         if not docs_with_scores:
             return "未找到匹配的文档，无法生成回答。请尝试修改您的查询或确保已索引相关内容。"
             
         # 文档去重和过滤
-        unique_docs = {}
-        filtered_docs = []
-        for doc, score in docs_with_scores:
-            # 使用文档内容的前100个字符作为去重键
-            doc_key = doc.page_content[:100]
-            # 仅保留未见过的文档
-            if doc_key not in unique_docs:
-                # 相似度过滤（可选）：只保留相似度较高的文档
-                similarity = max(0, min(100, 100 * (1 - score / 100)))
-                if similarity > 60:  # 只保留相似度高于60%的文档
-                    unique_docs[doc_key] = (doc, score)
-                    filtered_docs.append((doc, score))
-        
-        # 如果过滤后没有文档，使用原始文档集
-        if not filtered_docs:
-            filtered_docs = docs_with_scores[:1]  # 至少保留最相关的一个
+        filtered_docs = select_context_docs(docs_with_scores, query, top_k)
             
         # 构建提示词
-        context_texts = []
-        for i, (doc, score) in enumerate(filtered_docs):
-            # 计算相似度用于在上下文中显示
-            similarity = max(0, min(100, 100 * (1 - score / 100)))
-            # 加入相似度信息帮助模型判断内容可靠性
-            context_texts.append(f"文档 {i+1} (相似度: {similarity:.2f}%):\n{doc.page_content}")
-        
-        context = "\n\n".join(context_texts)
-        
-        # 改进提示词模板，更明确地指导模型
-        prompt = f"""请作为一个专业的文档问答助手，基于以下参考文档回答用户的问题。
-        如果参考文档中包含问题的答案，请详细解释。
-        如果参考文档中没有与问题直接相关的信息，请明确回答"根据提供的文档无法回答这个问题"。
-        
-        请仔细分析每个参考文档的内容和相关性，重点关注相似度较高的文档。
-        不要编造信息，如果不确定，请说明。
-        
-        用户问题: {query}
-        
-        参考文档:
-        {context}
-        
-        基于上述文档的专业回答:"""
+        prompt = build_qa_prompt(query, filtered_docs)
         
         # 添加调试信息
         print(f"提问: {query}")
@@ -197,121 +327,353 @@ def rag_qa(query, collection_name, host=MILVUS_HOST, port=MILVUS_PORT, top_k=3):
         answer = query_llm(prompt)
         
         # 构建结果显示
-        result = f"### 问题: {query}\n\n"
-        result += f"### 回答:\n{answer}\n\n"
-        result += "### 参考文档:\n"
-        
-        for i, (doc, score) in enumerate(filtered_docs):
-            # 计算相似度百分比
-            similarity = max(0, min(100, 100 * (1 - score / 100)))
-            metadata = doc.metadata if hasattr(doc, "metadata") else {}
-            source = metadata.get("source", "未知来源")
-            
-            result += f"#### 文档 {i+1} (相似度: {similarity:.2f}%)\n"
-            result += f"**来源**: {source}\n"
-            result += f"**内容**: {doc.page_content[:200]}...\n\n"
-        
-        return result
+        return format_qa_result(query, answer, filtered_docs)
     except Exception as e:
         import traceback
         trace = traceback.format_exc()
         return f"知识库问答出错: {str(e)}\n\n调试信息:\n{trace}"
 
-# 检查Milvus连接状态
-def check_milvus_connection(host, port):
+# 流式知识库问答：异步生成器，每次产出当前完整的结果（Markdown），供Gradio流式显示
+# 检索和重排序在线程池中执行，不阻塞事件循环；检索完成即显示参考文档，回答逐段追加，
+# 结束时附上检索耗时和首字延迟（TTFT，从提问到收到第一段回答）
+async def rag_qa_stream(query, collection_name, host=MILVUS_HOST, port=MILVUS_PORT, top_k=3, filters=None):
+    start = time.perf_counter()
     try:
-        connections.connect(host=host, port=port, timeout=5)
-        # 尝试获取集合列表，验证连接是否有效
-        utility.list_collections()
-        return True, "连接成功！Milvus服务器运行正常。"
+        yield f"### 问题: {query}\n\n正在检索相关文档..."
+        connected, msg = await asyncio.to_thread(check_milvus_connection, host, port)
+        if not connected:
+            yield f"错误: {msg}"
+            return
+        
+        docs_with_scores = await asyncio.to_thread(
+            query_documents, query, collection_name, host, port, retrieval_k(top_k), filters)
+        if not docs_with_scores:
+            yield "未找到匹配的文档，无法生成回答。请尝试修改您的查询或确保已索引相关内容。"
+            return
+        filtered_docs = await asyncio.to_thread(select_context_docs, docs_with_scores, query, top_k)
+        retrieval_ms = (time.perf_counter() - start) * 1000
+        yield format_qa_result(query, "正在生成回答...", filtered_docs)
+        
+        answer = ""
+        ttft_ms = None
+        async for token in query_llm_stream(build_qa_prompt(query, filtered_docs)):
+            if ttft_ms is None:
+                ttft_ms = (time.perf_counter() - start) * 1000
+            answer += token
+            yield format_qa_result(query, answer, filtered_docs)
+        
+        total_s = time.perf_counter() - start
+        ttft = f"{ttft_ms:.0f}ms" if ttft_ms is not None else "无"
+        print(f"提问: {query} | 检索 {retrieval_ms:.0f}ms | 首字 {ttft} | 总耗时 {total_s:.1f}s")
+        yield (format_qa_result(query, answer, filtered_docs)
+               + f"\n---\n检索耗时 {retrieval_ms:.0f}ms，首字延迟(TTFT) {ttft}，总耗时 {total_s:.1f}s\n")
     except Exception as e:
-        return False, f"无法连接到Milvus服务器: {str(e)}\n\n故障排除建议:\n1. 确保Milvus服务器已启动\n2. 检查主机和端口是否正确\n3. 检查网络连接"
+        import traceback
+        trace = traceback.format_exc()
+        yield f"知识库问答出错: {str(e)}\n\n调试信息:\n{trace}"
 
-# 文档加载函数 - 根据文件类型选择合适的加载器
-def load_document(file_path):
-    _, file_extension = os.path.splitext(file_path)
-    
-    if file_extension.lower() == ".txt":
-        loader = TextLoader(file_path, encoding="utf-8")
-    elif file_extension.lower() == ".pdf":
-        loader = PyPDFLoader(file_path)
-    elif file_extension.lower() in [".docx", ".doc"]:
-        loader = Docx2txtLoader(file_path)
-    else:
-        raise ValueError(f"不支持的文件类型: {file_extension}")
-    
-    documents = loader.load()
-    return documents
-
-# 文档分块
-def split_documents(documents, chunk_size=1000, chunk_overlap=150):
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len,
-    )
-    chunks = text_splitter.split_documents(documents)
-    return chunks
+# 检查Milvus连接状态，结果缓存MILVUS_RECHECK_INTERVAL秒
+def check_milvus_connection(host, port, force=False):
+    if USE_LOCAL_STORE:
+        return True, f"使用本地向量存储（{local_vectorstore.LOCAL_VECTOR_STORE_DIR}），无需连接Milvus。"
+    return milvus_manager.check(host, port, force=force)
+
+# 界面"测试连接"按钮：忽略缓存重新检查
+def test_milvus_connection(host, port):
+    return check_milvus_connection(host, port, force=True)
+
+# 界面问答入口（流式输出），过滤条件为文本，如"博物馆=故宫博物院，朝代=明|清"
+async def process_qa(query, collection_name, host, port, top_k, filter_text=""):
+    try:
+        filters = parse_filters(filter_text)
+    except ValueError as e:
+        yield f"过滤条件有误: {str(e)}"
+        return
+    async for result in rag_qa_stream(query, collection_name, host, port, int(top_k), filters):
+        yield result
 
 # 将文档块存入Milvus - 使用正确的Milvus类
+# 同时写入本地BM25倒排索引，文本块以内容哈希为主键
 def store_in_milvus(chunks, collection_name, host=MILVUS_HOST, port=MILVUS_PORT):
-    vectorstore = Milvus.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        connection_args={"host": host, "port": port},
-        collection_name=collection_name,
-    )
+    ids = [chunk_hash(chunk.page_content) for chunk in chunks]
+    file_metadata = {}
+    for chunk in chunks:
+        source = chunk.metadata.get("source", "")
+        extractor = file_metadata.setdefault(source, FileMetadata(source))
+        chunk.metadata.update(extractor.extract(chunk.page_content))
+    if USE_LOCAL_STORE:
+        vectorstore = local_vectorstore.LocalVectorStore.from_documents(chunks, embeddings, collection_name, ids=ids)
+    else:
+        index_params, search_params = collection_index_config()
+        vectorstore = Milvus.from_documents(
+            documents=chunks,
+            embedding=embeddings,
+            connection_args={"host": host, "port": port},
+            collection_name=collection_name,
+            ids=ids,
+            index_params=index_params,
+            search_params=search_params,
+            partition_key_field=MILVUS_PARTITION_KEY or None,
+            primary_field=PRIMARY_FIELD,
+            text_field=TEXT_FIELD,
+            vector_field=VECTOR_FIELD,
+        )
+    index = lexical_index.LexicalIndex.load(collection_name, host, port, LEXICAL_INDEX_DIR)
+    index.add(ids, [chunk.page_content for chunk in chunks], [dict(chunk.metadata) for chunk in chunks])
+    index.save()
     return vectorstore
 
+# 检索候选数：混合检索时两路各取较多候选再融合
+def hybrid_candidates(top_k):
+    return max(top_k * 4, 20)
+
+# 为只被BM25召回的文本块构造Document
+def make_document(text, metadata):
+    return Document(page_content=text, metadata=metadata)
+
+# 计算文本块与问题向量的L2距离（用于只被BM25召回的文本块）
+def distances_to(query_vector):
+    return lambda texts: squared_l2(query_vector, embeddings.embed_documents(texts))
+
+# 建索引和检索参数：紧凑模式使用量化索引，否则使用index_tuner.py调优后的推荐值（未调优时为默认HNSW参数）
+def collection_index_config():
+    if USE_COMPACT_INDEX:
+        return (compact_index_params(COMPACT_INDEX, EMBEDDING_DIMENSION, COMPACT_NLIST),
+                compact_search_params(COMPACT_NPROBE))
+    return load_index_config()
+
+# 元数据过滤参数：Milvus使用布尔表达式，在向量检索之前过滤；本地向量存储按元数据逐行判断
+def filter_kwargs(filters):
+    if USE_LOCAL_STORE:
+        return {"doc_filter": metadata_matcher(filters)}
+    return {"expr": build_filter_expr(filters)}
+
+# 向量检索；紧凑模式下先多取候选，再用嵌入缓存中的全精度向量重新计算距离，返回前k个
+def search_by_vector(vectorstore, query_vector, k, **search_kwargs):
+    if not USE_RESCORE:
+        return vectorstore.similarity_search_with_score_by_vector(query_vector, k=k, **search_kwargs)
+    candidates = vectorstore.similarity_search_with_score_by_vector(query_vector, k=k * RESCORE_FACTOR, **search_kwargs)
+    return rescore(query_vector, candidates, k, stored_distances(RESCORE_CACHE, query_vector))
+
+# 获取集合的向量存储对象，按配置使用Milvus或本地向量存储；同一集合复用同一个对象
+def get_vectorstore(collection_name, host=MILVUS_HOST, port=MILVUS_PORT):
+    if USE_LOCAL_STORE:
+        return local_vectorstore.get_store(collection_name, embeddings)
+    
+    def create():
+        index_params, search_params = collection_index_config()
+        return Milvus(
+            embedding_function=embeddings,
+            collection_name=collection_name,
+            connection_args={"host": host, "port": port},
+            index_params=index_params,
+            search_params=search_params,
+            partition_key_field=MILVUS_PARTITION_KEY or None,
+            primary_field=PRIMARY_FIELD,
+            text_field=TEXT_FIELD,
+            vector_field=VECTOR_FIELD,
+        )
+    return milvus_manager.get_vectorstore(collection_name, host, port, create)
+
 # 根据问题查询相关文档 - 使用正确的Milvus类
-def query_documents(query_text, collection_name, host=MILVUS_HOST, port=MILVUS_PORT, top_k=3):
-    vectorstore = Milvus(
-        embedding_function=embeddings,
-        collection_name=collection_name,
-        connection_args={"host": host, "port": port},
+# filters为元数据过滤条件：{字段: 值或值列表}，或Milvus布尔表达式字符串（此时不做BM25检索）
+def query_documents(query_text, collection_name, host=MILVUS_HOST, port=MILVUS_PORT, top_k=3, filters=None):
+    vectorstore = get_vectorstore(collection_name, host, port)
+    search_kwargs = filter_kwargs(filters)
+    
+    index = (lexical_index.get_index(collection_name, host, port, LEXICAL_INDEX_DIR)
+             if HYBRID_SEARCH and not isinstance(filters, str) else None)
+    if not index and not USE_RESCORE:
+        # 相似性搜索并返回相似度得分
+        docs_with_scores = vectorstore.similarity_search_with_score(query_text, k=top_k, **search_kwargs)
+        return docs_with_scores
+    
+    query_vector = embeddings.embed_query(query_text)
+    if not index:
+        return search_by_vector(vectorstore, query_vector, top_k, **search_kwargs)
+    
+    # 混合检索：向量检索与BM25各取候选，倒数排名融合后取前top_k，得分仍为L2距离
+    candidates = hybrid_candidates(top_k)
+    vector_results = search_by_vector(vectorstore, query_vector, candidates, **search_kwargs)
+    return lexical_index.fuse_results(query_text, vector_results, index, top_k, make_document,
+                                      distances_to(query_vector), candidates, metadata_matcher(filters))
+
+# 批量计算问题的嵌入向量，一次前向计算
+def embed_queries(queries):
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(queries)
+    return embeddings.embed_documents(queries)
+
+# 多向量Milvus搜索：直接使用pymilvus，字段名与create_empty_collection定义的一致，
+# 除向量外的标量字段（含主键）作为元数据返回，与Milvus向量存储单条检索的结果相同
+def search_milvus_batch(collection_name, alias, vectors, limit, expr=None):
+    collection = Collection(collection_name, using=alias)
+    collection.load()
+    output_fields = [field.name for field in collection.schema.fields if field.name != VECTOR_FIELD]
+    results = collection.search(
+        data=vectors,
+        anns_field=VECTOR_FIELD,
+        param=collection_index_config()[1],
+        limit=limit,
+        expr=expr,
+        output_fields=output_fields,
     )
+    return [
+        [(Document(page_content=hit.entity.get(TEXT_FIELD),
+                   metadata={f: hit.entity.get(f) for f in output_fields if f != TEXT_FIELD}),
+          hit.distance)
+         for hit in hits]
+        for hits in results
+    ]
+
+# 批量检索：一次计算所有问题的嵌入，一次多向量Milvus搜索
+# 返回与queries等长的列表，每项为 [(Document, L2距离), ...]
+def query_documents_batch(queries, collection_name, host=MILVUS_HOST, port=MILVUS_PORT, top_k=3, filters=None):
+    if not queries:
+        return []
+    if not USE_LOCAL_STORE:
+        alias = milvus_manager.connect(host, port)
+        if not utility.has_collection(collection_name, using=alias):
+            return [[] for _ in queries]
     
-    # 相似性搜索并返回相似度得分
-    docs_with_scores = vectorstore.similarity_search_with_score(query_text, k=top_k)
-    return docs_with_scores
+    index = (lexical_index.get_index(collection_name, host, port, LEXICAL_INDEX_DIR)
+             if HYBRID_SEARCH and not isinstance(filters, str) else None)
+    limit = hybrid_candidates(top_k) if index else top_k
+    vectors = embed_queries(list(queries))
+    if USE_LOCAL_STORE:
+        batch = get_vectorstore(collection_name, host, port).search_batch(vectors, limit, metadata_matcher(filters))
+    else:
+        batch = search_milvus_batch(collection_name, alias, vectors,
+                                    limit * RESCORE_FACTOR if USE_RESCORE else limit, build_filter_expr(filters))
+        if USE_RESCORE:
+            batch = [rescore(vector, docs_with_scores, limit, stored_distances(RESCORE_CACHE, vector))
+                     for vector, docs_with_scores in zip(vectors, batch)]
+    
+    if index:
+        doc_filter = metadata_matcher(filters)
+        batch = [lexical_index.fuse_results(query, docs_with_scores, index, top_k, make_document,
+                                            distances_to(vector), limit, doc_filter)
+                 for query, vector, docs_with_scores in zip(queries, vectors, batch)]
+    return batch
+
+# 批量知识库问答：批量检索后以有限并发调用大语言模型
+# 返回 [{"question", "answer", "docs", "result"}, ...]，顺序与queries一致
+def rag_qa_batch(queries, collection_name, host=MILVUS_HOST, port=MILVUS_PORT, top_k=3, concurrency=4, filters=None):
+    connected, msg = check_milvus_connection(host, port)
+    if not connected:
+        raise RuntimeError(msg)
+    
+    docs_batch = query_documents_batch(queries, collection_name, host, port, retrieval_k(top_k), filters)
+    
+    def answer_one(query, docs_with_scores):
+        if not docs_with_scores:
+            answer = "未找到匹配的文档，无法生成回答。"
+            return {"question": query, "answer": answer, "docs": [], "result": answer}
+        filtered_docs = select_context_docs(docs_with_scores, query, top_k)
+        answer = query_llm(build_qa_prompt(query, filtered_docs))
+        return {
+            "question": query,
+            "answer": answer,
+            "docs": filtered_docs,
+            "result": format_qa_result(query, answer, filtered_docs),
+        }
+    
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        return list(pool.map(answer_one, queries, docs_batch))
+
+# 界面批量问答入口：每行一个问题
+def process_batch_qa(questions_text, collection_name, host, port, top_k, concurrency):
+    queries = [q.strip() for q in (questions_text or "").splitlines() if q.strip()]
+    if not queries:
+        return "请输入问题，每行一个"
+    try:
+        start = time.perf_counter()
+        results = rag_qa_batch(queries, collection_name, host, port, int(top_k), int(concurrency))
+        elapsed = time.perf_counter() - start
+        header = f"## 共 {len(queries)} 个问题，耗时 {elapsed:.1f}s\n\n"
+        return header + "\n---\n".join(r["result"] for r in results)
+    except Exception as e:
+        return f"批量问答出错: {str(e)}"
 
-# 处理上传文件并索引
-def process_file(file_path, collection_name, host=MILVUS_HOST, port=MILVUS_PORT):
+# 入库时的写入和删除函数，按配置写入Milvus或本地向量存储
+def create_writer(collection_name, host=MILVUS_HOST, port=MILVUS_PORT):
+    if USE_LOCAL_STORE:
+        return create_local_writer(embeddings, collection_name)
+    index_params, search_params = collection_index_config()
+    return create_milvus_writer(embeddings, collection_name, host, port, index_params, search_params,
+                                partition_key_field=MILVUS_PARTITION_KEY or None)
+
+# 处理上传文件并索引（支持多个文件，并行解析、批量嵌入、流水线写入）
+# 按索引清单增量入库：重复上传的文件和已存在的文本块不会重复写入
+def process_file(file_path, collection_name, host=MILVUS_HOST, port=MILVUS_PORT, progress=None, source_keys=None,
+                 page_progress=None):
     try:
         # 检查连接
         connected, msg = check_milvus_connection(host, port)
         if not connected:
             return f"错误: {msg}"
         
-        # 加载文档
-        documents = load_document(file_path)
-        
-        # 分块
-        chunks = split_documents(documents)
-        
-        # 存入Milvus
-        store_in_milvus(chunks, collection_name, host, port)
-        
-        return f"成功处理文件并索引到 {collection_name}，共 {len(chunks)} 个文本块"
+        paths = file_path if isinstance(file_path, (list, tuple)) else [file_path]
+        manifest = IndexManifest.load(collection_name, host, port)
+        index = lexical_index.LexicalIndex.load(collection_name, host, port, LEXICAL_INDEX_DIR)
+        near_dup = (NearDuplicateIndex.load(collection_name, host, port, NEAR_DUP_THRESHOLD)
+                    if NEAR_DUP_THRESHOLD > 0 else None)
+        write_batch, delete_ids = create_writer(collection_name, host, port)
+        stats = ingest_files(paths, collection_name, embeddings, host, port,
+                             write_batch=write_batch, delete_ids=delete_ids,
+                             manifest=manifest, lexical=index, near_dup=near_dup, source_keys=source_keys, progress=progress,
+                             page_progress=page_progress)
+        
+        if stats.failed_files == stats.files:
+            return f"处理文件时出错: 全部 {stats.files} 个文件解析失败"
+        return f"成功处理文件并索引到 {collection_name}，共 {stats.chunks} 个文本块\n{stats.summary()}"
     except Exception as e:
         return f"处理文件时出错: {str(e)}"
 
+# 界面上传入口，显示逐文件进度，大文件显示逐页进度
+def process_upload(files, collection_name, host, port, progress=gr.Progress()):
+    if not files:
+        return "请先选择文件"
+    paths = [getattr(f, "name", f) for f in (files if isinstance(files, list) else [files])]
+    
+    def report(done, total, path, stats):
+        progress(done / total, desc=f"{os.path.basename(path)}（{stats.chunks} 个文本块）")
+    
+    def report_page(path, pages, total_pages, stats):
+        desc = f"{os.path.basename(path)} 第 {pages} 页（{stats.chunks} 个文本块）"
+        progress((pages, total_pages) if total_pages else None, desc=desc)
+    
+    # 上传文件位于临时目录，以文件名作为清单中的来源，重新上传同名文件时替换旧内容
+    source_keys = {path: f"upload:{os.path.basename(path)}" for path in paths}
+    return process_file(paths, collection_name, host, port, progress=report, source_keys=source_keys,
+                        page_progress=report_page)
+
 # 处理用户查询
-def process_query(query, collection_name, host=MILVUS_HOST, port=MILVUS_PORT, top_k=3):
+def process_query(query, collection_name, host=MILVUS_HOST, port=MILVUS_PORT, top_k=3, filter_text=""):
     try:
         # 检查连接
         connected, msg = check_milvus_connection(host, port)
         if not connected:
             return f"错误: {msg}"
-            
-        docs_with_scores = query_documents(query, collection_name, host, port, top_k)
+        
+        try:
+            filters = parse_filters(filter_text)
+        except ValueError as e:
+            return f"过滤条件有误: {str(e)}"
+        docs_with_scores = query_documents(query, collection_name, host, port, top_k, filters)
         
         if not docs_with_scores:
             return "未找到匹配的文档。请尝试修改您的查询或确保已索引相关内容。"
             
         # 添加搜索方法信息
-        search_method = "向量相似度搜索 (Vector Similarity Search)"
-        results = [f"### 搜索方法: {search_method}\n### 查询: '{query}'\n\n"]
+        if HYBRID_SEARCH and lexical_index.get_index(collection_name, host, port, LEXICAL_INDEX_DIR):
+            search_method = "混合检索 (Vector + BM25, Reciprocal Rank Fusion)"
+        else:
+            search_method = "向量相似度搜索 (Vector Similarity Search)"
+        results = [f"### 搜索方法: {search_method}\n### 查询: '{query}'\n"]
+        if filters:
+            results.append(f"### 过滤条件: `{build_filter_expr(filters)}`\n")
+        results.append("\n")
         
         # 详细展示结果
         for i, (doc, score) in enumerate(docs_with_scores):
@@ -326,6 +688,9 @@ def process_query(query, collection_name, host=MILVUS_HOST, port=MILVUS_PORT, to
             # 构建结果显示
             results.append(f"## 结果 {i+1} (相似度: {similarity:.2f}%)")
             results.append(f"**来源**: {source}")
+            labels = [f"{metadata[f]}" for f in ("museum", "dynasty", "material") if metadata.get(f)]
+            if labels:
+                results.append(f"**元数据**: {' / '.join(labels)}")
             results.append("**内容**:")
             results.append(f"```\n{text_content}\n```\n")
         
@@ -339,35 +704,47 @@ def process_query(query, collection_name, host=MILVUS_HOST, port=MILVUS_PORT, to
 def create_empty_collection(collection_name, host=MILVUS_HOST, port=MILVUS_PORT):
     try:
         # 检查连接
+        if USE_LOCAL_STORE:
+            if not local_vectorstore.create_collection(collection_name, EMBEDDING_DIMENSION):
+                return f"集合 '{collection_name}' 已存在"
+            return f"已成功创建本地集合 '{collection_name}'（索引类型: {local_vectorstore.LOCAL_INDEX_TYPE}）"
+        
         connected, msg = check_milvus_connection(host, port)
         if not connected:
             return f"错误: {msg}"
             
         # 检查集合是否已存在
-        if utility.has_collection(collection_name):
+        alias = milvus_manager.alias(host, port)
+        if utility.has_collection(collection_name, using=alias):
             return f"集合 '{collection_name}' 已存在"
         
         # 定义集合结构
         dim = EMBEDDING_DIMENSION  # 使用当前加载的模型维度
         fields = [
-            FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-            FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=65535),
-            FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=dim)
+            # 主键为文本块内容哈希，入库时由ingest.py指定，重复入库的文本块不会重复写入
+            FieldSchema(name=PRIMARY_FIELD, dtype=DataType.VARCHAR, max_length=PRIMARY_KEY_LENGTH,
+                        is_primary=True, auto_id=False),
+            FieldSchema(name=TEXT_FIELD, dtype=DataType.VARCHAR, max_length=65535),
+            FieldSchema(name=VECTOR_FIELD, dtype=DataType.FLOAT_VECTOR, dim=dim)
+        ]
+        # 入库时抽取的元数据作为标量字段，用于过滤检索；MILVUS_PARTITION_KEY指定的字段作为分区键
+        # 字段值在抽取时已按UTF-8字节截断到MAX_FIELD_LENGTH以内
+        fields += [
+            FieldSchema(name=field, dtype=DataType.VARCHAR, max_length=MAX_FIELD_LENGTH,
+                        is_partition_key=(field == MILVUS_PARTITION_KEY))
+            for field in FILTER_FIELDS
         ]
         schema = CollectionSchema(fields=fields, description=f"Text collection: {collection_name}")
         
         # 创建集合
-        collection = Collection(name=collection_name, schema=schema)
+        collection = Collection(name=collection_name, schema=schema, using=alias)
         
-        # 创建索引
-        index_params = {
-            "metric_type": "L2",
-            "index_type": "HNSW",
-            "params": {"M": 8, "efConstruction": 64}
-        }
-        collection.create_index(field_name="vector", index_params=index_params)
+        # 创建索引：紧凑模式为量化索引，否则使用index_tuner.py写入的推荐配置，未调优时为HNSW(M=8, efConstruction=64)
+        index_params, _ = collection_index_config()
+        collection.create_index(field_name=VECTOR_FIELD, index_params=index_params)
+        milvus_manager.invalidate(host, port, collection_name)
         
-        return f"已成功创建集合 '{collection_name}'"
+        return f"已成功创建集合 '{collection_name}'（索引: {index_params['index_type']} {index_params['params']}）"
     except Exception as e:
         return f"创建集合时出错: {str(e)}\n\n如果是连接问题，请检查Milvus服务器是否启动。"
 
@@ -379,7 +756,8 @@ def list_collections(host=MILVUS_HOST, port=MILVUS_PORT):
         if not connected:
             return f"错误: {msg}"
             
-        collections = utility.list_collections()
+        collections = (local_vectorstore.list_collections() if USE_LOCAL_STORE
+                       else utility.list_collections(using=milvus_manager.alias(host, port)))
         if not collections:
             return "没有找到集合"
         return "可用集合:\n" + "\n".join(collections)
@@ -418,7 +796,7 @@ def create_ui():
             """)
             
             check_connection_button.click(
-                fn=check_milvus_connection,
+                fn=test_milvus_connection,
                 inputs=[milvus_host, milvus_port],
                 outputs=connection_status
             )
@@ -446,13 +824,13 @@ def create_ui():
             )
         
         with gr.Tab("文档上传与索引"):
-            file_input = gr.File(label="上传文件")
+            file_input = gr.File(label="上传文件", file_count="multiple")
             collection_name_input = gr.Textbox(label="集合名称", value="default_collection")
             upload_button = gr.Button("处理并索引文件")
             upload_output = gr.Textbox(label="处理结果")
             
             upload_button.click(
-                fn=lambda file, coll_name, host, port: process_file(file.name, coll_name, host, port),
+                fn=process_upload,
                 inputs=[file_input, collection_name_input, milvus_host, milvus_port],
                 outputs=upload_output
             )
@@ -461,6 +839,7 @@ def create_ui():
             query_collection_name = gr.Textbox(label="集合名称", value="default_collection")
             query_input = gr.Textbox(label="查询问题")
             top_k_slider = gr.Slider(minimum=1, maximum=10, step=1, value=3, label="返回结果数量")
+            query_filter_input = gr.Textbox(label="元数据过滤（可选）", placeholder="如：博物馆=故宫博物院，朝代=明|清，材质=瓷")
             query_button = gr.Button("搜索")
             query_output = gr.Markdown(label="搜索结果", elem_id="query_results")
             
@@ -475,6 +854,9 @@ def create_ui():
             
             相似度得分表示查询和文档的语义接近程度，100%表示完全匹配。
             
+            填写元数据过滤条件时，先按馆名（博物馆）、朝代、材质、文件筛选文本块，再在筛选结果中检索；
+            多个条件用逗号分隔，同一字段的多个取值用"|"分隔。
+            
             ### 结果解读
             - 每个结果都显示文本源文件和内容
             - 代码块中包含原始检索到的文本内容
@@ -483,7 +865,7 @@ def create_ui():
             
             query_button.click(
                 fn=process_query,
-                inputs=[query_input, query_collection_name, milvus_host, milvus_port, top_k_slider],
+                inputs=[query_input, query_collection_name, milvus_host, milvus_port, top_k_slider, query_filter_input],
                 outputs=query_output
             )
         
@@ -492,6 +874,7 @@ def create_ui():
             qa_collection_name = gr.Textbox(label="集合名称", value="default_collection")
             qa_query_input = gr.Textbox(label="您的问题", placeholder="请输入您的问题...")
             qa_top_k_slider = gr.Slider(minimum=1, maximum=10, step=1, value=3, label="参考文档数量")
+            qa_filter_input = gr.Textbox(label="元数据过滤（可选）", placeholder="如：博物馆=故宫博物院，朝代=明|清，材质=瓷")
             qa_button = gr.Button("提问")
             qa_output = gr.Markdown(label="AI回答")
             
@@ -502,7 +885,7 @@ def create_ui():
             本功能结合了向量检索和大语言模型能力:
             1. 系统首先检索与您问题最相关的文档
             2. 将这些文档作为上下文提供给AI模型
-            3. AI模型基于检索到的文档生成回答
+            3. AI模型基于检索到的文档生成回答，回答逐段显示，结束时显示检索耗时和首字延迟
             
             此功能依赖于:
             - 大语言模型: Qwen2.5 14B
@@ -513,11 +896,32 @@ def create_ui():
             """)
             
             qa_button.click(
-                fn=rag_qa,
-                inputs=[qa_query_input, qa_collection_name, milvus_host, milvus_port, qa_top_k_slider],
+                fn=process_qa,
+                inputs=[qa_query_input, qa_collection_name, milvus_host, milvus_port, qa_top_k_slider, qa_filter_input],
                 outputs=qa_output
             )
     
+        with gr.Tab("批量问答"):
+            gr.Markdown("## 批量知识库问答（评测、常见问题预计算）")
+            batch_collection_name = gr.Textbox(label="集合名称", value="default_collection")
+            batch_questions_input = gr.Textbox(label="问题列表（每行一个）", lines=8)
+            batch_top_k_slider = gr.Slider(minimum=1, maximum=10, step=1, value=3, label="参考文档数量")
+            batch_concurrency_slider = gr.Slider(minimum=1, maximum=16, step=1, value=4, label="大模型并发数")
+            batch_button = gr.Button("批量提问")
+            batch_output = gr.Markdown(label="批量回答")
+            
+            gr.Markdown("""
+            所有问题的嵌入向量一次计算完成，并通过一次多向量搜索检索Milvus，
+            随后以设定的并发数调用大语言模型生成回答。
+            """)
+            
+            batch_button.click(
+                fn=process_batch_qa,
+                inputs=[batch_questions_input, batch_collection_name, milvus_host, milvus_port,
+                        batch_top_k_slider, batch_concurrency_slider],
+                outputs=batch_output
+            )
+    
     return demo
 
 # 主函数
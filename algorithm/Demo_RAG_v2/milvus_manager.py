@@ -0,0 +1,97 @@
+"""
+Milvus连接管理
+
+每个 (host, port) 只建立一次连接（独立的连接别名），健康检查结果缓存一段时间，
+同一集合的向量存储对象（langchain_milvus.Milvus）复用，避免每次查询都
+重新连接、列出集合并重新描述集合结构。
+
+检查结果在 recheck_interval 秒内直接返回缓存；失败的结果只缓存 failure_interval 秒，
+服务恢复后能很快重新连上。
+"""
+import threading
+import time
+
+from pymilvus import connections, utility
+
+# 集合的主键、文本和向量字段名，与langchain_milvus.Milvus的primary_field/text_field/vector_field一致；
+# 主键为文本块内容哈希（rag_common.chunk_id.chunk_hash，64个十六进制字符），写入时指定，按主键删除失效的文本块
+PRIMARY_FIELD = "pk"
+TEXT_FIELD = "text"
+VECTOR_FIELD = "vector"
+PRIMARY_KEY_LENGTH = 64
+
+
+class MilvusConnectionManager:
+    def __init__(self, recheck_interval=30.0, failure_interval=3.0, timeout=5):
+        self.recheck_interval = recheck_interval
+        self.failure_interval = failure_interval
+        self.timeout = timeout
+        self._status = {}        # 连接别名 -> (是否正常, 消息, 检查时间)
+        self._connected = set()
+        self._vectorstores = {}  # (连接别名, 集合名) -> Milvus
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def alias(host, port):
+        return f"milvus_{host}_{port}"
+
+    def connect(self, host, port):
+        """建立连接（已连接时直接返回别名）"""
+        alias = self.alias(host, port)
+        if alias not in self._connected:
+            connections.connect(alias=alias, host=host, port=port, timeout=self.timeout)
+            self._connected.add(alias)
+        return alias
+
+    def check(self, host, port, force=False):
+        """返回 (是否正常, 消息)，在缓存有效期内不访问服务器"""
+        alias = self.alias(host, port)
+        with self._lock:
+            cached = self._status.get(alias)
+            if cached is not None and not force:
+                ok, msg, checked_at = cached
+                if time.monotonic() - checked_at < (self.recheck_interval if ok else self.failure_interval):
+                    return ok, msg
+            try:
+                self.connect(host, port)
+                # 尝试获取集合列表，验证连接是否有效
+                utility.list_collections(using=alias)
+                ok, msg = True, "连接成功！Milvus服务器运行正常。"
+            except Exception as e:
+                self._disconnect(alias)
+                ok, msg = False, (f"无法连接到Milvus服务器: {str(e)}\n\n故障排除建议:\n1. 确保Milvus服务器已启动\n"
+                                  f"2. 检查主机和端口是否正确\n3. 检查网络连接")
+            self._status[alias] = (ok, msg, time.monotonic())
+            return ok, msg
+
+    def _disconnect(self, alias):
+        self._connected.discard(alias)
+        for key in [k for k in self._vectorstores if k[0] == alias]:
+            del self._vectorstores[key]
+        try:
+            connections.disconnect(alias)
+        except Exception:
+            pass
+
+    def get_vectorstore(self, collection_name, host, port, factory):
+        """复用同一集合的向量存储对象；factory() 创建新对象
+
+        创建时集合还不存在的对象（col为None）不缓存，集合创建后下次调用会重新创建。
+        """
+        key = (self.alias(host, port), collection_name)
+        with self._lock:
+            vectorstore = self._vectorstores.get(key)
+            if vectorstore is not None:
+                return vectorstore
+        vectorstore = factory()
+        if getattr(vectorstore, "col", None) is not None:
+            with self._lock:
+                vectorstore = self._vectorstores.setdefault(key, vectorstore)
+        return vectorstore
+
+    def invalidate(self, host, port, collection_name=None):
+        """集合被创建、删除或结构变化后丢弃缓存的向量存储对象"""
+        alias = self.alias(host, port)
+        with self._lock:
+            for key in [k for k in self._vectorstores if k[0] == alias and collection_name in (None, k[1])]:
+                del self._vectorstores[key]
@@ -0,0 +1,142 @@
+"""
+近似重复文本块检测（MinHash + LSH）
+
+博物馆图录中大量重复的版权页、来源说明、不同版本间几乎相同的描述，逐字节不同但内容重复，
+按内容哈希去重无法识别。入库时为每个文本块计算MinHash签名：
+- 文本规范化（去掉空白和标点、转小写）后取字符3-gram作为特征集合（改动1%的字符时相似度约0.94）
+- 64个哈希函数的最小值构成签名，两个签名相同位置相等的比例即Jaccard相似度的估计
+- 签名分为16段，任一段完全相同的文本块成为候选，再按估计的相似度与阈值比较
+
+索引按集合保存在 NEAR_DUP_DIR/<host>_<port>_<集合名>.npz，与Milvus中的文本块同步增删，
+因此与之前入库的文本块近似重复的新文本块同样会被跳过。
+被跳过的文本块作为别名记入索引清单，所匹配的文本块失效（文件修改或删除）时重新入库（见ingest.py）。
+"""
+import os
+import re
+import zlib
+
+import numpy as np
+
+NEAR_DUP_DIR = os.getenv("NEAR_DUP_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "near_dup"))
+
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 3
+_PRIME = (1 << 32) + 15
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, 1 << 31, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    text = _NON_WORD.sub("", text.lower())
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash(text):
+    """文本的MinHash签名（长度NUM_PERM的uint64数组）；没有有效字符时返回None"""
+    features = shingles(text)
+    if not features:
+        return None
+    x = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in features), dtype=np.uint64, count=len(features))
+    return ((np.outer(x, _A) + _B) % _PRIME).min(axis=0)
+
+
+def similarity(sig_a, sig_b):
+    """两个签名估计的Jaccard相似度"""
+    return float(np.mean(sig_a == sig_b))
+
+
+def index_path(collection_name, host, port, index_dir=NEAR_DUP_DIR):
+    name = re.sub(r"[^\w.-]", "_", f"{host}_{port}_{collection_name}")
+    return os.path.join(index_dir, f"{name}.npz")
+
+
+class NearDuplicateIndex:
+    def __init__(self, path=None, threshold=0.85):
+        self.path = path
+        self.threshold = threshold
+        self.signatures = {}  # 文本块id -> 签名
+        self.buckets = {}     # (段号, 段内容) -> {文本块id}
+
+    @classmethod
+    def load(cls, collection_name, host, port, threshold=0.85, index_dir=NEAR_DUP_DIR):
+        path = index_path(collection_name, host, port, index_dir)
+        index = cls(path, threshold)
+        if os.path.exists(path):
+            with np.load(path) as data:
+                for doc_id, sig in zip(data["ids"].tolist(), data["signatures"]):
+                    index._insert(doc_id, sig)
+        return index
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        ids = list(self.signatures)
+        signatures = np.stack([self.signatures[i] for i in ids]) if ids else np.zeros((0, NUM_PERM), dtype=np.uint64)
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, ids=np.array(ids, dtype=str), signatures=signatures)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self.signatures)
+
+    @staticmethod
+    def _bands(sig):
+        rows = NUM_PERM // BANDS
+        return [(b, sig[b * rows:(b + 1) * rows].tobytes()) for b in range(BANDS)]
+
+    def _insert(self, doc_id, sig):
+        self.signatures[doc_id] = sig
+        for key in self._bands(sig):
+            self.buckets.setdefault(key, set()).add(doc_id)
+
+    def find(self, sig, exclude=()):
+        """返回与签名相似度不低于阈值的一个已有文本块id（不含exclude中的），没有时返回None"""
+        candidates = set()
+        for key in self._bands(sig):
+            candidates |= self.buckets.get(key, set())
+        candidates.difference_update(exclude)
+        best, best_score = None, self.threshold
+        for doc_id in candidates:
+            score = similarity(sig, self.signatures[doc_id])
+            if score >= best_score:
+                best, best_score = doc_id, score
+        return best
+
+    def add(self, doc_id, text):
+        """加入已入库的文本块（不做近似重复判断）"""
+        if doc_id not in self.signatures:
+            sig = minhash(text)
+            if sig is not None:
+                self._insert(doc_id, sig)
+
+    def check_and_add(self, doc_id, text, exclude=()):
+        """文本与已有文本块近似重复时返回其id（不加入索引），否则加入索引并返回None
+
+        exclude: 不参与匹配的文本块id，如本次入库中将被删除的文本块
+        """
+        if doc_id in self.signatures:
+            return None
+        sig = minhash(text)
+        if sig is None:
+            return None
+        duplicate_of = self.find(sig, exclude)
+        if duplicate_of is None:
+            self._insert(doc_id, sig)
+        return duplicate_of
+
+    def remove(self, ids):
+        for doc_id in ids:
+            sig = self.signatures.pop(doc_id, None)
+            if sig is None:
+                continue
+            for key in self._bands(sig):
+                bucket = self.buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(doc_id)
+                    if not bucket:
+                        del self.buckets[key]
@@ -0,0 +1,110 @@
+"""
+重排序延迟/准确率基准
+
+评测文件为JSONL，每行一个问题及判定相关文本块的关键词（文本块包含任一关键词即视为相关）：
+    {"question": "镂空模纹壶是什么年代的？", "relevant": ["镂空模纹壶"]}
+
+对每个问题先检索 --candidates 个候选，再分别统计：
+- 直接取检索结果的前top_k个（不重排序）
+- 不限时间的交叉编码器重排序
+- 各个时间预算下的重排序
+的 hit@top_k、MRR 以及重排序耗时的p50/p95。
+
+命令行用法：
+    python rerank_bench.py eval.jsonl --collection museum_docs --candidates 20 --top-k 3 --budgets 50,100,300
+"""
+import argparse
+import json
+import os
+import time
+
+# 重排序模块与后端共用rag_common（由algorithm目录安装，见requirements.txt）
+from rag_common.reranker import DEFAULT_RERANK_MODEL, CrossEncoderReranker
+
+
+def load_cases(path):
+    cases = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                case = json.loads(line)
+                relevant = case["relevant"]
+                case["relevant"] = [relevant] if isinstance(relevant, str) else list(relevant)
+                cases.append(case)
+    return cases
+
+
+def first_relevant_rank(docs_with_scores, relevant):
+    for rank, (doc, _) in enumerate(docs_with_scores, start=1):
+        if any(keyword in doc.page_content for keyword in relevant):
+            return rank
+    return None
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def evaluate(name, cases, candidates, top_k, rerank=None):
+    hits, rr, latencies = 0, 0.0, []
+    for case, docs in zip(cases, candidates):
+        if rerank is not None:
+            start = time.perf_counter()
+            docs = rerank(case["question"], docs)
+            latencies.append((time.perf_counter() - start) * 1000)
+        rank = first_relevant_rank(docs[:top_k], case["relevant"])
+        if rank is not None:
+            hits += 1
+            rr += 1.0 / rank
+    n = max(1, len(cases))
+    line = f"{name:<24} hit@{top_k} {hits / n:.3f}  MRR {rr / n:.3f}"
+    if latencies:
+        line += f"  重排序 p50 {percentile(latencies, 50):.1f}ms  p95 {percentile(latencies, 95):.1f}ms"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重排序延迟/准确率基准")
+    parser.add_argument("cases", help="评测文件（JSONL）")
+    parser.add_argument("--collection", default="default_collection")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", default=None)
+    parser.add_argument("--model", default=DEFAULT_RERANK_MODEL)
+    parser.add_argument("--candidates", type=int, default=20, help="重排序候选数")
+    parser.add_argument("--top-k", type=int, default=3, help="交给大语言模型的文档数")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--budgets", default="50,100,300", help="逗号分隔的时间预算（毫秒）")
+    args = parser.parse_args()
+
+    import main as rag
+    host = args.host or rag.MILVUS_HOST
+    port = args.port or rag.MILVUS_PORT
+    connected, msg = rag.check_milvus_connection(host, port)
+    if not connected:
+        print(msg)
+        return
+
+    cases = load_cases(args.cases)
+    questions = [case["question"] for case in cases]
+    candidates = [rag.dedupe_docs(docs) for docs in
+                  rag.query_documents_batch(questions, args.collection, host, port, args.candidates)]
+    print(f"共 {len(cases)} 个问题，候选数 {args.candidates}，top_k {args.top_k}，重排序模型 {args.model}")
+
+    reranker = CrossEncoderReranker(args.model, batch_size=args.batch_size)
+    reranker.load()
+    # 预热，避免首次推理的初始化开销计入延迟
+    reranker.score(questions[0], [questions[0]])
+
+    evaluate("检索（不重排序）", cases, candidates, args.top_k)
+    evaluate("重排序（不限时）", cases, candidates, args.top_k,
+             lambda q, docs: reranker.rerank(q, docs, args.top_k, time_budget_ms=0))
+    for budget in [int(b) for b in args.budgets.split(",") if b.strip()]:
+        evaluate(f"重排序（预算 {budget}ms）", cases, candidates, args.top_k,
+                 lambda q, docs, budget=budget: reranker.rerank(q, docs, args.top_k, time_budget_ms=budget))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+文本文件分段读取测试
+
+运行方式（在Demo_RAG_v2目录下）：
+    python -m pytest test_doc_loader.py -q
+"""
+from doc_loader import _iter_text_blocks
+
+
+def write_paragraphs(path, count, length=270):
+    paragraphs = [f"第{i}段" + "文" * (length - len(f"第{i}段")) for i in range(count)]
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+    return paragraphs
+
+
+def test_blocks_cut_on_paragraph_boundaries(tmp_path):
+    path = tmp_path / "catalogue.txt"
+    paragraphs = write_paragraphs(path, 200)
+    blocks = [doc.page_content for doc in _iter_text_blocks(str(path), block_chars=1000)]
+
+    assert len(blocks) > 1
+    assert "".join(blocks) == path.read_text(encoding="utf-8")
+    # 除最后一段外都在空行处切分，每个段落完整地落在某一段中
+    assert all(block.endswith("\n\n") for block in blocks[:-1])
+    assert all(len(block) <= 2000 for block in blocks)
+    for paragraph in paragraphs:
+        assert any(paragraph in block for block in blocks)
+
+
+def test_blocks_without_blank_lines_cut_at_block_size(tmp_path):
+    path = tmp_path / "catalogue.txt"
+    path.write_text("文" * 2500, encoding="utf-8")
+    blocks = [doc.page_content for doc in _iter_text_blocks(str(path), block_chars=1000)]
+    assert [len(block) for block in blocks] == [1000, 1000, 500]
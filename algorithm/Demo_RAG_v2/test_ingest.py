@@ -0,0 +1,120 @@
+"""
+批量入库流水线测试（写入函数和嵌入模型用内存中的替身，不需要Milvus）
+
+运行方式（在Demo_RAG_v2目录下）：
+    python -m pytest test_ingest.py -q
+"""
+import os
+
+import pytest
+
+from index_manifest import IndexManifest
+from ingest import ingest_files, parse_file
+from rag_common.chunk_id import chunk_hash
+
+CHUNK_SIZE = 100
+
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+
+class FakeWriter:
+    """记录每次写入的批次；fail_on为第几次写入时抛出异常"""
+
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.deleted = []
+        self.fail_on = fail_on
+
+    def write_batch(self, ids, texts, vectors, metadatas):
+        if self.fail_on is not None and len(self.batches) + 1 == self.fail_on:
+            raise ConnectionError("Milvus写入失败")
+        self.batches.append((list(ids), list(texts), list(vectors), list(metadatas)))
+
+    def delete_ids(self, ids):
+        self.deleted.extend(ids)
+
+    @property
+    def ids(self):
+        return [chunk_id for ids, _, _, _ in self.batches for chunk_id in ids]
+
+
+def write_catalogue(path, count, tag=""):
+    paragraphs = [f"{tag}第{i}件藏品为青铜器，西周时期，现藏故宫博物院。" for i in range(count)]
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+
+
+def expected_ids(path):
+    _, records, _, error = parse_file(str(path), CHUNK_SIZE, 0)
+    assert error is None
+    return list(dict.fromkeys(chunk_hash(text) for text, _ in records))
+
+
+def ingest(paths, writer, **options):
+    return ingest_files([str(p) for p in paths], "test", FakeEmbeddings(), "localhost", "19530",
+                        chunk_size=CHUNK_SIZE, chunk_overlap=0,
+                        write_batch=writer.write_batch, delete_ids=writer.delete_ids, **options)
+
+
+def test_batches_are_bounded_and_keep_file_order(tmp_path):
+    path = tmp_path / "catalogue.txt"
+    write_catalogue(path, 60)
+    ids = expected_ids(path)
+    assert len(ids) > 10
+    writer = FakeWriter()
+
+    stats = ingest([path], writer, workers=1, embed_batch_size=3, insert_batch_size=5)
+
+    assert writer.ids == ids
+    sizes = [len(batch[0]) for batch in writer.batches]
+    assert all(size == 5 for size in sizes[:-1]) and 0 < sizes[-1] <= 5
+    # 每个向量与同一批中的文本对应
+    for _, texts, vectors, metadatas in writer.batches:
+        assert vectors == [[float(len(text))] for text in texts]
+        assert all(metadata["source_file"] == "catalogue.txt" for metadata in metadatas)
+    assert stats.inserted == stats.chunks == len(ids) and stats.failed_files == 0
+
+
+def test_process_pool_writes_every_chunk_once(tmp_path):
+    paths = []
+    for n in range(4):
+        path = tmp_path / f"catalogue_{n}.txt"
+        write_catalogue(path, 20, tag=f"第{n}册")
+        paths.append(path)
+    writer = FakeWriter()
+
+    stats = ingest(paths, writer, workers=2, insert_batch_size=7)
+
+    assert sorted(writer.ids) == sorted(h for path in paths for h in expected_ids(path))
+    assert stats.files == 4 and stats.inserted == len(writer.ids)
+
+
+def test_failed_worker_parse_is_reported_and_not_recorded(tmp_path):
+    good = tmp_path / "good.txt"
+    write_catalogue(good, 20)
+    bad = tmp_path / "bad.txt"
+    bad.write_bytes(b"\xff\xfe\x00\xd8 invalid utf-8 \xc3\x28")
+    manifest = IndexManifest(str(tmp_path / "manifest.json"))
+    writer = FakeWriter()
+
+    stats = ingest([good, bad], writer, workers=2, manifest=manifest)
+
+    assert stats.failed_files == 1 and stats.files == 2
+    assert sorted(writer.ids) == sorted(expected_ids(good))
+    # 解析失败的文件不记入清单，下次入库时重新处理
+    assert os.path.abspath(good) in manifest.files and os.path.abspath(bad) not in manifest.files
+
+
+def test_writer_error_is_raised_and_manifest_not_saved(tmp_path):
+    path = tmp_path / "catalogue.txt"
+    write_catalogue(path, 60)
+    manifest = IndexManifest(str(tmp_path / "manifest.json"))
+    writer = FakeWriter(fail_on=2)
+
+    with pytest.raises(ConnectionError):
+        ingest([path], writer, workers=1, embed_batch_size=3, insert_batch_size=5, manifest=manifest)
+
+    assert len(writer.batches) == 1
+    assert not os.path.exists(manifest.path)
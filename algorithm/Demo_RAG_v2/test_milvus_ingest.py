@@ -0,0 +1,73 @@
+"""
+界面新建的Milvus集合上的增量入库测试
+
+需要Milvus服务，设置环境变量 MILVUS_TEST_HOST（端口 MILVUS_TEST_PORT，默认19530）后运行，未设置时跳过：
+    MILVUS_TEST_HOST=127.0.0.1 python -m pytest test_milvus_ingest.py -q
+
+每个用例用 create_empty_collection 新建一个随机名称的集合，结束后删除。
+"""
+import json
+import os
+import uuid
+
+import pytest
+
+from index_manifest import IndexManifest
+from ingest import ingest_files
+
+MILVUS_TEST_HOST = os.getenv("MILVUS_TEST_HOST")
+MILVUS_TEST_PORT = os.getenv("MILVUS_TEST_PORT", "19530")
+
+pytestmark = pytest.mark.skipif(not MILVUS_TEST_HOST, reason="未设置MILVUS_TEST_HOST")
+
+
+@pytest.fixture
+def collection():
+    import main as rag
+    from pymilvus import Collection, utility
+
+    name = f"test_ingest_{uuid.uuid4().hex[:8]}"
+    message = rag.create_empty_collection(name, MILVUS_TEST_HOST, MILVUS_TEST_PORT)
+    assert message.startswith("已成功创建"), message
+    alias = rag.milvus_manager.alias(MILVUS_TEST_HOST, MILVUS_TEST_PORT)
+    yield rag, name, Collection(name, using=alias)
+    utility.drop_collection(name, using=alias)
+    rag.milvus_manager.invalidate(MILVUS_TEST_HOST, MILVUS_TEST_PORT, name)
+
+
+def ingest(rag, name, path, manifest):
+    write_batch, delete_ids = rag.create_writer(name, MILVUS_TEST_HOST, MILVUS_TEST_PORT)
+    return ingest_files([str(path)], name, rag.embeddings, MILVUS_TEST_HOST, MILVUS_TEST_PORT, workers=1,
+                        write_batch=write_batch, delete_ids=delete_ids, manifest=manifest)
+
+
+def test_reingest_into_new_collection_inserts_nothing(collection, tmp_path):
+    from milvus_manager import PRIMARY_FIELD
+
+    rag, name, col = collection
+    path = tmp_path / "catalogue.txt"
+    paragraphs = [f"第{i}件藏品为青铜器，西周时期，现藏故宫博物院。" * 20 for i in range(30)]
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+    manifest = IndexManifest(str(tmp_path / "manifest.json"))
+
+    first = ingest(rag, name, path, manifest)
+    assert first.failed_files == 0 and first.inserted == first.chunks > 0
+    col.flush()
+    assert col.num_entities == first.inserted
+
+    # 与 --full 相同：忽略文件大小和修改时间，重新解析全部文本块，已存在的主键不再写入
+    manifest = IndexManifest(manifest.path, {s: dict(e, size=-1) for s, e in manifest.files.items()})
+    second = ingest(rag, name, path, manifest)
+    assert second.chunks == first.chunks
+    assert second.inserted == 0 and second.deleted == 0
+    col.flush()
+    assert col.num_entities == first.inserted
+
+    # 修改文件后，不再被引用的旧文本块按主键删除
+    old_ids = set(manifest.chunks_of(os.path.abspath(path)))
+    path.write_text("\n\n".join(paragraphs[:-1] + ["新增的说明文字。" * 20]), encoding="utf-8")
+    third = ingest(rag, name, path, manifest)
+    stale = sorted(old_ids - set(manifest.chunks_of(os.path.abspath(path))))
+    assert third.deleted == len(stale) > 0
+    assert col.query(expr=f"{PRIMARY_FIELD} in {json.dumps(stale)}", output_fields=[PRIMARY_FIELD],
+                     consistency_level="Strong") == []
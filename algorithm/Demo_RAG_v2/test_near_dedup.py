@@ -0,0 +1,74 @@
+"""
+近似重复检测与入库时的跳过、重新入库测试（写入函数和嵌入模型用内存中的替身，不需要Milvus）
+
+运行方式（在Demo_RAG_v2目录下）：
+    python -m pytest test_near_dedup.py -q
+"""
+import os
+
+from index_manifest import IndexManifest
+from ingest import ingest_files
+from near_dedup import NearDuplicateIndex
+
+BASE = "博物馆藏品青铜器说明文字，西周晚期，现藏故宫博物院。" * 12
+
+
+class MemoryStore:
+    """以主键存放文本块的内存向量存储"""
+
+    def __init__(self):
+        self.texts = {}
+
+    def write_batch(self, ids, texts, vectors, metadatas):
+        self.texts.update(zip(ids, texts))
+
+    def delete_ids(self, ids):
+        for chunk_id in ids:
+            self.texts.pop(chunk_id, None)
+
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+
+def test_similarity_threshold():
+    index = NearDuplicateIndex()
+    assert index.check_and_add("a", BASE) is None
+    assert index.check_and_add("b", BASE + "补充") == "a"
+    assert index.check_and_add("c", "完全不同的一段关于陶瓷的说明。" * 12) is None
+    # 排除的文本块不作为匹配对象
+    assert index.check_and_add("d", BASE + "另一处补充", exclude={"a"}) is None
+
+
+def test_near_duplicate_readmitted_after_target_edited(tmp_path):
+    store = MemoryStore()
+    manifest = IndexManifest(str(tmp_path / "manifest.json"))
+    near_dup = NearDuplicateIndex(str(tmp_path / "near_dup.npz"))
+
+    def ingest(path):
+        return ingest_files([str(path)], "test", FakeEmbeddings(), "localhost", "19530", workers=1,
+                            chunk_size=2000, write_batch=store.write_batch, delete_ids=store.delete_ids,
+                            manifest=manifest, near_dup=near_dup)
+
+    target = tmp_path / "a.txt"
+    target.write_text(BASE, encoding="utf-8")
+    ingest(target)
+    duplicate = tmp_path / "b.txt"
+    duplicate.write_text(BASE + "乙", encoding="utf-8")
+
+    # B与A近似重复，不写入，作为别名记入清单
+    stats = ingest(duplicate)
+    assert stats.near_duplicates == 1 and stats.inserted == 0
+    assert list(store.texts.values()) == [BASE]
+
+    # A修改为无关内容后，B所匹配的文本块失效，B重新入库
+    target.write_text("完全不同的一段关于陶瓷的说明。" * 12, encoding="utf-8")
+    stats = ingest(target)
+    assert stats.readmitted == 1 and stats.deleted == 1
+    assert sorted(store.texts.values()) == sorted(["完全不同的一段关于陶瓷的说明。" * 12, BASE + "乙"])
+    assert not manifest.files[os.path.abspath(duplicate)].get("aliases")
+
+    # 之后再次入库不做任何改动
+    stats = ingest(duplicate)
+    assert stats.inserted == 0 and stats.deleted == 0 and stats.readmitted == 0
@@ -0,0 +1,13 @@
+"""
+大模型API网关客户端，供 algorithm 下各演示程序共用
+
+使用方式（与 rag_common 一起由 algorithm 目录安装，各演示程序的 requirements.txt 中已列出）：
+    from llm_gateway import get_gateway
+    gateway = get_gateway()
+    gateway.register("oneapi", base_url, api_key, max_concurrency=8)
+    answer = gateway.chat("oneapi", [{"role": "user", "content": "你好"}], model="Qwen/Qwen2.5-7B-Instruct")
+"""
+from llm_gateway.gateway import (CircuitBreaker, CircuitOpenError, GatewayError, LLMGateway, ProviderConfig,
+                                 get_gateway)
+
+__all__ = ["CircuitBreaker", "CircuitOpenError", "GatewayError", "LLMGateway", "ProviderConfig", "get_gateway"]
@@ -0,0 +1,395 @@
+"""
+大模型API网关客户端
+
+各演示程序（Demo_RAG_v2的知识库问答、Demo_Graph_v2的图像分析）共用的HTTP客户端，
+所有提供方都通过OpenAI兼容的 /chat/completions 接口调用：
+- 每个提供方一个连接池（keep-alive），复用TCP/TLS连接
+- 每个提供方独立的并发上限，超出时排队等待
+- 429和5xx、连接错误按指数退避加随机抖动重试，429优先使用响应头Retry-After
+- 熔断：连续失败达到阈值后在一段时间内直接拒绝请求，之后放行一个试探请求，成功则恢复，
+  失败或未得到结果就被取消时重新熔断
+- 统计每个提供方的请求数、成功/失败/重试/熔断拒绝次数以及延迟（流式请求另记首字延迟）
+
+同步调用（chat_completions）可在多个线程中共用；流式调用（stream_chat_completions）
+为异步生成器，每个事件循环使用独立的异步连接池。
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import httpx
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class GatewayError(Exception):
+    """请求失败（不可重试的错误或重试用尽）"""
+
+    def __init__(self, provider, message, status_code=None, body=None):
+        super().__init__(f"[{provider}] {message}")
+        self.provider = provider
+        self.status_code = status_code
+        self.body = body
+
+
+class CircuitOpenError(GatewayError):
+    """提供方处于熔断状态，请求未发出"""
+
+
+@dataclass(frozen=True)
+class ProviderConfig:
+    name: str
+    base_url: str
+    api_key: str = ""
+    max_concurrency: int = 8
+    timeout: float = 120.0
+    connect_timeout: float = 10.0
+    max_retries: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """是否放行请求；熔断时间到后只放行一个试探请求
+
+        放行时返回放行时的状态（HALF_OPEN表示试探请求），拒绝时返回False。
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return self.CLOSED
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return self.HALF_OPEN
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """试探请求没有得到结果就结束（被取消或抛出其他异常）时重新熔断，等待下一次试探"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class _Attempt:
+    """一次请求尝试（上下文管理器）：熔断时拒绝；试探请求在记录结果之前退出时释放试探，
+    否则提供方会一直停在半开状态，拒绝之后的所有请求"""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.probe = False
+
+    def __enter__(self):
+        self.probe = self.provider.admit()
+        return self
+
+    def record(self, status_code=None, error=None):
+        self.provider.record_attempt(status_code=status_code, error=error)
+        self.probe = False
+
+    def __exit__(self, *exc_info):
+        if self.probe:
+            self.provider.breaker.release_probe()
+        return False
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+class ProviderStats:
+    """请求计数与延迟（最近window次）"""
+
+    def __init__(self, window=1000):
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.latencies = deque(maxlen=window)
+        self.ttfts = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def record_latency(self, seconds, ttft=None):
+        with self._lock:
+            self.latencies.append(seconds * 1000)
+            if ttft is not None:
+                self.ttfts.append(ttft * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            latencies, ttfts = list(self.latencies), list(self.ttfts)
+            result = {name: getattr(self, name) for name in
+                      ("requests", "successes", "failures", "retries", "rejected", "in_flight")}
+        result["p50_ms"] = _percentile(latencies, 50)
+        result["p95_ms"] = _percentile(latencies, 95)
+        result["ttft_p50_ms"] = _percentile(ttfts, 50)
+        return result
+
+
+class _Provider:
+    def __init__(self, config):
+        self.config = config
+        self.breaker = CircuitBreaker(config.failure_threshold, config.reset_timeout)
+        self.stats = ProviderStats()
+        self.semaphore = threading.BoundedSemaphore(config.max_concurrency)
+        self.client = httpx.Client(timeout=self.timeout(), limits=self.limits())
+        self._async = {}  # 事件循环 -> (AsyncClient, asyncio.Semaphore)
+
+    def timeout(self):
+        return httpx.Timeout(self.config.timeout, connect=self.config.connect_timeout)
+
+    def limits(self):
+        return httpx.Limits(max_connections=self.config.max_concurrency,
+                            max_keepalive_connections=self.config.max_concurrency)
+
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        entry = self._async.get(loop)
+        if entry is None or entry[0].is_closed:
+            # 清理已关闭事件循环的连接池
+            for closed_loop in [l for l in self._async if l.is_closed()]:
+                del self._async[closed_loop]
+            entry = (httpx.AsyncClient(timeout=self.timeout(), limits=self.limits()),
+                     asyncio.Semaphore(self.config.max_concurrency))
+            self._async[loop] = entry
+        return entry
+
+    def url(self, path):
+        return f"{self.config.base_url.rstrip('/')}/{path.lstrip('/')}"
+
+    def headers(self, extra=None):
+        headers = {"Content-Type": "application/json"}
+        if self.config.api_key:
+            headers["Authorization"] = f"Bearer {self.config.api_key}"
+        headers.update(extra or {})
+        return headers
+
+    def backoff(self, attempt, response=None):
+        """第attempt次重试前的等待时间：指数退避加全抖动，429时不短于Retry-After"""
+        delay = random.uniform(0, min(self.config.backoff_max, self.config.backoff_base * 2 ** attempt))
+        if response is not None and response.status_code == 429:
+            try:
+                delay = max(delay, min(float(response.headers.get("Retry-After", 0)), 60.0))
+            except ValueError:
+                pass
+        return delay
+
+    def admit(self):
+        """放行时返回是否为试探请求，熔断时抛出CircuitOpenError"""
+        state = self.breaker.allow()
+        if not state:
+            self.stats.add(rejected=1)
+            raise CircuitOpenError(self.config.name, "服务连续失败，已熔断，请稍后再试")
+        return state == CircuitBreaker.HALF_OPEN
+
+    def attempt(self):
+        return _Attempt(self)
+
+    def record_attempt(self, status_code=None, error=None):
+        """记录一次尝试的结果；5xx和连接错误计入熔断，其他响应（含429）说明服务可用"""
+        if error is not None or (status_code is not None and status_code >= 500):
+            self.breaker.record_failure()
+        elif status_code is not None:
+            self.breaker.record_success()
+
+    def close(self):
+        self.client.close()
+
+
+class LLMGateway:
+    def __init__(self):
+        self._providers = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, base_url, api_key="", **options):
+        """注册提供方；配置不变时重复注册不会重建连接池和统计"""
+        config = ProviderConfig(name=name, base_url=base_url, api_key=api_key, **options)
+        with self._lock:
+            provider = self._providers.get(name)
+            if provider is not None and provider.config == config:
+                return config
+            if provider is not None:
+                provider.close()
+            self._providers[name] = _Provider(config)
+        return config
+
+    def provider(self, name):
+        provider = self._providers.get(name)
+        if provider is None:
+            raise KeyError(f"未注册的大模型提供方: {name}")
+        return provider
+
+    def chat_completions(self, name, payload, headers=None):
+        """同步调用 /chat/completions，返回响应JSON"""
+        return self.post(name, "/chat/completions", payload, headers)
+
+    def chat(self, name, messages, model, **params):
+        """返回第一个候选回答的文本"""
+        result = self.chat_completions(name, dict(params, model=model, messages=messages))
+        try:
+            return result["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            raise GatewayError(name, f"响应格式不正确: {json.dumps(result, ensure_ascii=False)[:200]}")
+
+    def post(self, name, path, payload, headers=None):
+        provider = self.provider(name)
+        start = time.perf_counter()
+        provider.stats.add(requests=1)
+        with provider.semaphore:
+            provider.stats.add(in_flight=1)
+            try:
+                for attempt in range(provider.config.max_retries + 1):
+                    response = None
+                    with provider.attempt() as trial:
+                        try:
+                            response = provider.client.post(provider.url(path), json=payload,
+                                                            headers=provider.headers(headers))
+                            trial.record(status_code=response.status_code)
+                        except httpx.TransportError as e:
+                            trial.record(error=e)
+                            if attempt == provider.config.max_retries:
+                                raise GatewayError(name, f"请求失败: {e}")
+                    if response is not None:
+                        if response.status_code == 200:
+                            provider.stats.add(successes=1)
+                            provider.stats.record_latency(time.perf_counter() - start)
+                            return response.json()
+                        if response.status_code not in RETRY_STATUS or attempt == provider.config.max_retries:
+                            raise GatewayError(name, f"HTTP {response.status_code}", response.status_code, response.text)
+                    provider.stats.add(retries=1)
+                    time.sleep(provider.backoff(attempt, response))
+            except GatewayError:
+                provider.stats.add(failures=1)
+                raise
+            finally:
+                provider.stats.add(in_flight=-1)
+
+    async def stream_chat_completions(self, name, payload, headers=None):
+        """流式调用 /chat/completions，逐段产出回答文本
+
+        只在收到第一段内容之前重试；之后连接中断时抛出GatewayError。
+        """
+        provider = self.provider(name)
+        client, semaphore = provider.async_client()
+        payload = dict(payload, stream=True)
+        start = time.perf_counter()
+        provider.stats.add(requests=1)
+        async with semaphore:
+            provider.stats.add(in_flight=1)
+            try:
+                for attempt in range(provider.config.max_retries + 1):
+                    retry_response = None
+                    ttft = None
+                    # 客户端断开（CancelledError）等异常退出时，未得到结果的试探请求在这里释放
+                    with provider.attempt() as trial:
+                        try:
+                            async with client.stream("POST", provider.url("/chat/completions"), json=payload,
+                                                     headers=provider.headers(headers)) as response:
+                                trial.record(status_code=response.status_code)
+                                if response.status_code != 200:
+                                    body = (await response.aread()).decode("utf-8", errors="replace")
+                                    if response.status_code not in RETRY_STATUS or attempt == provider.config.max_retries:
+                                        raise GatewayError(name, f"HTTP {response.status_code}", response.status_code, body)
+                                    retry_response = response
+                                else:
+                                    async for content in _iter_sse_content(response):
+                                        if ttft is None:
+                                            ttft = time.perf_counter() - start
+                                        yield content
+                                    provider.stats.add(successes=1)
+                                    provider.stats.record_latency(time.perf_counter() - start, ttft)
+                                    return
+                        except httpx.TransportError as e:
+                            trial.record(error=e)
+                            if ttft is not None or attempt == provider.config.max_retries:
+                                raise GatewayError(name, f"请求失败: {e}")
+                    provider.stats.add(retries=1)
+                    await asyncio.sleep(provider.backoff(attempt, retry_response))
+            except GatewayError:
+                provider.stats.add(failures=1)
+                raise
+            finally:
+                provider.stats.add(in_flight=-1)
+
+    def stats(self, name=None):
+        """各提供方的统计快照，含熔断状态"""
+        names = [name] if name else list(self._providers)
+        result = {}
+        for n in names:
+            provider = self.provider(n)
+            result[n] = dict(provider.stats.snapshot(), circuit=provider.breaker.state)
+        return result
+
+    def close(self):
+        with self._lock:
+            for provider in self._providers.values():
+                provider.close()
+            self._providers.clear()
+
+
+async def _iter_sse_content(response):
+    """解析服务端事件流：每行 "data: {...}"，以 "data: [DONE]" 结束"""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        try:
+            choices = json.loads(data).get("choices") or []
+        except ValueError:
+            continue
+        content = (choices[0].get("delta") or {}).get("content") if choices else None
+        if content:
+            yield content
+
+
+_default_gateway = None
+_default_lock = threading.Lock()
+
+
+def get_gateway():
+    """进程内共用的网关实例"""
+    global _default_gateway
+    with _default_lock:
+        if _default_gateway is None:
+            _default_gateway = LLMGateway()
+        return _default_gateway
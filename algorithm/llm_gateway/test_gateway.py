@@ -0,0 +1,171 @@
+"""
+网关客户端的重试、熔断与流式请求测试（httpx.MockTransport模拟提供方，不发出网络请求）
+
+运行方式（在algorithm目录下）：
+    python -m pytest llm_gateway/test_gateway.py -q
+"""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from llm_gateway.gateway import CircuitBreaker, CircuitOpenError, GatewayError, LLMGateway
+
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+
+def completion(content):
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+
+def sse(*contents):
+    lines = [f"data: {json.dumps({'choices': [{'delta': {'content': c}}]}, ensure_ascii=False)}" for c in contents]
+    return "\n\n".join(lines + ["data: [DONE]"]) + "\n\n"
+
+
+class Upstream:
+    """按顺序返回预设的响应，记录收到的请求次数"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def __call__(self, request):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def handle_async(self, request):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if callable(response):
+            return await response()
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def make_gateway(upstream, **options):
+    options = dict(dict(backoff_base=0.0, max_retries=3), **options)
+    gateway = LLMGateway()
+    gateway.register("test", "http://llm.test/v1", **options)
+    provider = gateway.provider("test")
+    provider.client = httpx.Client(transport=httpx.MockTransport(upstream))
+    provider.async_client = lambda: (httpx.AsyncClient(transport=httpx.MockTransport(upstream.handle_async)),
+                                     asyncio.Semaphore(provider.config.max_concurrency))
+    return gateway
+
+
+def collect(gateway):
+    async def run():
+        return [c async for c in gateway.stream_chat_completions("test", {"model": "m", "messages": MESSAGES})]
+    return asyncio.run(run())
+
+
+def test_retries_on_429_and_5xx():
+    upstream = Upstream(httpx.Response(429, headers={"Retry-After": "0"}), httpx.Response(503), completion("好"))
+    gateway = make_gateway(upstream)
+
+    assert gateway.chat("test", MESSAGES, model="m") == "好"
+    assert upstream.calls == 3
+    stats = gateway.stats("test")["test"]
+    assert stats["retries"] == 2 and stats["successes"] == 1 and stats["circuit"] == CircuitBreaker.CLOSED
+
+
+def test_client_error_is_not_retried():
+    upstream = Upstream(httpx.Response(400, text="bad request"))
+    gateway = make_gateway(upstream)
+
+    with pytest.raises(GatewayError) as excinfo:
+        gateway.chat("test", MESSAGES, model="m")
+    assert excinfo.value.status_code == 400 and upstream.calls == 1
+
+
+def test_breaker_opens_and_recovers_after_probe():
+    upstream = Upstream(httpx.Response(500), httpx.Response(500), completion("恢复"))
+    gateway = make_gateway(upstream, max_retries=0, failure_threshold=2, reset_timeout=0.05)
+
+    for _ in range(2):
+        with pytest.raises(GatewayError):
+            gateway.chat("test", MESSAGES, model="m")
+    # 熔断期间请求不发出
+    with pytest.raises(CircuitOpenError):
+        gateway.chat("test", MESSAGES, model="m")
+    assert upstream.calls == 2 and gateway.stats("test")["test"]["circuit"] == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    assert gateway.chat("test", MESSAGES, model="m") == "恢复"
+    assert gateway.stats("test")["test"]["circuit"] == CircuitBreaker.CLOSED
+
+
+def test_probe_that_raises_reopens_breaker():
+    upstream = Upstream(httpx.Response(500), RuntimeError("意外错误"), completion("恢复"))
+    gateway = make_gateway(upstream, max_retries=0, failure_threshold=1, reset_timeout=0.05)
+
+    with pytest.raises(GatewayError):
+        gateway.chat("test", MESSAGES, model="m")
+    time.sleep(0.06)
+    with pytest.raises(RuntimeError):
+        gateway.chat("test", MESSAGES, model="m")
+    # 试探请求没有结果，重新熔断而不是停在半开状态
+    assert gateway.stats("test")["test"]["circuit"] == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    assert gateway.chat("test", MESSAGES, model="m") == "恢复"
+
+
+def test_cancelled_stream_probe_reopens_breaker():
+    async def hang():
+        await asyncio.sleep(10)
+
+    upstream = Upstream(httpx.Response(500), hang, httpx.Response(200, text=sse("恢复")))
+    gateway = make_gateway(upstream, max_retries=0, failure_threshold=1, reset_timeout=0.05)
+    with pytest.raises(GatewayError):
+        collect(gateway)
+    time.sleep(0.06)
+
+    async def disconnect():
+        task = asyncio.ensure_future(gateway.stream_chat_completions("test", {"messages": MESSAGES}).__anext__())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(disconnect())
+    assert gateway.stats("test")["test"]["circuit"] == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    assert collect(gateway) == ["恢复"]
+
+
+def test_stream_retries_before_first_token():
+    upstream = Upstream(httpx.Response(503), httpx.ConnectError("连接被拒绝"),
+                        httpx.Response(200, text=sse("你", "好")))
+    gateway = make_gateway(upstream)
+
+    assert collect(gateway) == ["你", "好"]
+    assert upstream.calls == 3 and gateway.stats("test")["test"]["retries"] == 2
+
+
+class BrokenStream(httpx.AsyncByteStream):
+    """发出第一段内容后连接中断"""
+
+    async def __aiter__(self):
+        yield sse("你").replace("data: [DONE]\n\n", "").encode("utf-8")
+        raise httpx.ReadError("连接中断")
+
+
+def test_stream_does_not_retry_after_first_token():
+    upstream = Upstream(httpx.Response(200, stream=BrokenStream()), httpx.Response(200, text=sse("重复")))
+    gateway = make_gateway(upstream)
+    received = []
+
+    async def run():
+        async for content in gateway.stream_chat_completions("test", {"messages": MESSAGES}):
+            received.append(content)
+    with pytest.raises(GatewayError):
+        asyncio.run(run())
+    assert received == ["你"] and upstream.calls == 1
@@ -0,0 +1,11 @@
+"""
+Demo_RAG_v2 与后端知识库问答共用的检索模块
+
+两边读写相同的磁盘文件（嵌入缓存、BM25倒排索引）和相同的Milvus元数据字段，
+因此只保留这一份实现，避免两份代码的文件格式不一致。
+
+与 llm_gateway 一起由 algorithm 目录打包安装（algorithm/pyproject.toml），
+Demo_RAG_v2 和后端的 requirements.txt 中都已列出：
+    pip install ../algorithm
+    from rag_common.embedding_cache import EmbeddingCache, CachedEmbeddings
+"""
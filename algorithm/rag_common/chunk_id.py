@@ -0,0 +1,12 @@
+"""
+文本块id
+
+文本块以内容的SHA-256哈希为id：Demo_RAG_v2入库时作为Milvus主键，也是入库清单（index_manifest.py）
+记录的文本块和BM25倒排索引（lexical_index.py）的键，检索结果按它与倒排索引中的文本块对应。
+"""
+import hashlib
+
+
+def chunk_hash(text):
+    """文本块内容哈希（64个十六进制字符），同时作为Milvus主键"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -0,0 +1,175 @@
+"""
+持久化嵌入向量缓存
+
+按 (模型名称, 文本哈希) 缓存嵌入向量，每个模型一个目录：
+- vectors.f32  float32向量，按行追加，读取时以内存映射方式访问
+- keys.bin     每行对应的16字节文本哈希，与vectors.f32的行一一对应（索引文件）
+- meta.json    模型名称和向量维度
+
+写入时先追加向量再追加哈希，并用文件锁串行化，
+因此入库脚本、Gradio界面和后端可以同时读写同一个缓存目录。
+Demo_RAG_v2 和后端共用本模块，两边的 EMBEDDING_CACHE_DIR 指向同一目录即可共享缓存。
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows下不加进程间文件锁
+    fcntl = None
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:
+    Embeddings = object
+
+CACHE_VERSION = 1
+KEY_BYTES = 16
+
+
+def text_key(text, kind="document"):
+    """文本哈希；文档和查询分开缓存，兼容查询需要加指令前缀的模型"""
+    return hashlib.blake2b(f"{kind}\x00{text}".encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir, model_name):
+        self.model_name = model_name
+        self.dir = os.path.join(cache_dir, re.sub(r"[^\w.-]", "_", model_name))
+        self.keys_path = os.path.join(self.dir, "keys.bin")
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self.lock_path = os.path.join(self.dir, ".lock")
+        self.dim = None
+        self._index = {}  # 文本哈希 -> 行号
+        self._rows = 0
+        self._mmap = None
+        self._lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+        with self._lock:
+            self._refresh()
+
+    def __len__(self):
+        return self._rows
+
+    def _refresh(self):
+        """加载其他进程新追加的行"""
+        if self.dim is None:
+            if not os.path.exists(self.meta_path):
+                return
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != CACHE_VERSION or meta.get("model") != self.model_name:
+                raise ValueError(f"嵌入缓存目录与模型不匹配: {self.dir}")
+            self.dim = meta["dim"]
+        if not os.path.exists(self.keys_path) or not os.path.exists(self.vectors_path):
+            return
+        # 以两个文件中较短的一个为准，忽略写入到一半的行
+        rows = min(os.path.getsize(self.keys_path) // KEY_BYTES,
+                   os.path.getsize(self.vectors_path) // (self.dim * 4))
+        if rows <= self._rows:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._rows * KEY_BYTES)
+            data = f.read((rows - self._rows) * KEY_BYTES)
+        for i in range(rows - self._rows):
+            self._index.setdefault(data[i * KEY_BYTES:(i + 1) * KEY_BYTES], self._rows + i)
+        self._rows = rows
+        self._mmap = None
+
+    def _vectors(self):
+        if self._mmap is None:
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self._rows, self.dim))
+        return self._mmap
+
+    def get_many(self, texts, kind="document"):
+        """返回与texts等长的列表，未命中的位置为None"""
+        keys = [text_key(t, kind) for t in texts]
+        with self._lock:
+            if any(k not in self._index for k in keys):
+                self._refresh()
+            if not self._index:
+                return [None] * len(texts)
+            vectors = self._vectors()
+            return [np.array(vectors[self._index[k]]) if k in self._index else None for k in keys]
+
+    def put_many(self, texts, vectors, kind="document"):
+        """追加新的向量，已存在的文本跳过"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(texts) == 0:
+            return
+        with self._lock:
+            lock_file = open(self.lock_path, "a")
+            try:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._refresh()
+                if self.dim is None:
+                    self.dim = int(vectors.shape[1])
+                    with open(self.meta_path, "w", encoding="utf-8") as f:
+                        json.dump({"version": CACHE_VERSION, "model": self.model_name, "dim": self.dim}, f)
+                elif vectors.shape[1] != self.dim:
+                    raise ValueError(f"向量维度 {vectors.shape[1]} 与缓存维度 {self.dim} 不一致")
+
+                new_keys, new_rows = [], []
+                for text, vector in zip(texts, vectors):
+                    key = text_key(text, kind)
+                    if key in self._index:
+                        continue
+                    self._index[key] = self._rows + len(new_keys)
+                    new_keys.append(key)
+                    new_rows.append(vector)
+                if not new_keys:
+                    return
+                # 先写向量再写哈希，读方看到哈希时向量一定已经写完
+                with open(self.vectors_path, "ab") as f:
+                    f.write(np.stack(new_rows).tobytes())
+                with open(self.keys_path, "ab") as f:
+                    f.write(b"".join(new_keys))
+                self._rows += len(new_keys)
+                self._mmap = None
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """带持久化缓存的嵌入模型包装，接口与LangChain的Embeddings一致"""
+
+    def __init__(self, embeddings, cache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts), "document", self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        return self._embed([text], "query", lambda t: [self.embeddings.embed_query(t[0])])[0]
+
+    def embed_queries(self, texts):
+        """批量计算查询向量，一次前向计算；与embed_query共用缓存
+        （适用于查询和文档编码方式相同的模型，如sentence-transformers）"""
+        return self._embed(list(texts), "query", self.embeddings.embed_documents)
+
+    def _embed(self, texts, kind, encode):
+        cached = self.cache.get_many(texts, kind)
+        missing = [i for i, v in enumerate(cached) if v is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            # 同一批内重复的文本只计算一次
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            encoded = encode(unique)
+            self.cache.put_many(unique, encoded, kind)
+            by_text = dict(zip(unique, encoded))
+            for i in missing:
+                cached[i] = by_text[texts[i]]
+        return [v.tolist() if isinstance(v, np.ndarray) else list(v) for v in cached]
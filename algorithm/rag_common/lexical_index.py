@@ -0,0 +1,194 @@
+"""
+本地倒排索引与BM25检索
+
+文物名称（如"镂空模纹壶"）这类精确字符串，多语言MiniLM嵌入常常召回不到。
+这里为每个集合维护一个倒排索引，与向量检索结果做倒数排名融合（RRF）。
+
+分词：中文按单字和相邻两字（bigram）切分，英文和数字按单词切分并转小写。
+不依赖分词词典，专有名词的每个相邻两字都能精确命中。
+
+索引以文本块内容哈希（chunk_id.chunk_hash）为键，与Milvus主键一致，随入库同步增删，以JSON保存在
+<索引目录>/<host>_<port>_<集合名>.json；索引目录由调用方传入（Demo_RAG_v2和后端各自的LEXICAL_INDEX_DIR配置）。
+Demo_RAG_v2入库时生成索引，后端的知识库问答共用本模块读取。索引目录由两边共用，因此只保存数据，
+不使用pickle（加载时可执行任意代码）；旧版本的.pkl索引不再读取，用ingest.py --full重新生成。
+"""
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+from rag_common.chunk_id import chunk_hash
+
+INDEX_VERSION = 2
+
+# RRF常数，取常用值60
+RRF_K = 60
+
+_CJK_RUN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """中文单字+bigram，英文数字按单词"""
+    text = text.lower()
+    tokens = _WORD.findall(text)
+    for run in _CJK_RUN.findall(text):
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def index_path(collection_name, host, port, index_dir):
+    name = re.sub(r"[^\w.-]", "_", f"{host}_{port}_{collection_name}")
+    return os.path.join(index_dir, f"{name}.json")
+
+
+class LexicalIndex:
+    def __init__(self, path=None, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.postings = {}   # 词 -> {文本块id: 词频}
+        self.doc_len = {}    # 文本块id -> 词数
+        self.docs = {}       # 文本块id -> (文本, 元数据)
+        self.total_len = 0
+        self._mtime = None
+
+    @classmethod
+    def load(cls, collection_name, host, port, index_dir):
+        path = index_path(collection_name, host, port, index_dir)
+        index = cls(path)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                index.postings = data["postings"]
+                index.doc_len = data["doc_len"]
+                index.docs = {doc_id: (text, metadata) for doc_id, (text, metadata) in data["docs"].items()}
+                index.total_len = sum(index.doc_len.values())
+            index._mtime = os.path.getmtime(path)
+        return index
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "postings": self.postings,
+                       "doc_len": self.doc_len, "docs": self.docs}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def add(self, ids, texts, metadatas=None):
+        metadatas = metadatas or [{} for _ in ids]
+        for doc_id, text, metadata in zip(ids, texts, metadatas):
+            if doc_id in self.doc_len:
+                continue
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+            length = sum(counts.values())
+            self.doc_len[doc_id] = length
+            self.total_len += length
+            self.docs[doc_id] = (text, metadata)
+
+    def remove(self, ids):
+        for doc_id in ids:
+            if doc_id not in self.doc_len:
+                continue
+            text, _ = self.docs.pop(doc_id)
+            self.total_len -= self.doc_len.pop(doc_id)
+            for term in set(tokenize(text)):
+                posting = self.postings.get(term)
+                if posting is not None:
+                    posting.pop(doc_id, None)
+                    if not posting:
+                        del self.postings[term]
+
+    def search(self, query, k=10, doc_filter=None):
+        """BM25检索，返回 [(文本块id, 得分)]，按得分降序
+
+        doc_filter(元数据) 返回False的文本块不参与排序（元数据过滤检索）
+        """
+        n = len(self.doc_len)
+        if n == 0:
+            return []
+        avg_len = self.total_len / n
+        scores = {}
+        for term, qtf in Counter(tokenize(query)).items():
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + qtf * idf * tf * (self.k1 + 1) / norm
+        if doc_filter is not None:
+            scores = {doc_id: score for doc_id, score in scores.items() if doc_filter(self.docs[doc_id][1])}
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """倒数排名融合：rankings为若干个按相关性排序的id列表，返回按融合得分降序的 [(id, 得分)]"""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def fuse_results(query, vector_results, index, top_k, make_document, distance_fn, candidates=20, doc_filter=None):
+    """向量检索结果与BM25结果做RRF融合
+
+    vector_results: 向量检索的 [(Document, L2距离)]，按距离升序
+    make_document(text, metadata): 为只被BM25召回的文本块构造Document
+    distance_fn(texts): 计算这些文本块与问题的L2距离，使返回值与纯向量检索的得分含义一致
+    doc_filter(元数据): 元数据过滤，与向量检索使用的过滤条件一致
+    返回融合后的前top_k个 [(Document, L2距离)]
+    """
+    vector_by_id = {}
+    vector_ids = []
+    for doc, score in vector_results:
+        doc_id = chunk_hash(doc.page_content)
+        if doc_id not in vector_by_id:
+            vector_by_id[doc_id] = (doc, score)
+            vector_ids.append(doc_id)
+    lexical_ids = [doc_id for doc_id, _ in index.search(query, candidates, doc_filter)]
+
+    fused = reciprocal_rank_fusion([vector_ids, lexical_ids])[:top_k]
+    results = []
+    lexical_only = []
+    for doc_id, _ in fused:
+        if doc_id in vector_by_id:
+            results.append(vector_by_id[doc_id])
+        else:
+            text, metadata = index.docs[doc_id]
+            lexical_only.append(len(results))
+            results.append((make_document(text, dict(metadata)), None))
+    if lexical_only:
+        distances = distance_fn([results[i][0].page_content for i in lexical_only])
+        for i, distance in zip(lexical_only, distances):
+            results[i] = (results[i][0], distance)
+    return results
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_index(collection_name, host, port, index_dir):
+    """查询时使用的只读索引，文件更新后自动重新加载；索引不存在时返回None"""
+    path = index_path(collection_name, host, port, index_dir)
+    if not os.path.exists(path):
+        return None
+    mtime = os.path.getmtime(path)
+    with _cache_lock:
+        index = _cache.get(path)
+        if index is None or index._mtime != mtime:
+            index = LexicalIndex.load(collection_name, host, port, index_dir)
+            _cache[path] = index
+        return index
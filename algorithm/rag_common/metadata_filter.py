@@ -0,0 +1,162 @@
+"""
+文本块结构化元数据与过滤检索
+
+入库时从文本块中抽取：
+- museum      馆名（"……博物馆/博物院/美术馆/纪念馆"）；文件名或文件中先出现的馆名沿用到后续文本块
+- dynasty     朝代（西周、战国、北宋等；单字朝代需带"代/朝/时期/早中晚期"等后缀或括号，避免误配"说明""金属"）
+- material    材质（青铜、玉、瓷、陶、金银器、漆器、书画、石刻、丝织、玻璃、骨角牙）
+- source_file 来源文件名
+每个文本块都带这四个字段（未识别时为空字符串），写入Milvus后成为标量字段，
+可以作为Milvus的分区键（MILVUS_PARTITION_KEY），检索时用过滤表达式先缩小范围再做向量检索。
+
+过滤条件可以是字典（{"museum": "故宫博物院", "dynasty": ["明", "清"]}），
+也可以是Milvus布尔表达式字符串（只用于Milvus）。
+元数据由Demo_RAG_v2入库时写入，Demo_RAG_v2和后端的知识库问答共用本模块构造过滤条件。
+"""
+import json
+import os
+import re
+from collections import Counter
+
+FILTER_FIELDS = ("museum", "dynasty", "material", "source_file")
+# 标量字段的最大长度；Milvus按UTF-8字节数检查VARCHAR的max_length，一个汉字占3字节
+MAX_FIELD_LENGTH = 256
+
+# 界面输入过滤条件时可用的中文字段名
+FIELD_ALIASES = {
+    "博物馆": "museum", "馆": "museum", "馆藏": "museum",
+    "朝代": "dynasty", "年代": "dynasty",
+    "材质": "material", "质地": "material",
+    "文件": "source_file", "来源": "source_file",
+}
+
+_MUSEUM = re.compile(r"[一-鿿]{2,12}?(?:博物馆|博物院|美术馆|纪念馆)")
+# 馆名前常见的非馆名字符，取最后一个之后的部分作为馆名
+_MUSEUM_PREFIX = re.compile(r".*[于在藏的和与是及为由从到、该此这那各]")
+
+_DYNASTY_NAMES = ("新石器时代", "旧石器时代", "南北朝", "西周", "东周", "春秋", "战国", "西汉", "东汉",
+                  "三国", "西晋", "东晋", "北魏", "五代", "北宋", "南宋", "民国")
+_DYNASTY = re.compile(
+    "(" + "|".join(_DYNASTY_NAMES) + ")"
+    r"|([夏商周秦汉晋隋唐宋辽金元明清])(?=代|朝|时期|[早中晚]期|[初末]年)"
+    r"|[（(【\[]([夏商周秦汉晋隋唐宋辽金元明清])[）)】\]]"
+)
+
+_MATERIALS = (
+    ("青铜", r"青铜|铜[器镜鼎爵尊壶簋觚]"),
+    ("玉", r"玉[器石璧琮佩雕璜圭]|[白青碧黄墨]玉"),
+    ("瓷", r"瓷"),
+    ("陶", r"陶"),
+    ("金银器", r"金器|银器|鎏金|金银"),
+    ("漆器", r"漆器|漆木|髹漆"),
+    ("书画", r"书画|绘画|书法|画卷|立轴|手卷"),
+    ("石刻", r"石刻|石雕|石碑|碑刻|造像"),
+    ("丝织", r"丝绸|丝织|织锦|刺绣|缂丝"),
+    ("玻璃", r"玻璃|琉璃"),
+    ("骨角牙", r"象牙|牙雕|骨器|角器"),
+)
+_MATERIAL_PATTERNS = [(label, re.compile(pattern)) for label, pattern in _MATERIALS]
+
+
+def truncate_bytes(value, max_bytes=MAX_FIELD_LENGTH):
+    """按UTF-8编码截断到max_bytes字节以内，不截断在多字节字符中间"""
+    return value.encode("utf-8")[:max_bytes].decode("utf-8", "ignore")
+
+
+def _most_common(values):
+    """出现次数最多的值，次数相同时取先出现的"""
+    if not values:
+        return ""
+    counts = Counter(values)
+    return max(values, key=lambda v: (counts[v], -values.index(v)))
+
+
+def extract_museum(text):
+    names = []
+    for match in _MUSEUM.finditer(text):
+        name = _MUSEUM_PREFIX.sub("", match.group())
+        if len(name) > 3:
+            names.append(name)
+    return truncate_bytes(_most_common(names))
+
+
+def extract_dynasty(text):
+    return _most_common([next(g for g in m.groups() if g) for m in _DYNASTY.finditer(text)])
+
+
+def extract_material(text):
+    counts = [(len(pattern.findall(text)), label) for label, pattern in _MATERIAL_PATTERNS]
+    count, label = max(counts, key=lambda item: item[0])
+    return label if count else ""
+
+
+class FileMetadata:
+    """为一个文件的各文本块抽取元数据；文件名或已出现过的馆名作为后续文本块的默认馆名"""
+
+    def __init__(self, source):
+        self.source_file = truncate_bytes(os.path.basename(source))
+        self.museum = extract_museum(os.path.splitext(self.source_file)[0])
+
+    def extract(self, text):
+        museum = extract_museum(text) or self.museum
+        if not self.museum:
+            self.museum = museum
+        return {
+            "museum": museum,
+            "dynasty": extract_dynasty(text),
+            "material": extract_material(text),
+            "source_file": self.source_file,
+        }
+
+
+def _normalize(filters):
+    """去掉空值，检查字段名；返回 {字段: [值, ...]}"""
+    normalized = {}
+    for field, value in (filters or {}).items():
+        field = FIELD_ALIASES.get(field, field)
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"不支持的过滤字段: {field}（可选 {', '.join(FILTER_FIELDS)}）")
+        values = [str(v) for v in (value if isinstance(value, (list, tuple, set)) else [value])
+                  if v is not None and str(v) != ""]
+        if values:
+            normalized[field] = values
+    return normalized
+
+
+def build_filter_expr(filters):
+    """过滤条件转为Milvus布尔表达式，没有条件时返回None；字符串视为已写好的表达式"""
+    if isinstance(filters, str):
+        return filters.strip() or None
+    clauses = []
+    for field, values in _normalize(filters).items():
+        # JSON字符串字面量的转义规则与Milvus表达式一致
+        quoted = [json.dumps(v, ensure_ascii=False) for v in values]
+        clauses.append(f"{field} == {quoted[0]}" if len(quoted) == 1 else f"{field} in [{', '.join(quoted)}]")
+    return " and ".join(clauses) or None
+
+
+def metadata_matcher(filters):
+    """返回判断元数据是否满足过滤条件的函数，没有条件时返回None（用于BM25索引和本地向量存储）"""
+    if isinstance(filters, str):
+        if filters.strip():
+            raise ValueError("表达式形式的过滤条件只支持Milvus，请使用 {字段: 值} 形式")
+        return None
+    normalized = _normalize(filters)
+    if not normalized:
+        return None
+    return lambda metadata: all(str((metadata or {}).get(field, "")) in values
+                                for field, values in normalized.items())
+
+
+def parse_filters(text):
+    """解析界面输入的过滤条件，如 "博物馆=故宫博物院，朝代=明|清"；空输入返回None"""
+    filters = {}
+    for item in re.split(r"[,，;；\n]+", text or ""):
+        if not item.strip():
+            continue
+        if "=" not in item:
+            raise ValueError(f"过滤条件格式应为 字段=值: {item.strip()}")
+        field, value = (part.strip() for part in item.split("=", 1))
+        values = [v.strip() for v in value.split("|") if v.strip()]
+        filters[field] = values if len(values) > 1 else value
+    return _normalize(filters) or None
@@ -0,0 +1,90 @@
+"""
+交叉编码器重排序
+
+向量检索（或混合检索）先取较宽的候选集，再由小型交叉编码器对 (问题, 文本块)
+成对打分，只把得分最高的前n个文本块交给大语言模型，替代按L2距离换算相似度、
+再以60%为阈值的粗过滤。
+
+打分在CPU上按批进行，并受时间预算约束：按检索排名依次打分，根据已测得的
+每对耗时估算下一批能否在预算内完成，放不下时缩小批次或提前停止。
+第一批总会打分；未来得及打分的候选排在已打分候选之后，保持原检索顺序，因此超出预算时
+结果退化为原检索排序，而不会拖慢整个问答。
+
+Demo_RAG_v2和后端的知识库问答共用本模块。
+"""
+import copy
+import threading
+import time
+
+DEFAULT_RERANK_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+
+class CrossEncoderReranker:
+    def __init__(self, model_name=DEFAULT_RERANK_MODEL, batch_size=16, time_budget_ms=300, max_length=512):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.time_budget_ms = time_budget_ms
+        self.max_length = max_length
+        self._model = None
+        self._lock = threading.Lock()
+        self._pair_time = None  # 每对打分耗时的滑动平均（秒）
+
+    def load(self):
+        """加载交叉编码器（仅首次调用时加载）"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+        return self._model
+
+    def score(self, query, texts):
+        """不受时间预算约束地为全部文本打分"""
+        model = self.load()
+        return [float(s) for s in model.predict([(query, t) for t in texts], batch_size=self.batch_size,
+                                                show_progress_bar=False)]
+
+    def rerank(self, query, docs_with_scores, top_n, time_budget_ms=None):
+        """
+        重排序
+
+        docs_with_scores: 检索返回的 [(Document, L2距离)]，按相关性排序
+        time_budget_ms: 本次的时间预算，默认使用构造时的设置，为0时不限时
+        返回前top_n个 [(Document, L2距离)]；打过分的文档返回其副本，得分在副本的 metadata["rerank_score"]，
+        传入的Document（可能由调用方或向量存储持有）不做修改；未打分的文档原样返回
+        """
+        if not docs_with_scores:
+            return []
+        model = self.load()
+        budget = (self.time_budget_ms if time_budget_ms is None else time_budget_ms) / 1000.0
+        deadline = time.perf_counter() + budget if budget > 0 else None
+
+        scores = []
+        pos = 0
+        while pos < len(docs_with_scores):
+            size = self.batch_size
+            if deadline is not None and scores:
+                remaining = deadline - time.perf_counter()
+                # 按已测得的每对耗时估算本批能放下多少对
+                size = min(size, int(remaining / self._pair_time)) if self._pair_time else size
+                if size <= 0:
+                    break
+            batch = docs_with_scores[pos:pos + size]
+            start = time.perf_counter()
+            batch_scores = model.predict([(query, doc.page_content) for doc, _ in batch],
+                                         batch_size=len(batch), show_progress_bar=False)
+            per_pair = (time.perf_counter() - start) / len(batch)
+            self._pair_time = per_pair if self._pair_time is None else 0.8 * self._pair_time + 0.2 * per_pair
+            scores.extend(float(s) for s in batch_scores)
+            pos += len(batch)
+
+        scored = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        order = scored + list(range(len(scores), len(docs_with_scores)))
+        results = []
+        for i in order[:top_n]:
+            doc, distance = docs_with_scores[i]
+            if i < len(scores):
+                doc = copy.copy(doc)
+                doc.metadata = dict(doc.metadata, rerank_score=scores[i])
+            results.append((doc, distance))
+        return results
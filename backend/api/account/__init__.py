@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from core.databases import get_db, User
 from services.account import register_user, login_user, hash_password
 from pydantic import BaseModel
-from core.auth.jwt import get_current_user, TokenData
+from core.auth.jwt import get_current_user, TokenData, oauth2_scheme, revoke_token, revoke_user_tokens
 from fastapi.security import OAuth2PasswordRequestForm
 
 # 定义请求模型
@@ -32,7 +32,7 @@ router = APIRouter()
 @router.post("/register", summary="用户注册")
 async def register(request: UserRegisterRequest, db: Session = Depends(get_db)):
     try:
-        user = register_user(db, request.phone_number, request.password, request.id_number, request.name)
+        user = await register_user(db, request.phone_number, request.password, request.id_number, request.name)
         return {
             "code": 200,
             "message": "注册成功",
@@ -55,7 +55,7 @@ async def register(request: UserRegisterRequest, db: Session = Depends(get_db)):
 @router.post("/login", summary="用户登录")
 async def login(request: UserLoginRequest, db: Session = Depends(get_db)):
     try:
-        user = login_user(db, request.phone_number, request.password)
+        user = await login_user(db, request.phone_number, request.password)
         return {
             "code": 200,
             "message": "登录成功",
@@ -78,7 +78,7 @@ async def login(request: UserLoginRequest, db: Session = Depends(get_db)):
 @router.post("/token", summary="OAuth2兼容登录")
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     try:
-        user = login_user(db, form_data.username, form_data.password)
+        user = await login_user(db, form_data.username, form_data.password)
         return {
             "access_token": user["access_token"],
             "token_type": "bearer"
@@ -104,6 +104,16 @@ async def read_users_me(current_user: TokenData = Depends(get_current_user), db:
         }
     }
 
+# 退出登录，吊销当前令牌
+@router.post("/logout", summary="退出登录")
+async def logout(token: str = Depends(oauth2_scheme), current_user: TokenData = Depends(get_current_user)):
+    revoke_token(token)
+    return {
+        "code": 200,
+        "message": "退出成功",
+        "data": None
+    }
+
 # 新增接口
 @router.post("/check_user", summary="检查用户是否存在")
 async def check_user(request: CheckUserRequest, db: Session = Depends(get_db)):
@@ -132,8 +142,10 @@ async def reset_password(request: ResetPasswordRequest, db: Session = Depends(ge
                 "message": "用户不存在",
                 "data": None
             }
-        user.password = hash_password(request.new_password)
+        user.password = await hash_password(request.new_password)
         db.commit()
+        # 重置密码后，此前签发的令牌全部失效
+        revoke_user_tokens(user.user_id)
         return {
             "code": 200,
             "message": "密码重置成功",
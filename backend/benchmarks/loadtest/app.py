@@ -0,0 +1,110 @@
+"""
+压测用后端启动脚本
+
+加载正式的FastAPI应用，并做以下替换：
+1. AiHubMixLLM指向本地模拟大模型服务（mock_llm_server）
+2. 知识库检索器替换为FakeKnowledgeBaseRetriever
+3. 知识图谱的Neo4j驱动替换为FakeNeo4jDriver
+4. 数据库默认使用临时SQLite文件，也可通过--database-url指定真实MySQL
+
+运行方式（在backend目录下）：
+    python -m benchmarks.loadtest.app --llm-base-url http://127.0.0.1:9999/v1 --port 9988
+"""
+import argparse
+import os
+import tempfile
+
+# 压测默认的JWT密钥，driver需使用相同的密钥签发令牌
+DEFAULT_SECRET_KEY = "loadtest-secret-key"
+
+
+def configure_environment(args):
+    """在导入应用之前设置环境变量，使Settings可以在没有.env的情况下初始化"""
+    os.environ.setdefault("MYSQL_IP", "127.0.0.1")
+    os.environ.setdefault("MYSQL_PORT", "3306")
+    os.environ.setdefault("MYSQL_BASE", "loadtest")
+    os.environ.setdefault("MYSQL_USER", "loadtest")
+    os.environ.setdefault("MYSQL_PASSWORD", "loadtest")
+    os.environ["SECRET_KEY"] = args.secret_key
+    # 压测流量全部来自本机，默认关闭限流；需要测量限流开销时可显式设置为true
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    os.environ["AIHUBMIX_API_KEY"] = "mock-key"
+    os.environ["AIHUBMIX_BASE_URL"] = args.llm_base_url
+    os.environ["AIHUBMIX_MODEL"] = args.model
+
+
+def _use_portable_timestamp_defaults(metadata):
+    """将MySQL专用的ON UPDATE默认值替换为SQLite可用的CURRENT_TIMESTAMP"""
+    from sqlalchemy import text
+    for table in metadata.tables.values():
+        for column in table.columns:
+            default = column.server_default
+            if default is not None and "ON UPDATE" in str(getattr(default, "arg", "")):
+                column.server_default.arg = text("CURRENT_TIMESTAMP")
+
+
+def build_app(args):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import NullPool
+
+    import main
+    import services.chat
+    from core import databases
+    from core.llm import AiHubMixLLM
+    from core.llm.rag.knowledge_graph import KnowledgeGraph
+    from benchmarks.loadtest.fake_stores import FakeNeo4jDriver, FakeKnowledgeBaseRetriever
+
+    # 数据库
+    if args.database_url:
+        engine = create_engine(args.database_url, pool_size=args.db_pool_size, max_overflow=args.db_pool_size)
+    else:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="kq_loadtest_"), "loadtest.db")
+        engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False, "timeout": 60},
+                               poolclass=NullPool)
+        _use_portable_timestamp_defaults(databases.Base.metadata)
+    databases.Base.metadata.create_all(engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def get_loadtest_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[databases.get_db] = get_loadtest_db
+
+    # 大模型与存储替身
+    llm = AiHubMixLLM(api_key="mock-key", base_url=args.llm_base_url, model=args.model)
+    llm.kb_retriever = FakeKnowledgeBaseRetriever(latency_ms=args.milvus_latency_ms)
+    llm.kg_factory = lambda: KnowledgeGraph(
+        driver=FakeNeo4jDriver(latency_ms=args.neo4j_latency_ms, rows=args.neo4j_rows)
+    )
+    services.chat.ai_llm = llm
+    return main.app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="使用模拟大模型和模拟存储启动后端")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9988)
+    parser.add_argument("--llm-base-url", default="http://127.0.0.1:9999/v1")
+    parser.add_argument("--model", default="mock-model")
+    parser.add_argument("--secret-key", default=DEFAULT_SECRET_KEY)
+    parser.add_argument("--database-url", default="", help="不指定则使用临时SQLite")
+    parser.add_argument("--db-pool-size", type=int, default=50)
+    parser.add_argument("--milvus-latency-ms", type=float, default=30.0)
+    parser.add_argument("--neo4j-latency-ms", type=float, default=20.0)
+    parser.add_argument("--neo4j-rows", type=int, default=5)
+    args = parser.parse_args()
+
+    configure_environment(args)
+    app = build_app(args)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+流式问答压测驱动
+
+模拟多个并发用户，每个用户创建指定类型的会话后循环调用
+/v1/api/chat/sessions/{id}/stream，统计各会话类型的：
+- TTFT（首token时间）的p50/p95/p99
+- 每个请求的token生成速率（tokens/s）
+- 错误率
+
+运行方式（在backend目录下）：
+    python -m benchmarks.loadtest.driver --users 50,100,200,500 --requests-per-user 3
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+from jose import jwt
+
+from benchmarks.loadtest.app import DEFAULT_SECRET_KEY
+
+SESSION_TYPE_NAMES = {1: "普通问答", 2: "知识库问答", 3: "知识图谱问答"}
+
+# 后端在出错时以正常文本输出的提示语，首个片段中出现即计为错误
+ERROR_MARKERS = ("抱歉", "出错", "无法连接", "失败", '{"error"')
+
+QUESTIONS = [
+    "大英博物馆有哪些商代青铜器？",
+    "镂空模纹壶的材质是什么？",
+    "介绍一下唐代三彩马的特点",
+    "哪些宋代瓷器现藏于美国博物馆？",
+]
+
+
+@dataclass
+class RequestResult:
+    session_type: int
+    ok: bool
+    ttft: Optional[float] = None
+    duration: float = 0.0
+    tokens: int = 0
+    error: str = ""
+
+
+@dataclass
+class RunStats:
+    users: int
+    wall_time: float = 0.0
+    results: List[RequestResult] = field(default_factory=list)
+
+
+def make_token(secret_key: str, user_id: int) -> str:
+    """使用与后端相同的算法直接签发JWT，绕过登录接口"""
+    payload = {
+        "user_id": user_id,
+        "phone_number": f"199{user_id:08d}",
+        "role_type": 0,
+        "exp": datetime.utcnow() + timedelta(hours=2),
+    }
+    return jwt.encode(payload, secret_key, algorithm="HS256")
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """最近秩法计算百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+async def stream_once(client: httpx.AsyncClient, session_id: int, session_type: int, question: str,
+                      timeout: float) -> RequestResult:
+    result = RequestResult(session_type=session_type, ok=False)
+    start = time.perf_counter()
+    try:
+        async with client.stream("POST", f"/chat/sessions/{session_id}/stream",
+                                 json={"content": question}, timeout=timeout) as response:
+            if response.status_code != 200:
+                result.error = f"HTTP {response.status_code}"
+                return result
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                data = line[len("data: "):]
+                if data == "[START]":
+                    continue
+                if data == "[DONE]":
+                    result.ok = not result.error
+                    break
+                if result.ttft is None:
+                    result.ttft = time.perf_counter() - start
+                    if any(marker in data[:40] for marker in ERROR_MARKERS):
+                        result.error = data[:50]
+                result.tokens += 1
+            else:
+                result.error = result.error or "stream closed before [DONE]"
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    finally:
+        result.duration = time.perf_counter() - start
+    return result
+
+
+async def simulate_user(base_url: str, secret_key: str, user_id: int, session_type: int,
+                        requests_per_user: int, timeout: float, results: List[RequestResult]):
+    headers = {"Authorization": f"Bearer {make_token(secret_key, user_id)}"}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=timeout) as client:
+        try:
+            response = await client.post("/chat/sessions", json={"title": "压测会话", "type": session_type})
+            body = response.json()
+            if body.get("code") != 200:
+                raise RuntimeError(body.get("message"))
+            session_id = body["data"]["id"]
+        except Exception as e:
+            results.append(RequestResult(session_type=session_type, ok=False, error=f"创建会话失败: {e}"))
+            return
+        for i in range(requests_per_user):
+            question = QUESTIONS[(user_id + i) % len(QUESTIONS)]
+            results.append(await stream_once(client, session_id, session_type, question, timeout))
+
+
+async def run_level(args, users: int) -> RunStats:
+    stats = RunStats(users=users)
+    session_types = [int(t) for t in args.session_types.split(",")]
+    start = time.perf_counter()
+    tasks = []
+    for i in range(users):
+        session_type = session_types[i % len(session_types)]
+        tasks.append(simulate_user(args.base_url, args.secret_key, args.user_id_offset + i, session_type,
+                                   args.requests_per_user, args.timeout, stats.results))
+    await asyncio.gather(*tasks)
+    stats.wall_time = time.perf_counter() - start
+    return stats
+
+
+def summarize(stats: RunStats) -> Dict[str, Dict]:
+    by_type = defaultdict(list)
+    for r in stats.results:
+        by_type[r.session_type].append(r)
+
+    summary = {}
+    for session_type, results in sorted(by_type.items()):
+        ttfts = [r.ttft for r in results if r.ok and r.ttft is not None]
+        rates = [r.tokens / (r.duration - r.ttft) for r in results
+                 if r.ok and r.ttft is not None and r.duration > r.ttft]
+        errors = [r for r in results if not r.ok]
+        summary[SESSION_TYPE_NAMES.get(session_type, str(session_type))] = {
+            "requests": len(results),
+            "errors": len(errors),
+            "error_rate": len(errors) / len(results) if results else 0.0,
+            "ttft_p50": percentile(ttfts, 50),
+            "ttft_p95": percentile(ttfts, 95),
+            "ttft_p99": percentile(ttfts, 99),
+            "tokens_per_sec_p50": percentile(rates, 50),
+            "total_tokens": sum(r.tokens for r in results),
+            "sample_errors": sorted({r.error for r in errors})[:3],
+        }
+    return summary
+
+
+def print_summary(stats: RunStats, summary: Dict[str, Dict]):
+    total_tokens = sum(s["total_tokens"] for s in summary.values())
+    print(f"\n=== 并发用户数: {stats.users}  总耗时: {stats.wall_time:.1f}s  "
+          f"总吞吐: {total_tokens / stats.wall_time:.1f} tokens/s ===")
+    print(f"{'会话类型':<10}{'请求数':>8}{'错误率':>8}{'TTFT p50':>10}{'TTFT p95':>10}{'TTFT p99':>10}{'tokens/s':>10}")
+
+    def fmt(v, unit="s"):
+        return "-" if v is None else f"{v:.3f}{unit}" if unit == "s" else f"{v:.1f}"
+
+    for name, s in summary.items():
+        print(f"{name:<10}{s['requests']:>8}{s['error_rate'] * 100:>7.1f}%"
+              f"{fmt(s['ttft_p50']):>10}{fmt(s['ttft_p95']):>10}{fmt(s['ttft_p99']):>10}"
+              f"{fmt(s['tokens_per_sec_p50'], ''):>10}")
+        for err in s["sample_errors"]:
+            print(f"    错误示例: {err}")
+
+
+async def main_async(args):
+    report = []
+    for users in [int(u) for u in args.users.split(",")]:
+        stats = await run_level(args, users)
+        summary = summarize(stats)
+        print_summary(stats, summary)
+        report.append({"users": users, "wall_time": stats.wall_time, "session_types": summary})
+        args.user_id_offset += users
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式问答压测驱动")
+    parser.add_argument("--base-url", default="http://127.0.0.1:9988/v1/api")
+    parser.add_argument("--secret-key", default=DEFAULT_SECRET_KEY)
+    parser.add_argument("--users", default="50,100,200,500", help="逗号分隔的并发用户数，依次压测")
+    parser.add_argument("--requests-per-user", type=int, default=3)
+    parser.add_argument("--session-types", default="1,2,3", help="逗号分隔的会话类型，用户按顺序轮流分配")
+    parser.add_argument("--timeout", type=float, default=180.0)
+    parser.add_argument("--user-id-offset", type=int, default=100000)
+    parser.add_argument("--output", default="", help="可选，将结果写入JSON文件")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
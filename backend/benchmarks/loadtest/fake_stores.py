@@ -0,0 +1,127 @@
+"""
+Neo4j与Milvus的本地替身
+
+压测时替换KnowledgeGraph使用的Neo4j驱动以及知识库检索器，
+按配置的延迟返回合成数据，使压测结果只反映后端自身的开销。
+"""
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Tuple
+
+from core.rag import KnowledgeBaseRetriever
+
+
+class FakeDocument:
+    """与LangChain Document接口一致的简单文档对象"""
+
+    def __init__(self, page_content: str, metadata: Dict[str, Any] = None):
+        self.page_content = page_content
+        self.metadata = metadata or {}
+
+
+def make_relic_records(n: int) -> List[Dict[str, Any]]:
+    """生成n条合成的文物查询结果"""
+    dynasties = ["商代", "西周", "战国", "汉代", "唐代", "宋代", "明代", "清代"]
+    museums = ["大英博物馆", "大都会艺术博物馆", "哈佛艺术博物馆", "卢浮宫"]
+    records = []
+    for i in range(n):
+        records.append({
+            "relic_name": f"模拟文物{i}",
+            "description": f"这是第{i}件模拟文物的描述，纹饰精美，保存完好。",
+            "dynasty": dynasties[i % len(dynasties)],
+            "type": "青铜器",
+            "size": f"高：{10 + i % 30}厘米",
+            "material": "青铜",
+            "museum_name": museums[i % len(museums)],
+        })
+    return records
+
+
+class _FakeResult:
+    def __init__(self, records):
+        self._records = records
+
+    async def data(self):
+        return self._records
+
+
+class _FakeAsyncSession:
+    def __init__(self, driver):
+        self._driver = driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def run(self, query, parameters=None, **kwargs):
+        await asyncio.sleep(self._driver.query_latency())
+        return _FakeResult(make_relic_records(self._driver.rows))
+
+
+class FakeNeo4jDriver:
+    """模拟neo4j.AsyncDriver，忽略查询语句，返回固定行数的合成结果"""
+
+    def __init__(self, latency_ms: float = 20.0, jitter_ms: float = 5.0, rows: int = 5):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rows = rows
+
+    def query_latency(self) -> float:
+        return max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    def session(self, **kwargs):
+        return _FakeAsyncSession(self)
+
+    async def close(self):
+        pass
+
+
+class FakeGraph:
+    """模拟同步的图数据库对象（与GraphData.execute_query接口一致）"""
+
+    def __init__(self, rows: int = 5):
+        self.rows = rows
+        self._records = make_relic_records(rows)
+
+    def execute_query(self, query, parameters=None):
+        return [dict(r) for r in self._records]
+
+    def close(self):
+        pass
+
+
+class FakeKnowledgeBaseRetriever(KnowledgeBaseRetriever):
+    """模拟知识库检索器，不连接Milvus也不加载嵌入模型
+
+    各方法在线程池中执行，因此使用time.sleep模拟阻塞耗时。
+    """
+
+    def __init__(self, latency_ms: float = 30.0, jitter_ms: float = 10.0):
+        super().__init__(host="", port="", db_name="", collection_name="fake_collection")
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+
+    def check_dependencies(self):
+        pass
+
+    def connect(self):
+        pass
+
+    def load_embeddings(self):
+        return None
+
+    def search(self, query: str, top_k: int = 3, collection_name: str = None,
+               filters: Any = None) -> List[Tuple[Any, float]]:
+        time.sleep(max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+        docs = []
+        for i in range(top_k):
+            doc = FakeDocument(
+                page_content=f"【模拟文档{i}】{query}相关的馆藏资料：该文物为商代晚期青铜器，纹饰为饕餮纹。" * 4,
+                metadata={"source": f"fake_source_{i}.pdf"},
+            )
+            # 分数为L2距离，越小越相似
+            docs.append((doc, 10.0 + i * 5))
+        return docs
@@ -0,0 +1,157 @@
+"""
+OpenAI兼容的本地模拟大模型服务
+
+用于压测时替代真实的大模型API，不消耗任何token。
+支持配置首token延迟、生成速率、回复长度以及失败率。
+
+运行方式（在backend目录下）：
+    python -m benchmarks.loadtest.mock_llm_server --port 9999 --tokens-per-sec 50 --first-token-ms 300 --failure-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+# 模拟回复使用的token片段
+MOCK_TOKENS = ["根据", "现有", "资料", "，", "这件", "文物", "出土", "于", "河南", "安阳", "，",
+               "属于", "商代", "晚期", "青铜器", "，", "现藏", "于", "大英", "博物馆", "。"]
+
+# 知识图谱问答生成Cypher时返回的模拟语句
+MOCK_CYPHER = "```\nMATCH (r:CulturalRelic) WHERE r.dynasty = '商代' RETURN r.name, r.description LIMIT 5\n```"
+
+
+@dataclass
+class MockConfig:
+    """模拟服务配置"""
+    tokens_per_sec: float = 50.0      # 每秒生成的token数
+    first_token_ms: float = 300.0     # 首token延迟（毫秒）
+    jitter_ms: float = 50.0           # 首token延迟的随机抖动（毫秒）
+    response_tokens: int = 200        # 每次回复的token数
+    failure_rate: float = 0.0         # 请求失败概率
+    failure_status: int = 500         # 失败时返回的HTTP状态码
+    stream_failure_rate: float = 0.0  # 流式输出中途断开的概率
+
+
+config = MockConfig()
+app = FastAPI(title="Mock OpenAI-compatible LLM")
+
+
+def _first_token_delay() -> float:
+    delay = config.first_token_ms + random.uniform(-config.jitter_ms, config.jitter_ms)
+    return max(0.0, delay) / 1000
+
+
+def _is_cypher_request(messages) -> bool:
+    """判断是否为Cypher生成请求（知识图谱问答的第一步）"""
+    for msg in messages:
+        content = msg.get("content")
+        if isinstance(content, str) and "Cypher" in content:
+            return True
+    return False
+
+
+def _error_response():
+    return JSONResponse(
+        status_code=config.failure_status,
+        content={"error": {"message": "mock failure", "type": "mock_error", "code": config.failure_status}}
+    )
+
+
+def _chunk(completion_id: str, model: str, content: str = None, finish_reason: str = None) -> str:
+    delta = {"content": content} if content is not None else {}
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": "mock-model", "object": "model", "owned_by": "mock"}]}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model") or "mock-model"
+    messages = body.get("messages") or []
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+
+    if random.random() < config.failure_rate:
+        await asyncio.sleep(_first_token_delay())
+        return _error_response()
+
+    if not body.get("stream"):
+        # 非流式：等待全部token"生成"完毕后一次性返回
+        if _is_cypher_request(messages):
+            content = MOCK_CYPHER
+            n_tokens = 20
+        else:
+            n_tokens = config.response_tokens
+            content = "".join(MOCK_TOKENS[i % len(MOCK_TOKENS)] for i in range(n_tokens))
+        await asyncio.sleep(_first_token_delay() + n_tokens / config.tokens_per_sec)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": n_tokens, "total_tokens": n_tokens},
+        }
+
+    async def event_stream():
+        await asyncio.sleep(_first_token_delay())
+        interval = 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0
+        fail_at = None
+        if random.random() < config.stream_failure_rate:
+            fail_at = random.randint(1, max(1, config.response_tokens - 1))
+        for i in range(config.response_tokens):
+            if fail_at is not None and i == fail_at:
+                # 模拟上游中途断开
+                raise RuntimeError("mock stream interrupted")
+            yield _chunk(completion_id, model, MOCK_TOKENS[i % len(MOCK_TOKENS)])
+            if interval:
+                await asyncio.sleep(interval)
+        yield _chunk(completion_id, model, finish_reason="stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI兼容的本地模拟大模型服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--tokens-per-sec", type=float, default=config.tokens_per_sec)
+    parser.add_argument("--first-token-ms", type=float, default=config.first_token_ms)
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms)
+    parser.add_argument("--response-tokens", type=int, default=config.response_tokens)
+    parser.add_argument("--failure-rate", type=float, default=config.failure_rate)
+    parser.add_argument("--failure-status", type=int, default=config.failure_status)
+    parser.add_argument("--stream-failure-rate", type=float, default=config.stream_failure_rate)
+    args = parser.parse_args()
+
+    config.tokens_per_sec = args.tokens_per_sec
+    config.first_token_ms = args.first_token_ms
+    config.jitter_ms = args.jitter_ms
+    config.response_tokens = args.response_tokens
+    config.failure_rate = args.failure_rate
+    config.failure_status = args.failure_status
+    config.stream_failure_rate = args.stream_failure_rate
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
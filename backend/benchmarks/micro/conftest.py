@@ -0,0 +1,16 @@
+import os
+
+import pytest
+
+# Settings在导入时读取环境变量，微基准不依赖真实的数据库和密钥
+for _key, _value in {
+    "MYSQL_IP": "127.0.0.1",
+    "MYSQL_PORT": "3306",
+    "MYSQL_BASE": "benchmark",
+    "MYSQL_USER": "benchmark",
+    "MYSQL_PASSWORD": "benchmark",
+    "SECRET_KEY": "benchmark-secret-key",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+pytest.importorskip("pytest_benchmark")
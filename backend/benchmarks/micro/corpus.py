@@ -0,0 +1,64 @@
+"""
+知识图谱问答微基准使用的问题语料与合成查询结果
+"""
+from typing import Any, Dict, List
+
+# 覆盖CypherQuerier.execute_query各个分支的真实用户问法
+QUESTIONS: List[str] = [
+    # 博物馆文物的宽泛问法
+    "大英博物馆有哪些文物？",
+    "介绍一下大都会艺术博物馆的藏品",
+    "给我列举一些哈佛艺术博物馆的展品",
+    "故宫博物院都有哪些文物",
+    "说说卢浮宫博物馆里的中国文物",
+    "波士顿美术博物馆有啥藏品",
+    # 文物与博物馆的归属
+    "镂空模纹壶属于大英博物馆吗？",
+    "青铜饕餮纹鼎属于大都会艺术博物馆吗",
+    # 收藏地
+    "镂空模纹壶在大英博物馆吗？",
+    "三彩骆驼载乐俑收藏于哪个博物馆",
+    "清明上河图在哪里",
+    "女史箴图收藏地是哪个博物馆",
+    # 材质
+    "镂空模纹壶的材质是什么？",
+    "青花缠枝莲纹梅瓶是什么材质",
+    "玉琮的材质",
+    # 常用模板
+    "镂空模纹壶的基本信息是什么",
+    "唐三彩马的基本信息",
+    "镂空模纹壶的朝代",
+    "青铜鼎属于哪个朝代",
+    "越王勾践剑的年代",
+    "镂空模纹壶的尺寸",
+    "司母戊鼎有多大",
+    "富春山居图的作者",
+    "洛神赋图是谁制作的",
+    "大英博物馆的简介",
+    "镂空模纹壶的图片",
+    "青花瓷瓶的图片有哪些",
+    # 兜底的模糊检索
+    "商代 青铜器",
+    "宋代的瓷器",
+    "敦煌 经卷 流失",
+    "汝窑 天青釉",
+    "明代 宣德炉",
+]
+
+
+def make_result_rows(n: int) -> List[Dict[str, Any]]:
+    """生成n行合成的查询结果，包含字符串、空值和嵌套字典"""
+    rows = []
+    for i in range(n):
+        rows.append({
+            "relic_name": f"青铜器{i}",
+            "description": "器身饰饕餮纹，两侧有扉棱，纹饰繁缛精美，为商代晚期典型器物。",
+            "dynasty": "商代" if i % 3 else None,
+            "size": f"高：{20 + i % 40}厘米，口径：{10 + i % 15}厘米",
+            "museum": {
+                "museum_name": "大英博物馆",
+                "location": "伦敦",
+                "established_year": "1753",
+            },
+        })
+    return rows
@@ -0,0 +1,60 @@
+"""
+知识图谱问答热路径的微基准
+
+覆盖：
+- CypherQuerier.execute_query：问题解析（正则匹配、字符串拼接）及结果整理
+- KnowledgeGraph.format_results：查询结果序列化
+
+运行方式见 benchmarks/README.md。
+"""
+import asyncio
+
+import pytest
+
+from benchmarks.loadtest.fake_stores import FakeGraph
+from benchmarks.micro.corpus import QUESTIONS, make_result_rows
+from core.llm.rag.cypher_querier import CypherQuerier
+from core.llm.rag.knowledge_graph import KnowledgeGraph
+
+
+class _NoopDriver:
+    async def close(self):
+        pass
+
+
+@pytest.fixture(scope="module")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="module")
+def querier():
+    return CypherQuerier(FakeGraph(rows=5))
+
+
+# 用序号作为用例ID，避免中文在报告中被转义
+@pytest.mark.parametrize("question", QUESTIONS, ids=[f"q{i:02d}" for i in range(len(QUESTIONS))])
+def test_execute_query_per_question(benchmark, loop, querier, question):
+    benchmark.group = "execute_query"
+    benchmark(lambda: loop.run_until_complete(querier.execute_query(question)))
+
+
+def test_execute_query_corpus(benchmark, loop, querier):
+    benchmark.group = "execute_query_corpus"
+
+    async def run_corpus():
+        for question in QUESTIONS:
+            await querier.execute_query(question)
+
+    benchmark(lambda: loop.run_until_complete(run_corpus()))
+
+
+@pytest.mark.parametrize("rows", [10, 100, 1000, 10000])
+def test_format_results(benchmark, loop, rows):
+    benchmark.group = "format_results"
+    kg = KnowledgeGraph(driver=_NoopDriver())
+    results = make_result_rows(rows)
+    formatted = benchmark(lambda: loop.run_until_complete(kg.format_results(results)))
+    assert formatted.count("\n") == rows - 1
@@ -12,6 +12,23 @@ class Settings(BaseSettings):
     
     # JWT配置
     SECRET_KEY: str
+    TOKEN_CACHE_MAX_SIZE: int = 10000  # 已验证令牌缓存的最大条目数，0表示关闭缓存
+
+    # 密码哈希配置
+    PASSWORD_HASH_ROUNDS: int = 10  # bcrypt计算强度（2的幂次），调高后旧哈希会在登录时自动升级
+    PASSWORD_HASH_WORKERS: int = 4  # 哈希计算线程数
+    PASSWORD_HASH_CONCURRENCY: int = 32  # 同时排队和计算的哈希任务上限
+    
+    # 限流配置，规则格式为 "次数/second|minute|hour"，次数同时也是允许的突发量
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_STORE: str = "memory"  # memory：进程内；redis：多进程共享
+    RATE_LIMIT_REDIS_URL: str = "redis://127.0.0.1:6379/0"
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False  # 部署在反向代理之后时开启，按X-Forwarded-For识别客户端IP
+    RATE_LIMIT_IP: str = "300/minute"  # 每个IP的全部请求
+    RATE_LIMIT_ROUTE: str = "60/minute"  # 每个用户每个接口
+    RATE_LIMIT_CHAT: str = "20/minute"  # 普通问答会话发送消息
+    RATE_LIMIT_KB: str = "10/minute"  # 知识库问答会话发送消息
+    RATE_LIMIT_KG: str = "10/minute"  # 知识图谱问答会话发送消息
     
     # LLM API配置
     AIHUBMIX_API_KEY: str = "your-api-key"
@@ -23,6 +40,13 @@ class Settings(BaseSettings):
     MILVUS_PORT: str = ""
     MILVUS_DATABASE: str = ""
     MILVUS_COLLECTION: str = ""
+    EMBEDDING_CACHE_DIR: str = "embedding_cache"  # 嵌入向量缓存目录，为空时关闭；与Demo_RAG_v2指向同一目录可共享缓存
+    LEXICAL_INDEX_DIR: str = "lexical_index"  # BM25倒排索引目录，与Demo_RAG_v2入库时的LEXICAL_INDEX_DIR一致
+    HYBRID_SEARCH: bool = True  # 存在倒排索引时向量检索与BM25做倒数排名融合
+    RERANK_MODEL: str = ""  # 交叉编码器重排序模型，为空时关闭重排序，使用相似度阈值过滤
+    RERANK_CANDIDATES: int = 20  # 重排序的候选文档数
+    RERANK_BATCH_SIZE: int = 16
+    RERANK_TIME_BUDGET_MS: int = 300  # 每次重排序的时间预算，超出后未打分的候选保持检索顺序
 
     # Neo4j配置
     NEO4J_URI: str = ""
@@ -31,6 +55,8 @@ class Settings(BaseSettings):
     NEO4J_MAX_CONNECTION_LIFETIME: int = 3600
     NEO4J_MAX_CONNECTION_POOL_SIZE: int = 50
     NEO4J_CONNECTION_TIMEOUT: int = 30
+    GRAPH_SCHEMA_SNAPSHOT: str = "graph_cache/schema_snapshot.json"  # 图谱模式快照，提示词中的数据库模式从这里读取
+    GRAPH_SCHEMA_CHECK_INTERVAL: int = 3600  # 检查图谱计数指纹、按需刷新模式快照的最小间隔（秒）
     
     # 并行处理配置
     TOKENIZERS_PARALLELISM: bool = False  # 控制HuggingFace tokenizers并行性
@@ -4,6 +4,8 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 from config.config_info import settings
+from core.auth.token_cache import VerifiedTokenCache, RevocationList
+import time
 
 # 配置参数
 SECRET_KEY = settings.SECRET_KEY
@@ -12,6 +14,10 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="v1/api/account/token")
 
+# 已验证令牌缓存与吊销列表
+token_cache = VerifiedTokenCache(max_size=settings.TOKEN_CACHE_MAX_SIZE)
+revocation_list = RevocationList(max_token_lifetime=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
 class TokenData(BaseModel):
     user_id: int = None
     phone_number: str = None
@@ -20,16 +26,25 @@ class TokenData(BaseModel):
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """创建JWT访问令牌"""
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+        expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire, "iat": now})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
-    """验证JWT令牌并返回当前用户信息"""
+    """验证JWT令牌并返回当前用户信息
+
+    验证通过的令牌会缓存到过期为止，命中缓存时不再解码；
+    吊销令牌时会同步移除缓存，因此吊销立即生效。
+    """
+    token_data = token_cache.get(token)
+    if token_data is not None:
+        return token_data
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无效的身份凭证",
@@ -42,7 +57,24 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         role_type: int = payload.get("role_type")
         if user_id is None or phone_number is None:
             raise credentials_exception
+        if revocation_list.is_revoked(token, user_id, payload.get("iat")):
+            raise credentials_exception
         token_data = TokenData(user_id=user_id, phone_number=phone_number, role_type=role_type)
     except JWTError:
         raise credentials_exception
+    token_cache.put(token, token_data, payload["exp"], user_id)
     return token_data
+
+def revoke_token(token: str):
+    """吊销单个令牌（登出时调用）"""
+    try:
+        exp = jwt.get_unverified_claims(token).get("exp")
+    except JWTError:
+        return
+    revocation_list.revoke_token(token, exp or time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+    token_cache.discard(token)
+
+def revoke_user_tokens(user_id: int):
+    """吊销某用户此前签发的所有令牌（重置密码时调用）"""
+    revocation_list.revoke_user(user_id)
+    token_cache.discard_user(user_id)
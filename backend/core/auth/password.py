@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+import hmac
+import re
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+import bcrypt
+
+from config.config_info import settings
+
+# bcrypt只使用密码的前72个字节
+BCRYPT_MAX_BYTES = 72
+_LEGACY_MD5_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# 哈希计算在独立线程池中执行（bcrypt计算期间会释放GIL），不阻塞事件循环
+_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash",
+)
+# 限制同时排队和计算的哈希任务数，登录高峰时多余请求在此等待
+_semaphore = None
+# 用户不存在时用于校验的固定哈希，首次使用时按当前强度生成
+_dummy_hash = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.PASSWORD_HASH_CONCURRENCY)
+    return _semaphore
+
+
+def _encode(password: str) -> bytes:
+    return password.encode("utf-8")[:BCRYPT_MAX_BYTES]
+
+
+def md5_password(password: str) -> str:
+    """旧版MD5密码哈希，仅用于校验历史数据"""
+    md5 = hashlib.md5()
+    md5.update(password.encode('utf-8'))
+    return md5.hexdigest()
+
+
+def is_legacy_hash(hashed: str) -> bool:
+    """是否为旧版MD5哈希"""
+    return bool(_LEGACY_MD5_PATTERN.match(hashed or ""))
+
+
+def hash_password_sync(password: str) -> str:
+    """使用bcrypt计算密码哈希（同步，耗时数十到数百毫秒）"""
+    salt = bcrypt.gensalt(rounds=settings.PASSWORD_HASH_ROUNDS)
+    return bcrypt.hashpw(_encode(password), salt).decode("ascii")
+
+
+def verify_password_sync(password: str, hashed: str) -> Tuple[bool, bool]:
+    """校验密码（同步）
+
+    返回 (是否匹配, 是否需要重新哈希)。
+    旧版MD5哈希或强度低于当前配置的bcrypt哈希在校验通过后需要重新哈希。
+    """
+    if not hashed:
+        return False, False
+    if is_legacy_hash(hashed):
+        ok = hmac.compare_digest(md5_password(password), hashed)
+        return ok, ok
+    try:
+        ok = bcrypt.checkpw(_encode(password), hashed.encode("ascii"))
+    except ValueError:
+        return False, False
+    if not ok:
+        return False, False
+    try:
+        rounds = int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        rounds = 0
+    return True, rounds < settings.PASSWORD_HASH_ROUNDS
+
+
+def _verify_dummy_sync(password: str) -> Tuple[bool, bool]:
+    """对固定哈希做一次bcrypt校验，耗时与校验真实用户的密码相同，结果总是不匹配"""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password_sync(secrets.token_hex(16))
+    bcrypt.checkpw(_encode(password), _dummy_hash.encode("ascii"))
+    return False, False
+
+
+async def _run_limited(func, *args):
+    async with _get_semaphore():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, func, *args)
+
+
+async def hash_password(password: str) -> str:
+    """在线程池中计算密码哈希"""
+    return await _run_limited(hash_password_sync, password)
+
+
+async def verify_password(password: str, hashed: str) -> Tuple[bool, bool]:
+    """在线程池中校验密码，返回 (是否匹配, 是否需要重新哈希)"""
+    return await _run_limited(verify_password_sync, password, hashed)
+
+
+async def verify_dummy_password(password: str) -> Tuple[bool, bool]:
+    """用户不存在时调用，同样经过一次bcrypt校验，避免通过响应时间判断账号是否存在；返回 (False, False)"""
+    return await _run_limited(_verify_dummy_sync, password)
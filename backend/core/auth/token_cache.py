@@ -0,0 +1,97 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class VerifiedTokenCache:
+    """已验证令牌缓存
+
+    以令牌字符串为键缓存验证结果，条目保留到令牌的exp为止。
+    超过容量时淘汰最久未使用的条目。
+    只在事件循环线程中使用，因此不加锁。
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        # token -> (token_data, exp, user_id)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, token: str) -> Optional[Any]:
+        """返回缓存的令牌信息，未命中或已过期时返回None"""
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        token_data, exp, _ = entry
+        if exp <= time.time():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return token_data
+
+    def put(self, token: str, token_data: Any, exp: float, user_id: int):
+        """缓存令牌验证结果"""
+        if self.max_size <= 0:
+            return
+        self._entries[token] = (token_data, exp, user_id)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, token: str):
+        """移除指定令牌"""
+        self._entries.pop(token, None)
+
+    def discard_user(self, user_id: int):
+        """移除某用户的所有令牌"""
+        for token in [t for t, entry in self._entries.items() if entry[2] == user_id]:
+            del self._entries[token]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RevocationList:
+    """令牌吊销列表（进程内存）
+
+    - 单个令牌吊销：登出时加入，保留到令牌自身过期
+    - 用户级吊销：重置密码时记录时间，此前签发的令牌全部失效，
+      保留一个令牌最长有效期后自动清理
+    """
+
+    def __init__(self, max_token_lifetime: float):
+        self.max_token_lifetime = max_token_lifetime
+        # token -> exp
+        self._revoked_tokens: Dict[str, float] = {}
+        # user_id -> 吊销时间（秒级时间戳，iat小于该值的令牌失效）
+        self._revoked_users: Dict[int, int] = {}
+
+    def revoke_token(self, token: str, exp: float):
+        self._prune()
+        self._revoked_tokens[token] = exp
+
+    def revoke_user(self, user_id: int, revoked_at: float = None):
+        self._prune()
+        self._revoked_users[user_id] = int(revoked_at if revoked_at is not None else time.time())
+
+    def is_revoked(self, token: str, user_id: int, issued_at: Optional[float]) -> bool:
+        if token in self._revoked_tokens:
+            return True
+        revoked_at = self._revoked_users.get(user_id)
+        if revoked_at is None:
+            return False
+        # 没有iat的旧令牌无法判断签发时间，一律视为已吊销
+        return issued_at is None or issued_at < revoked_at
+
+    def _prune(self):
+        now = time.time()
+        for token in [t for t, exp in self._revoked_tokens.items() if exp <= now]:
+            del self._revoked_tokens[token]
+        for user_id in [u for u, at in self._revoked_users.items() if at + self.max_token_lifetime <= now]:
+            del self._revoked_users[user_id]
+
+    def clear(self):
+        self._revoked_tokens.clear()
+        self._revoked_users.clear()
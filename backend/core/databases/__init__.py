@@ -21,7 +21,7 @@ class User(Base):
     
     user_id = Column(Integer, primary_key=True, autoincrement=True, comment="用户id")
     phone_number = Column(String(20), nullable=False, comment="电话号码")
-    password = Column(String(32), nullable=False, comment="密码")
+    password = Column(String(128), nullable=False, comment="密码哈希（bcrypt，旧数据为MD5）")
     id_number = Column(String(18), nullable=False, comment="身份证号")
     name = Column(String(20), nullable=False, comment="用户名")
     description = Column(String(255), nullable=True, comment="用户简介")
@@ -4,6 +4,8 @@ from config.config_info import settings
 from typing import List, Dict, Any, AsyncGenerator
 from .rag.cypher_generator import CypherGenerator
 from .rag.knowledge_graph import KnowledgeGraph
+from .rag.schema_snapshot import schedule_refresh
+from core.rag import KnowledgeBaseRetriever
 from .rag.prompts import ANSWER_GENERATION_SYSTEM_PROMPT, FORMAT_RESULTS_PROMPT
 import json
 import asyncio
@@ -46,20 +48,31 @@ MUSEUM_KG_SYSTEM_PROMPT = """你是一位专注于文化遗产领域的智能问
 """
 
 class AiHubMixLLM:
-    def __init__(self):
+    def __init__(self, api_key=None, base_url=None, model=None):
+        """
+        :param api_key: 可选的API Key，不指定则使用配置中的值
+        :param base_url: 可选的API地址，可指向任意OpenAI兼容服务（如压测用的本地模拟服务）
+        :param model: 可选的默认模型名称
+        """
+        api_key = api_key or settings.AIHUBMIX_API_KEY
+        base_url = base_url or settings.AIHUBMIX_BASE_URL
         # 初始化同步客户端
         self.client = OpenAI(
-            api_key=settings.AIHUBMIX_API_KEY,
-            base_url=settings.AIHUBMIX_BASE_URL,
+            api_key=api_key,
+            base_url=base_url,
         )
         # 初始化异步客户端
         self.async_client = AsyncOpenAI(
-            api_key=settings.AIHUBMIX_API_KEY,
-            base_url=settings.AIHUBMIX_BASE_URL,
+            api_key=api_key,
+            base_url=base_url,
         )
-        self.model = settings.AIHUBMIX_MODEL
+        self.model = model or settings.AIHUBMIX_MODEL
         # 线程池，用于执行可能阻塞的操作
         self._executor = ThreadPoolExecutor(max_workers=10)
+        # 知识库检索器，可替换为其他实现（如压测用的模拟检索器）
+        self.kb_retriever = KnowledgeBaseRetriever()
+        # 知识图谱连接工厂，每次知识图谱问答调用一次
+        self.kg_factory = KnowledgeGraph
     
     async def get_response(self, messages, model=None):
         """
@@ -127,13 +140,14 @@ class AiHubMixLLM:
             logger.error(f"调用AiHubMix API流式响应失败: {str(e)}")
             yield "抱歉，我暂时无法回答您的问题。请稍后再试。"
     
-    async def get_kb_streaming_response(self, messages, model=None, collection_name=None, top_k=3):
+    async def get_kb_streaming_response(self, messages, model=None, collection_name=None, top_k=3, filters=None):
             """
             获取结合知识库的AiHubMix API流式回复
             :param messages: 消息列表，格式为[{"role": "user", "content": "你好"}, ...]
             :param model: 可选的模型名称，不指定则使用默认模型
             :param collection_name: Milvus集合名称，默认从环境变量获取
             :param top_k: 返回的最相关文档数量
+            :param filters: 元数据过滤条件，如{"museum": "故宫博物院", "dynasty": ["明", "清"]}，检索前先按条件筛选
             :yield: 生成AI回复的每个部分
             """
             try:
@@ -150,13 +164,11 @@ class AiHubMixLLM:
                 
                 # 尝试导入必要的库，提供明确的安装指导
                 try:
-                    import os
-                    from pymilvus import connections
+                    retriever = self.kb_retriever
                     
-                    # 尝试导入LangChain相关库
+                    # 检查LangChain、Milvus相关依赖
                     try:
-                        from langchain_huggingface import HuggingFaceEmbeddings
-                        from langchain_milvus import Milvus
+                        retriever.check_dependencies()
                     except ImportError:
                         installation_guide = """缺少必要的依赖包。请执行以下命令安装:
                         
@@ -168,65 +180,31 @@ class AiHubMixLLM:
                         yield installation_guide
                         return
                     
-                    # 从settings或环境变量获取Milvus配置
-                    from config.config_info import settings
-                    host = settings.MILVUS_HOST
-                    port = settings.MILVUS_PORT
-                    db_name = settings.MILVUS_DATABASE
-                    
-                    # 如果未指定集合名称，则使用配置中的值
-                    if collection_name is None:
-                        collection_name = settings.MILVUS_COLLECTION
+                    loop = asyncio.get_event_loop()
                     
                     # 尝试连接Milvus - 使用线程池避免阻塞
                     try:
-                        # 将可能阻塞的操作移到线程池中执行
-                        def connect_milvus():
-                            connections.connect(
-                                host=host, 
-                                port=port,
-                                db_name=db_name,
-                                timeout=5
-                            )
-                        
-                        # 异步执行连接操作
-                        await asyncio.get_event_loop().run_in_executor(
-                            self._executor, connect_milvus
-                        )
+                        await loop.run_in_executor(self._executor, retriever.connect)
                     except Exception as e:
                         logger.error(f"连接Milvus失败: {str(e)}")
                         yield f"无法连接到Milvus向量数据库，请确保服务已启动。详细错误: {str(e)}"
                         return
                     
-                    # 初始化嵌入模型 - 使用线程池避免阻塞
+                    # 初始化嵌入模型 - 使用线程池避免阻塞，模型只在首次调用时加载
                     try:
-                        # 将模型加载操作移到线程池中执行
-                        def init_embeddings():
-                            model_name = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-                            return HuggingFaceEmbeddings(model_name=model_name)
-                        
-                        # 异步执行模型加载
-                        embeddings = await asyncio.get_event_loop().run_in_executor(
-                            self._executor, init_embeddings
-                        )
+                        await loop.run_in_executor(self._executor, retriever.load_embeddings)
                     except Exception as e:
                         logger.error(f"加载嵌入模型失败: {str(e)}")
                         yield "嵌入模型加载失败，可能需要安装sentence-transformers或检查网络连接。"
                         return
                     
-                    # 初始化向量存储
-                    vectorstore = Milvus(
-                        embedding_function=embeddings,
-                        collection_name=collection_name,
-                        connection_args={"host": host, "port": port, "db_name": db_name},
-                    )
-                    
-                    # 查询相关文档 - 使用线程池避免阻塞
+                    # 查询相关文档 - 使用线程池避免阻塞；开启重排序时检索更宽的候选集
+                    search_k = max(top_k, settings.RERANK_CANDIDATES) if retriever.rerank_enabled else top_k
                     def perform_search():
-                        return vectorstore.similarity_search_with_score(query, k=top_k)
+                        return retriever.search(query, top_k=search_k, collection_name=collection_name, filters=filters)
                     
                     # 异步执行向量搜索
-                    docs_with_scores = await asyncio.get_event_loop().run_in_executor(
+                    docs_with_scores = await loop.run_in_executor(
                         self._executor, perform_search
                     )
                     
@@ -245,12 +223,22 @@ class AiHubMixLLM:
                         doc_key = doc.page_content[:100]
                         # 仅保留未见过的文档
                         if doc_key not in unique_docs:
+                            unique_docs[doc_key] = (doc, score)
                             # 相似度过滤：只保留相似度较高的文档
                             similarity = max(0, min(100, 100 * (1 - score / 100)))
                             if similarity > 60:  # 只保留相似度高于60%的文档
-                                unique_docs[doc_key] = (doc, score)
                                 filtered_docs.append((doc, score))
                     
+                    if retriever.rerank_enabled:
+                        # 交叉编码器重排序取代相似度阈值，失败时退回阈值过滤的结果
+                        try:
+                            filtered_docs = await loop.run_in_executor(
+                                self._executor, retriever.rerank, query, list(unique_docs.values()), top_k
+                            )
+                        except Exception as e:
+                            logger.error(f"重排序失败，使用相似度过滤结果: {str(e)}")
+                            filtered_docs = filtered_docs[:top_k]
+                    
                     # 如果过滤后没有文档，使用原始文档集
                     if not filtered_docs:
                         filtered_docs = docs_with_scores[:1]  # 至少保留最相关的一个
@@ -351,6 +339,10 @@ class AiHubMixLLM:
                 yield "未找到有效的用户问题，请重新提问。"
                 return
             
+            # 图谱计数变化时在后台刷新模式快照，本次请求不等待，之后生成的查询语句使用新的模式
+            schedule_refresh(self.kg_factory, settings.GRAPH_SCHEMA_SNAPSHOT, settings.NEO4J_URI,
+                             settings.GRAPH_SCHEMA_CHECK_INTERVAL)
+
             # 初始化Cypher生成器
             cypher_generator = CypherGenerator(self)
             
@@ -364,7 +356,7 @@ class AiHubMixLLM:
                     return
                     
                 # 初始化知识图谱连接
-                kg = KnowledgeGraph()
+                kg = self.kg_factory()
                 
                 try:
                     # 执行查询 - 可能是阻塞操作，但KnowledgeGraph类已经使用异步实现
@@ -0,0 +1,12 @@
+import os
+
+# Settings在导入时读取环境变量，这里的测试不依赖真实的数据库和密钥
+for _key, _value in {
+    "MYSQL_IP": "127.0.0.1",
+    "MYSQL_PORT": "3306",
+    "MYSQL_BASE": "test",
+    "MYSQL_USER": "test",
+    "MYSQL_PASSWORD": "test",
+    "SECRET_KEY": "test-secret-key",
+}.items():
+    os.environ.setdefault(_key, _value)
@@ -1,6 +1,6 @@
 from typing import List, Dict, Any
 import json
-from .prompts import CYPHER_GENERATION_SYSTEM_PROMPT
+from .prompts import cypher_generation_system_prompt
 import logging
 
 logger = logging.getLogger(__name__)
@@ -93,7 +93,7 @@ RETURN img.img_url
 """
         
         messages = [
-            {"role": "system", "content": CYPHER_GENERATION_SYSTEM_PROMPT + examples},
+            {"role": "system", "content": cypher_generation_system_prompt() + examples},
             {"role": "user", "content": f"请为以下问题生成Cypher查询语句：\n{question}"}
         ]
         
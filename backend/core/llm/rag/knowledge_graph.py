@@ -9,9 +9,14 @@ import asyncio
 logger = logging.getLogger(__name__)
 
 class KnowledgeGraph:
-    def __init__(self):
-        self.driver = None
-        self._connect()
+    def __init__(self, driver=None):
+        """
+        Args:
+            driver: 可选的Neo4j异步驱动（或兼容实现），不指定则按配置创建
+        """
+        self.driver = driver
+        if self.driver is None:
+            self._connect()
         
     def _connect(self):
         """建立数据库连接"""
@@ -1,5 +1,8 @@
-# Neo4j 图数据库模式定义
-SCHEMA = """
+from config.config_info import settings
+from .schema_snapshot import SchemaCache
+
+# 内置的 Neo4j 图数据库模式定义，没有模式快照（schema_snapshot.py）时使用
+DEFAULT_SCHEMA = """
 Node: CulturalRelic {
     name: STRING,
     description: STRING,
@@ -34,8 +37,15 @@ Node: Image {
 }
 """
 
+# Neo4j 图数据库模式定义：优先读取模式快照，快照更新后schema_cache.get()返回新的模式
+schema_cache = SchemaCache(settings.GRAPH_SCHEMA_SNAPSHOT, DEFAULT_SCHEMA)
+SCHEMA = schema_cache.get()
+
 # 基础系统提示信息
-CYPHER_GENERATION_SYSTEM_PROMPT = f"""   
+def cypher_generation_system_prompt(schema=None):
+    """schema为None时使用最新的模式快照"""
+    schema = schema_cache.get() if schema is None else schema
+    return f"""   
 你是一个专业的Neo4j Cypher查询生成器。请根据用户的问题生成对应的Cypher查询语句。
 
 规则：
@@ -49,7 +59,7 @@ CYPHER_GENERATION_SYSTEM_PROMPT = f"""
 8. 对于博物馆查询，考虑中英文名称的变体
 
 数据库模式：
-{SCHEMA}
+{schema}
 
 生成规则：
 1. 根据问题数量生成相应数量的查询语句
@@ -74,6 +84,8 @@ CYPHER_GENERATION_SYSTEM_PROMPT = f"""
 7. 使用 OR 组合多个可能的名称变体
 """
 
+CYPHER_GENERATION_SYSTEM_PROMPT = cypher_generation_system_prompt(SCHEMA)
+
 # 答案生成系统提示
 ANSWER_GENERATION_SYSTEM_PROMPT = """你是一个专业的知识图谱问答助手。请基于知识图谱查询结果，准确回答用户的问题。
 如果查询结果中包含问题的答案，请详细解释。
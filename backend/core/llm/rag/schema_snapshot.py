@@ -0,0 +1,216 @@
+"""
+知识图谱模式（schema）快照
+
+文件格式与 algorithm/Demo_Graph_v2/schema_snapshot.py 相同：保存模式文本、版本号和生成时的指纹。
+- 指纹：各标签节点数和各关系类型关系数的哈希，计数由Neo4j的计数存储直接给出，不扫描节点
+- 指纹变化时才用 apoc.meta.data() 重新生成模式文本，版本号加一
+- prompts.SCHEMA 从快照读取，没有快照时使用内置的模式
+
+知识图谱问答时最多每 GRAPH_SCHEMA_CHECK_INTERVAL 秒在后台任务中检查一次指纹（schedule_refresh），
+请求不等待检查完成，快照更新后由 SchemaCache 读取；也可以手动刷新：
+    python -m core.llm.rag.schema_snapshot
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+NODE_PROPERTIES_QUERY = """
+CALL apoc.meta.data()
+YIELD label, other, elementType, type, property
+WHERE NOT type = "RELATIONSHIP" AND elementType = "node"
+WITH label AS nodeLabels, collect({property:property, type:type}) AS properties
+RETURN {labels: nodeLabels, properties: properties} AS output
+"""
+
+REL_PROPERTIES_QUERY = """
+CALL apoc.meta.data()
+YIELD label, other, elementType, type, property
+WHERE NOT type = "RELATIONSHIP" AND elementType = "relationship"
+WITH label AS nodeLabels, collect({property:property, type:type}) AS properties
+RETURN {type: nodeLabels, properties: properties} AS output
+"""
+
+REL_QUERY = """
+CALL apoc.meta.data()
+YIELD label, other, elementType, type, property
+WHERE type = "RELATIONSHIP" AND elementType = "node"
+RETURN "(:" + label + ")-[:" + property + "]->(:" + toString(other[0]) + ")" AS output
+"""
+
+
+def _quote(name: str) -> str:
+    """标签/关系类型名用反引号包裹（名称中的反引号写两次）"""
+    return "`" + name.replace("`", "``") + "`"
+
+
+def fingerprint(counts: Dict[str, Any]) -> str:
+    """标签/关系类型计数的哈希，计数不变时认为模式不变"""
+    counts = {"labels": counts["labels"], "relationship_types": counts["relationship_types"]}
+    return hashlib.sha1(json.dumps(counts, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def read_snapshot(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        return snapshot if isinstance(snapshot.get("schema"), str) else None
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def load_schema(default: str, path: str) -> str:
+    """快照中的模式文本，没有快照时返回default"""
+    snapshot = read_snapshot(path)
+    return snapshot["schema"] if snapshot else default
+
+
+def write_snapshot(path: str, schema: str, counts: Dict[str, Any], uri: str = "") -> Dict[str, Any]:
+    previous = read_snapshot(path)
+    snapshot = {
+        "version": (previous or {}).get("version", 0) + 1,
+        "fingerprint": fingerprint(counts),
+        "uri": uri,
+        "created_at": time.time(),
+        "labels": counts["labels"],
+        "relationship_types": counts["relationship_types"],
+        "schema": schema,
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    return snapshot
+
+
+async def fetch_counts(kg) -> Dict[str, Dict[str, int]]:
+    """各标签的节点数和各关系类型的关系数
+
+    Args:
+        kg: KnowledgeGraph（或提供异步execute_query的兼容实现）
+    """
+    labels = [r["label"] for r in await kg.execute_query("CALL db.labels() YIELD label RETURN label")]
+    rel_types = [r["relationshipType"] for r in await kg.execute_query(
+        "CALL db.relationshipTypes() YIELD relationshipType RETURN relationshipType")]
+    counts = {"labels": {}, "relationship_types": {}}
+    for label in sorted(labels):
+        rows = await kg.execute_query(f"MATCH (n:{_quote(label)}) RETURN count(n) AS count")
+        counts["labels"][label] = rows[0]["count"]
+    for rel_type in sorted(rel_types):
+        rows = await kg.execute_query(f"MATCH ()-[r:{_quote(rel_type)}]->() RETURN count(r) AS count")
+        counts["relationship_types"][rel_type] = rows[0]["count"]
+    return counts
+
+
+async def fetch_schema(kg) -> str:
+    """用apoc.meta.data()生成模式文本（格式与Demo_Graph_v2的GraphData.get_schema一致）"""
+    node_props = [r["output"] for r in await kg.execute_query(NODE_PROPERTIES_QUERY)]
+    rel_props = [r["output"] for r in await kg.execute_query(REL_PROPERTIES_QUERY)]
+    rels = [r["output"] for r in await kg.execute_query(REL_QUERY)]
+    schema = f"""
+                This is the schema representation of the Neo4j database.
+                Node properties are the following:
+                {node_props}
+                Relationship properties are the following:
+                {rel_props}
+                The relationships are the following
+                {rels}
+                """
+    # 模式文本会拼入提示模板，花括号替换为尖括号
+    return schema.replace("{", "<").replace("}", ">")
+
+
+async def refresh_snapshot(kg, path: str, uri: str = "", force: bool = False) -> Dict[str, Any]:
+    """指纹变化（或force）时重新生成快照，返回当前快照"""
+    counts = await fetch_counts(kg)
+    snapshot = read_snapshot(path)
+    if (not force and snapshot and snapshot.get("fingerprint") == fingerprint(counts)
+            and snapshot.get("uri") == uri):
+        return snapshot
+    logger.info("知识图谱模式指纹变化，重新生成模式快照")
+    snapshot = write_snapshot(path, await fetch_schema(kg), counts, uri)
+    logger.info(f"模式快照版本 {snapshot['version']} 已保存到 {path}")
+    return snapshot
+
+
+_next_check = 0.0
+_refresh_task: Optional[asyncio.Task] = None
+
+
+async def _refresh_in_background(kg_factory: Callable[[], Any], path: str, uri: str) -> None:
+    """用独立的图谱连接刷新快照，完成后关闭连接；出错只记录日志"""
+    kg = None
+    try:
+        kg = kg_factory()
+        await refresh_snapshot(kg, path, uri)
+    except Exception as e:
+        logger.warning(f"刷新知识图谱模式快照失败: {str(e)}")
+    finally:
+        if kg is not None:
+            await kg.close()
+
+
+def schedule_refresh(kg_factory: Callable[[], Any], path: str, uri: str = "",
+                     interval: float = 3600) -> Optional[asyncio.Task]:
+    """距上次检查超过interval秒时创建后台任务检查指纹并按需刷新快照，不等待其完成
+
+    须在事件循环中调用；返回创建的任务，未到检查时间时返回None。
+
+    Args:
+        kg_factory: 创建KnowledgeGraph的函数，后台任务使用自己的连接，不受请求结束时关闭连接的影响
+    """
+    global _next_check, _refresh_task
+    now = time.monotonic()
+    if now < _next_check:
+        return None
+    # 先推迟下次检查时间，并发的请求不会重复检查
+    _next_check = now + interval
+    # 保留任务的引用，避免任务在完成前被回收
+    _refresh_task = asyncio.get_running_loop().create_task(_refresh_in_background(kg_factory, path, uri))
+    return _refresh_task
+
+
+class SchemaCache:
+    """按文件修改时间缓存快照中的模式文本，快照更新后自动重新读取"""
+
+    def __init__(self, path: str, default: str):
+        self.path = path
+        self.default = default
+        self._mtime = None
+        self._schema = default
+
+    def get(self) -> str:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return self.default
+        if mtime != self._mtime:
+            self._schema = load_schema(self.default, self.path)
+            self._mtime = mtime
+        return self._schema
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    from config.config_info import settings
+    from core.llm.rag.knowledge_graph import KnowledgeGraph
+
+    async def main():
+        kg = KnowledgeGraph()
+        try:
+            snapshot = await refresh_snapshot(kg, settings.GRAPH_SCHEMA_SNAPSHOT, settings.NEO4J_URI, force=True)
+            print(f"模式快照版本 {snapshot['version']}，已保存到 {settings.GRAPH_SCHEMA_SNAPSHOT}")
+            print(snapshot["schema"])
+        finally:
+            await kg.close()
+
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+图谱模式快照测试
+
+运行方式（在backend目录下）：
+    python -m pytest core/llm/rag/test_schema_snapshot.py -q
+"""
+import asyncio
+
+from core.llm.rag import schema_snapshot
+from core.llm.rag.schema_snapshot import SchemaCache, load_schema, read_snapshot, refresh_snapshot
+
+
+class FakeKG:
+    """按语句返回标签、关系类型、计数和apoc模式行，并记录apoc调用次数"""
+
+    def __init__(self, nodes=10):
+        self.nodes = nodes
+        self.apoc_calls = 0
+        self.closed = False
+
+    async def execute_query(self, query):
+        if "db.labels" in query:
+            return [{"label": "Museum"}, {"label": "CulturalRelic"}]
+        if "db.relationshipTypes" in query:
+            return [{"relationshipType": "所在博物馆"}]
+        if "count(" in query:
+            return [{"count": self.nodes}]
+        self.apoc_calls += 1
+        return [{"output": {"labels": "CulturalRelic", "properties": [{"property": "name", "type": "STRING"}]}}]
+
+    async def close(self):
+        self.closed = True
+
+
+def run(coro):
+    return asyncio.new_event_loop().run_until_complete(coro)
+
+
+def test_snapshot_regenerated_only_when_fingerprint_changes(tmp_path):
+    path = str(tmp_path / "schema_snapshot.json")
+    kg = FakeKG()
+    assert load_schema("内置模式", path) == "内置模式"
+
+    first = run(refresh_snapshot(kg, path, "bolt://test"))
+    assert first["version"] == 1
+    assert "<'labels': 'CulturalRelic'" in first["schema"] and "{" not in first["schema"]  # 花括号已替换
+    assert kg.apoc_calls == 3
+
+    assert run(refresh_snapshot(kg, path, "bolt://test"))["version"] == 1
+    assert kg.apoc_calls == 3
+
+    kg.nodes = 11
+    assert run(refresh_snapshot(kg, path, "bolt://test"))["version"] == 2
+    assert kg.apoc_calls == 6
+    assert read_snapshot(path)["labels"] == {"CulturalRelic": 11, "Museum": 11}
+
+
+def test_schema_cache_follows_snapshot_file(tmp_path):
+    path = str(tmp_path / "schema_snapshot.json")
+    cache = SchemaCache(path, "内置模式")
+    assert cache.get() == "内置模式"
+    run(refresh_snapshot(FakeKG(), path))
+    assert cache.get() == read_snapshot(path)["schema"]
+
+
+def test_schedule_refresh_runs_in_background_once_per_interval(tmp_path, monkeypatch):
+    path = str(tmp_path / "schema_snapshot.json")
+    monkeypatch.setattr(schema_snapshot, "_next_check", 0.0)
+    kgs = []
+
+    def kg_factory():
+        kgs.append(FakeKG())
+        return kgs[-1]
+
+    async def request():
+        # 调度后立即返回，刷新在后台任务中进行
+        task = schema_snapshot.schedule_refresh(kg_factory, path, interval=3600)
+        assert task is not None and not task.done()
+        assert read_snapshot(path) is None
+        assert schema_snapshot.schedule_refresh(kg_factory, path, interval=3600) is None
+        await task
+
+    run(request())
+    assert read_snapshot(path)["version"] == 1
+    assert len(kgs) == 1 and kgs[0].closed
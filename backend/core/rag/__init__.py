@@ -0,0 +1,151 @@
+import logging
+import os
+from typing import Any, Dict, List, Tuple, Union
+from config.config_info import settings
+
+logger = logging.getLogger(__name__)
+
+# 嵌入缓存、BM25倒排索引、重排序和元数据过滤等检索模块与Demo_RAG_v2共用rag_common，两边读写相同的磁盘文件；
+# rag_common由algorithm目录打包，requirements.txt中以 ../algorithm 安装
+
+# 知识库默认使用的嵌入模型
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+def _squared_l2(query_vector: List[float], vectors: List[List[float]]) -> List[float]:
+    """与Milvus的L2度量一致的平方欧氏距离（用于只被BM25召回的文本块）"""
+    import numpy as np
+    q = np.asarray(query_vector, dtype=np.float32)
+    m = np.asarray(vectors, dtype=np.float32).reshape(-1, q.shape[0])
+    return ((m - q) ** 2).sum(axis=1).tolist()
+
+class KnowledgeBaseRetriever:
+    """知识库检索器
+
+    负责连接Milvus、加载嵌入模型并执行相似度检索。
+    嵌入模型和向量存储对象只初始化一次，后续请求直接复用。
+    所有方法均为同步阻塞调用，调用方应放到线程池中执行。
+    """
+
+    def __init__(self, host: str = None, port: str = None, db_name: str = None,
+                 collection_name: str = None, model_name: str = DEFAULT_EMBEDDING_MODEL):
+        self.host = host if host is not None else settings.MILVUS_HOST
+        self.port = port if port is not None else settings.MILVUS_PORT
+        self.db_name = db_name if db_name is not None else settings.MILVUS_DATABASE
+        self.collection_name = collection_name or settings.MILVUS_COLLECTION
+        self.model_name = model_name
+        self._embeddings = None
+        self._vectorstores = {}
+        self._reranker = None
+
+    def check_dependencies(self):
+        """检查依赖包是否安装，缺失时抛出ImportError"""
+        import pymilvus  # noqa: F401
+        import langchain_huggingface  # noqa: F401
+        import langchain_milvus  # noqa: F401
+
+    def connect(self):
+        """连接Milvus"""
+        from pymilvus import connections
+        connections.connect(
+            host=self.host,
+            port=self.port,
+            db_name=self.db_name,
+            timeout=5
+        )
+
+    def load_embeddings(self):
+        """加载嵌入模型（仅首次调用时加载），配置了缓存目录时包装持久化嵌入缓存"""
+        if self._embeddings is None:
+            from langchain_huggingface import HuggingFaceEmbeddings
+            embeddings = HuggingFaceEmbeddings(model_name=self.model_name)
+            if settings.EMBEDDING_CACHE_DIR:
+                from rag_common.embedding_cache import EmbeddingCache, CachedEmbeddings
+                embeddings = CachedEmbeddings(embeddings, EmbeddingCache(settings.EMBEDDING_CACHE_DIR, self.model_name))
+            self._embeddings = embeddings
+        return self._embeddings
+
+    @property
+    def rerank_enabled(self) -> bool:
+        return bool(settings.RERANK_MODEL)
+
+    def load_reranker(self):
+        """加载交叉编码器重排序模型（仅首次调用时加载）"""
+        if self._reranker is None:
+            from rag_common.reranker import CrossEncoderReranker
+            reranker = CrossEncoderReranker(settings.RERANK_MODEL, batch_size=settings.RERANK_BATCH_SIZE,
+                                            time_budget_ms=settings.RERANK_TIME_BUDGET_MS)
+            reranker.load()
+            self._reranker = reranker
+        return self._reranker
+
+    def rerank(self, query: str, docs_with_scores: List[Tuple[Any, float]], top_n: int) -> List[Tuple[Any, float]]:
+        """
+        交叉编码器重排序，受RERANK_TIME_BUDGET_MS约束
+
+        Returns:
+            List[Tuple[Document, float]]: 前top_n个文档及其L2距离，重排序得分在返回的文档副本的metadata["rerank_score"]
+        """
+        return self.load_reranker().rerank(query, docs_with_scores, top_n)
+
+    def get_vectorstore(self, collection_name: str = None):
+        """获取指定集合的向量存储对象"""
+        collection_name = collection_name or self.collection_name
+        vectorstore = self._vectorstores.get(collection_name)
+        if vectorstore is None:
+            from langchain_milvus import Milvus
+            vectorstore = Milvus(
+                embedding_function=self.load_embeddings(),
+                collection_name=collection_name,
+                connection_args={"host": self.host, "port": self.port, "db_name": self.db_name},
+            )
+            self._vectorstores[collection_name] = vectorstore
+        return vectorstore
+
+    def search(self, query: str, top_k: int = 3, collection_name: str = None,
+               filters: Union[Dict[str, Any], str, None] = None) -> List[Tuple[Any, float]]:
+        """
+        相似度检索
+
+        Args:
+            query: 用户问题
+            top_k: 返回的最相关文档数量
+            collection_name: 集合名称，不指定则使用配置中的集合
+            filters: 元数据过滤条件，{字段: 值或值列表}（字段为museum/dynasty/material/source_file），
+                或Milvus布尔表达式字符串；在向量检索之前过滤
+
+        Returns:
+            List[Tuple[Document, float]]: 文档及其L2距离
+
+        集合存在BM25倒排索引时，向量检索与BM25各取候选后做倒数排名融合，
+        专有名词等精确字符串也能召回，返回的得分仍为L2距离。
+        表达式形式的过滤条件无法用于BM25索引，此时只做向量检索。
+        """
+        from rag_common.metadata_filter import build_filter_expr, metadata_matcher
+        collection_name = collection_name or self.collection_name
+        vectorstore = self.get_vectorstore(collection_name)
+        expr = build_filter_expr(filters)
+        index = self.get_lexical_index(collection_name) if not isinstance(filters, str) else None
+        if not index:
+            return vectorstore.similarity_search_with_score(query, k=top_k, expr=expr)
+
+        from langchain_core.documents import Document
+        from rag_common.lexical_index import fuse_results
+        embeddings = self.load_embeddings()
+        candidates = max(top_k * 4, 20)
+        query_vector = embeddings.embed_query(query)
+        vector_results = vectorstore.similarity_search_with_score_by_vector(query_vector, k=candidates, expr=expr)
+        return fuse_results(
+            query, vector_results, index, top_k,
+            make_document=lambda text, metadata: Document(page_content=text, metadata=metadata),
+            distance_fn=lambda texts: _squared_l2(query_vector, embeddings.embed_documents(texts)),
+            candidates=candidates,
+            doc_filter=metadata_matcher(filters),
+        )
+
+    def get_lexical_index(self, collection_name: str):
+        """获取集合的BM25倒排索引，未开启混合检索或索引不存在时返回None"""
+        if not settings.HYBRID_SEARCH or not settings.LEXICAL_INDEX_DIR:
+            return None
+        from rag_common.lexical_index import get_index
+        return get_index(collection_name, self.host, self.port, settings.LEXICAL_INDEX_DIR)
@@ -0,0 +1,41 @@
+from core.ratelimit.store import (
+    RateLimitRule,
+    BucketState,
+    RateLimitStore,
+    MemoryRateLimitStore,
+    RedisRateLimitStore,
+)
+from core.ratelimit.middleware import RateLimitMiddleware, DatabaseSessionTypeResolver
+
+# 会按会话类型限流的路由（均会调用大模型）
+SESSION_ROUTES = (
+    "/v1/api/chat/sessions/{session_id}/stream",
+    "/v1/api/chat/sessions/{session_id}/messages",
+)
+
+
+def create_rate_limit_store(settings) -> RateLimitStore:
+    """根据配置创建限流存储：memory（默认，进程内）或 redis（多进程/多实例共享）"""
+    if settings.RATE_LIMIT_STORE == "redis":
+        return RedisRateLimitStore.from_url(settings.RATE_LIMIT_REDIS_URL)
+    if settings.RATE_LIMIT_STORE != "memory":
+        raise ValueError(f"未知的限流存储类型: {settings.RATE_LIMIT_STORE}")
+    return MemoryRateLimitStore()
+
+
+def rate_limit_options(settings) -> dict:
+    """由配置生成RateLimitMiddleware的参数"""
+    return {
+        "store": create_rate_limit_store(settings),
+        "ip_rule": RateLimitRule.parse(settings.RATE_LIMIT_IP),
+        "route_rule": RateLimitRule.parse(settings.RATE_LIMIT_ROUTE),
+        "session_type_rules": {
+            1: RateLimitRule.parse(settings.RATE_LIMIT_CHAT),
+            2: RateLimitRule.parse(settings.RATE_LIMIT_KB),
+            3: RateLimitRule.parse(settings.RATE_LIMIT_KG),
+        },
+        "session_routes": SESSION_ROUTES,
+        "session_type_resolver": DatabaseSessionTypeResolver(),
+        "exempt_paths": ("/docs", "/redoc", "/openapi.json"),
+        "trust_forwarded_for": settings.RATE_LIMIT_TRUST_FORWARDED_FOR,
+    }
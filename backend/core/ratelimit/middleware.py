@@ -0,0 +1,213 @@
+import json
+import math
+import logging
+import re
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from core.ratelimit.store import BucketState, MemoryRateLimitStore, RateLimitRule, RateLimitStore
+
+logger = logging.getLogger(__name__)
+
+# 根据会话id查询会话类型，返回None表示未知
+SessionTypeResolver = Callable[[dict, int], Awaitable[Optional[int]]]
+
+# 路径中的数字段（如会话id）归一化为{id}，使同一接口的请求共用一个令牌桶
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def _compile_route(route: str):
+    """将 /chat/sessions/{session_id}/stream 形式的路由模板编译为正则"""
+    pattern = re.sub(r"\\\{(\w+)\\\}", r"(?P<\1>[^/]+)", re.escape(route))
+    return re.compile(pattern)
+
+
+class RateLimitMiddleware:
+    """令牌桶限流中间件（纯ASGI实现，不缓冲流式响应）
+
+    每个请求依次检查：
+    1. 按客户端IP的全局令牌桶
+    2. 按用户（未登录时按IP）和路由的令牌桶；
+       会话类路由（如流式问答）按会话类型使用不同的规则
+
+    所有响应都带有 RateLimit-Limit / RateLimit-Remaining / RateLimit-Reset，
+    取剩余令牌最少的桶；被限流时返回429并附带Retry-After。
+    """
+
+    def __init__(
+        self,
+        app,
+        store: RateLimitStore = None,
+        ip_rule: Optional[RateLimitRule] = None,
+        route_rule: Optional[RateLimitRule] = None,
+        session_type_rules: Optional[Dict[int, RateLimitRule]] = None,
+        session_routes: Tuple[str, ...] = (),
+        session_type_resolver: Optional[SessionTypeResolver] = None,
+        exempt_paths: Tuple[str, ...] = (),
+        trust_forwarded_for: bool = False,
+    ):
+        self.app = app
+        self.store = store or MemoryRateLimitStore()
+        self.ip_rule = ip_rule
+        self.route_rule = route_rule
+        self.session_type_rules = session_type_rules or {}
+        self._session_patterns = [_compile_route(route) for route in session_routes]
+        self.session_type_resolver = session_type_resolver
+        self.exempt_paths = exempt_paths
+        self.trust_forwarded_for = trust_forwarded_for
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"].startswith(self.exempt_paths):
+            await self.app(scope, receive, send)
+            return
+
+        states = await self._consume(scope)
+        if not states:
+            await self.app(scope, receive, send)
+            return
+
+        denied = [s for s in states if not s.allowed]
+        if denied:
+            await self._reject(send, max(denied, key=lambda s: s.retry_after))
+            return
+
+        headers = self._headers(min(states, key=lambda s: s.remaining))
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    async def _consume(self, scope) -> List[BucketState]:
+        client_ip = self._client_ip(scope)
+        user_id = await self._user_id(scope)
+        subject = f"user:{user_id}" if user_id is not None else f"ip:{client_ip}"
+
+        buckets = []
+        if self.ip_rule is not None:
+            buckets.append((f"ip:{client_ip}", self.ip_rule))
+
+        route = _NUMERIC_SEGMENT.sub("/{id}", scope["path"])
+        rule, suffix = self.route_rule, ""
+        session_id = self._match_session_route(scope["path"])
+        if session_id is not None and self.session_type_resolver is not None:
+            session_type = await self._session_type(scope, session_id)
+            if session_type in self.session_type_rules:
+                rule, suffix = self.session_type_rules[session_type], f":type{session_type}"
+        if rule is not None:
+            buckets.append((f"{subject}:{scope['method']} {route}{suffix}", rule))
+
+        states = []
+        for key, rule in buckets:
+            try:
+                states.append(await self.store.consume(key, rule))
+            except Exception as e:
+                # 存储不可用时放行，避免限流组件故障导致服务整体不可用
+                logger.error(f"限流存储访问失败: {str(e)}")
+        return states
+
+    def _client_ip(self, scope) -> str:
+        if self.trust_forwarded_for:
+            for name, value in scope.get("headers", []):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def _user_id(self, scope) -> Optional[int]:
+        """从Bearer令牌中解析用户id，令牌无效时按未登录处理"""
+        from core.auth.jwt import get_current_user
+
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() != "bearer" or not token:
+                    return None
+                try:
+                    return (await get_current_user(token)).user_id
+                except HTTPException:
+                    return None
+        return None
+
+    def _match_session_route(self, path: str) -> Optional[str]:
+        """匹配会话类路由，返回路径中的session_id"""
+        for pattern in self._session_patterns:
+            match = pattern.fullmatch(path)
+            if match:
+                return match.group("session_id")
+        return None
+
+    async def _session_type(self, scope, session_id) -> Optional[int]:
+        if session_id is None:
+            return None
+        try:
+            return await self.session_type_resolver(scope, int(session_id))
+        except Exception as e:
+            logger.error(f"查询会话类型失败: {str(e)}")
+            return None
+
+    @staticmethod
+    def _headers(state: BucketState) -> List[Tuple[bytes, bytes]]:
+        return [
+            (b"ratelimit-limit", str(state.limit).encode()),
+            (b"ratelimit-remaining", str(state.remaining).encode()),
+            (b"ratelimit-reset", str(math.ceil(state.reset_after)).encode()),
+        ]
+
+    async def _reject(self, send, state: BucketState):
+        retry_after = max(1, math.ceil(state.retry_after))
+        body = json.dumps({
+            "code": 429,
+            "message": f"请求过于频繁，请{retry_after}秒后重试",
+            "data": None
+        }, ensure_ascii=False).encode("utf-8")
+        headers = self._headers(state) + [
+            (b"retry-after", str(retry_after).encode()),
+            (b"content-type", b"application/json; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        await send({"type": "http.response.start", "status": 429, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+class DatabaseSessionTypeResolver:
+    """从数据库查询会话类型，并按会话id缓存（会话类型创建后不会改变）
+
+    通过应用的dependency_overrides获取数据库会话，与接口使用同一个数据库。
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._cache: "OrderedDict[int, int]" = OrderedDict()
+
+    async def __call__(self, scope: dict, session_id: int) -> Optional[int]:
+        if session_id in self._cache:
+            self._cache.move_to_end(session_id)
+            return self._cache[session_id]
+
+        from core.databases import get_db
+        from services.chat import get_chat_session_type
+
+        app = scope.get("app")
+        get_session = app.dependency_overrides.get(get_db, get_db) if app is not None else get_db
+
+        def query():
+            db_gen = get_session()
+            db = next(db_gen)
+            try:
+                return get_chat_session_type(db, session_id)
+            finally:
+                db_gen.close()
+
+        session_type = await run_in_threadpool(query)
+        if session_type is not None:
+            self._cache[session_id] = session_type
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return session_type
@@ -0,0 +1,162 @@
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """令牌桶规则：桶容量（允许的突发请求数）和每秒补充的令牌数"""
+    capacity: int
+    refill_rate: float
+
+    @property
+    def window(self) -> float:
+        """令牌桶从空到满所需的秒数"""
+        return self.capacity / self.refill_rate
+
+    @classmethod
+    def parse(cls, text: str) -> "RateLimitRule":
+        """解析形如 "20/minute"、"5/second"、"100/hour" 的规则"""
+        match = re.fullmatch(r"\s*(\d+)\s*/\s*(second|minute|hour|s|m|h)\s*", text or "")
+        if not match:
+            raise ValueError(f"无法解析的限流规则: {text!r}")
+        count = int(match.group(1))
+        period = {"s": 1, "second": 1, "m": 60, "minute": 60, "h": 3600, "hour": 3600}[match.group(2)]
+        if count <= 0:
+            raise ValueError(f"限流规则的次数必须大于0: {text!r}")
+        return cls(capacity=count, refill_rate=count / period)
+
+
+@dataclass(frozen=True)
+class BucketState:
+    """一次取令牌的结果"""
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # 令牌桶补满所需秒数
+    retry_after: float  # 被拒绝时距离下一个可用令牌的秒数，允许时为0
+
+
+def _take(tokens: float, updated_at: float, now: float, rule: RateLimitRule, cost: int):
+    """令牌桶核心计算，返回 (新的令牌数, BucketState)"""
+    elapsed = max(0.0, now - updated_at)
+    tokens = min(float(rule.capacity), tokens + elapsed * rule.refill_rate)
+    if tokens >= cost:
+        tokens -= cost
+        allowed, retry_after = True, 0.0
+    else:
+        allowed, retry_after = False, (cost - tokens) / rule.refill_rate
+    reset_after = (rule.capacity - tokens) / rule.refill_rate
+    return tokens, BucketState(allowed, rule.capacity, int(tokens), reset_after, retry_after)
+
+
+class RateLimitStore:
+    """令牌桶存储接口
+
+    consume需要原子地完成"补充令牌-判断-扣减"，
+    多个后端进程共享限流状态时使用共享存储实现（如RedisRateLimitStore）。
+    """
+
+    async def consume(self, key: str, rule: RateLimitRule, cost: int = 1) -> BucketState:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """进程内令牌桶存储（默认）
+
+    只在事件循环线程中访问且consume内没有await，因此无需加锁。
+    键数量超过max_keys时淘汰最久未访问的桶，被淘汰的键下次访问时视为满桶。
+    """
+
+    def __init__(self, max_keys: int = 100000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        # key -> (tokens, updated_at)
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def consume(self, key: str, rule: RateLimitRule, cost: int = 1) -> BucketState:
+        now = self.clock()
+        tokens, updated_at = self._buckets.get(key, (float(rule.capacity), now))
+        tokens, state = _take(tokens, updated_at, now, rule, cost)
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return state
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# 在Redis中原子地执行令牌桶计算
+# KEYS[1]: 桶键  ARGV: capacity, refill_rate, now, cost, ttl(毫秒)
+# 返回: {allowed, tokens(字符串)}
+REDIS_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local ttl = tonumber(ARGV[5])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+if tokens == nil then
+  tokens = capacity
+  ts = now
+end
+local elapsed = math.max(0, now - ts)
+tokens = math.min(capacity, tokens + elapsed * rate)
+local allowed = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], ttl)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """基于Redis的共享令牌桶存储
+
+    client为redis.asyncio.Redis或兼容对象（需提供async eval方法），
+    令牌桶计算在Lua脚本中原子执行，时间使用各后端进程的系统时钟。
+    """
+
+    def __init__(self, client, prefix: str = "ratelimit:", clock=time.time):
+        self.client = client
+        self.prefix = prefix
+        self.clock = clock
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisRateLimitStore":
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise ImportError("使用Redis限流存储需要安装redis: pip install redis")
+        return cls(redis.from_url(url), **kwargs)
+
+    async def consume(self, key: str, rule: RateLimitRule, cost: int = 1) -> BucketState:
+        now = self.clock()
+        ttl_ms = int(rule.window * 1000) + 1000
+        allowed, tokens = await self.client.eval(
+            REDIS_TOKEN_BUCKET_SCRIPT, 1, self.prefix + key,
+            rule.capacity, rule.refill_rate, now, cost, ttl_ms,
+        )
+        tokens = float(tokens)
+        if int(allowed):
+            retry_after = 0.0
+        else:
+            retry_after = (cost - tokens) / rule.refill_rate
+        reset_after = (rule.capacity - tokens) / rule.refill_rate
+        return BucketState(bool(int(allowed)), rule.capacity, int(tokens), reset_after, retry_after)
+
+    async def close(self):
+        close = getattr(self.client, "aclose", None) or getattr(self.client, "close", None)
+        if close is not None:
+            await close()
@@ -0,0 +1,180 @@
+"""
+限流组件测试
+
+运行方式（在backend目录下）：
+    python -m pytest core/ratelimit/test_ratelimit.py -q
+
+共享存储默认使用本地Redis替身；设置环境变量 RATE_LIMIT_TEST_REDIS_URL
+（如 redis://127.0.0.1:6379/15）后会同时对真实Redis运行相同的用例。
+"""
+import asyncio
+import os
+
+# 中间件解析令牌时会加载Settings，测试环境中不需要真实的数据库配置
+for _name in ("MYSQL_IP", "MYSQL_PORT", "MYSQL_BASE", "MYSQL_USER", "MYSQL_PASSWORD", "SECRET_KEY"):
+    os.environ.setdefault(_name, "test")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.ratelimit.store import (
+    MemoryRateLimitStore,
+    RateLimitRule,
+    RedisRateLimitStore,
+    REDIS_TOKEN_BUCKET_SCRIPT,
+)
+from core.ratelimit.middleware import RateLimitMiddleware
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class LocalRedisStandIn:
+    """Redis替身：以Python实现限流Lua脚本的语义（HMGET/HSET/PEXPIRE）"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.hashes = {}
+        self.expire_at = {}
+
+    async def eval(self, script, numkeys, *keys_and_args):
+        assert script == REDIS_TOKEN_BUCKET_SCRIPT
+        key = keys_and_args[0]
+        capacity, rate, now, cost, ttl = (float(v) for v in keys_and_args[numkeys:])
+        if key in self.expire_at and self.expire_at[key] <= self.clock():
+            self.hashes.pop(key, None)
+        bucket = self.hashes.get(key)
+        if bucket is None:
+            tokens, ts = capacity, now
+        else:
+            tokens, ts = float(bucket["tokens"]), float(bucket["ts"])
+        tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+        allowed = 0
+        if tokens >= cost:
+            tokens -= cost
+            allowed = 1
+        self.hashes[key] = {"tokens": repr(tokens).encode(), "ts": repr(now).encode()}
+        self.expire_at[key] = self.clock() + ttl / 1000
+        return [allowed, repr(tokens).encode()]
+
+
+def _store_factories():
+    factories = {
+        "memory": lambda clock: MemoryRateLimitStore(clock=clock),
+        "redis-stand-in": lambda clock: RedisRateLimitStore(LocalRedisStandIn(clock), clock=clock),
+    }
+    redis_url = os.environ.get("RATE_LIMIT_TEST_REDIS_URL")
+    if redis_url:
+        def real_redis(clock):
+            store = RedisRateLimitStore.from_url(redis_url, prefix=f"ratelimit-test:{id(clock)}:", clock=clock)
+            return store
+        factories["redis"] = real_redis
+    return factories
+
+
+STORE_FACTORIES = _store_factories()
+
+
+@pytest.fixture(params=sorted(STORE_FACTORIES))
+def make_store(request):
+    return STORE_FACTORIES[request.param]
+
+
+def test_rule_parse():
+    rule = RateLimitRule.parse("30/minute")
+    assert rule.capacity == 30
+    assert rule.refill_rate == pytest.approx(0.5)
+    assert rule.window == pytest.approx(60)
+    with pytest.raises(ValueError):
+        RateLimitRule.parse("30 per minute")
+
+
+def test_bucket_burst_then_refill(make_store):
+    clock = FakeClock()
+    store = make_store(clock)
+    rule = RateLimitRule(capacity=3, refill_rate=1.0)
+
+    async def run():
+        states = [await store.consume("k", rule) for _ in range(4)]
+        assert [s.allowed for s in states] == [True, True, True, False]
+        assert [s.remaining for s in states[:3]] == [2, 1, 0]
+        assert states[3].retry_after == pytest.approx(1.0)
+
+        clock.now += 1.5
+        state = await store.consume("k", rule)
+        assert state.allowed
+        assert state.reset_after == pytest.approx(2.5)
+
+        # 不同的键互不影响
+        assert (await store.consume("other", rule)).remaining == 2
+        await store.close()
+
+    asyncio.run(run())
+
+
+def test_memory_store_evicts_oldest_keys():
+    store = MemoryRateLimitStore(max_keys=2)
+    rule = RateLimitRule(capacity=1, refill_rate=0.001)
+
+    async def run():
+        for key in ("a", "b", "c"):
+            await store.consume(key, rule)
+
+    asyncio.run(run())
+    assert len(store) == 2
+
+
+def _build_app(store, session_types):
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"code": 200}
+
+    @app.post("/sessions/{session_id}/stream")
+    async def stream(session_id: int):
+        return {"code": 200, "session_id": session_id}
+
+    async def resolver(scope, session_id):
+        return session_types.get(session_id)
+
+    app.add_middleware(
+        RateLimitMiddleware,
+        store=store,
+        ip_rule=RateLimitRule(capacity=100, refill_rate=0.001),
+        route_rule=RateLimitRule(capacity=3, refill_rate=0.001),
+        session_type_rules={1: RateLimitRule(capacity=2, refill_rate=0.001),
+                            2: RateLimitRule(capacity=1, refill_rate=0.001)},
+        session_routes=("/sessions/{session_id}/stream",),
+        session_type_resolver=resolver,
+    )
+    return app
+
+
+def test_middleware_headers_and_429(make_store):
+    client = TestClient(_build_app(make_store(FakeClock()), {}))
+
+    responses = [client.get("/ping") for _ in range(4)]
+    assert [r.status_code for r in responses] == [200, 200, 200, 429]
+    assert responses[0].headers["RateLimit-Limit"] == "3"
+    assert responses[0].headers["RateLimit-Remaining"] == "2"
+    assert int(responses[0].headers["RateLimit-Reset"]) > 0
+    assert int(responses[3].headers["Retry-After"]) >= 1
+    assert responses[3].json()["code"] == 429
+
+
+def test_middleware_session_type_limits(make_store):
+    client = TestClient(_build_app(make_store(FakeClock()), {10: 1, 20: 2}))
+
+    chat = [client.post("/sessions/10/stream").status_code for _ in range(3)]
+    kb = [client.post("/sessions/20/stream").status_code for _ in range(2)]
+    assert chat == [200, 200, 429]
+    assert kb == [200, 429]
+    # 未知类型的会话按普通路由规则限流
+    assert client.post("/sessions/30/stream").headers["RateLimit-Limit"] == "3"
@@ -1,6 +1,8 @@
 from fastapi import FastAPI, APIRouter
 from starlette.middleware.cors import CORSMiddleware
 from api import AccountRouter,ChatRouter,KnowledgeBaseRouter
+from config.config_info import settings
+from core.ratelimit import RateLimitMiddleware, rate_limit_options
 
 origins = [
     "*"
@@ -14,6 +16,9 @@ import uvicorn
 from pathlib import Path
 
 app = FastAPI()
+# 限流中间件需在CORS之前注册，使429响应同样带有CORS头
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, **rate_limit_options(settings))
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,            # 允许的域名
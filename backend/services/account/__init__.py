@@ -1,19 +1,12 @@
 from sqlalchemy.orm import Session
 from core.databases import User
-import hashlib
 from fastapi import HTTPException, status
 from datetime import timedelta
 from core.auth.jwt import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
-
-# 密码加密函数
-def hash_password(password: str) -> str:
-    """对密码进行MD5加密"""
-    md5 = hashlib.md5()
-    md5.update(password.encode('utf-8'))
-    return md5.hexdigest()
+from core.auth.password import hash_password, verify_dummy_password, verify_password
 
 # 注册服务
-def register_user(db: Session, phone_number: str, password: str, id_number: str, name: str):
+async def register_user(db: Session, phone_number: str, password: str, id_number: str, name: str):
     # 检查电话号码是否已被注册
     existing_user = db.query(User).filter(User.phone_number == phone_number).first()
     if existing_user:
@@ -23,7 +16,7 @@ def register_user(db: Session, phone_number: str, password: str, id_number: str,
         )
     
     # 创建新用户
-    hashed_password = hash_password(password)
+    hashed_password = await hash_password(password)
     new_user = User(
         phone_number=phone_number,
         password=hashed_password,
@@ -47,17 +40,26 @@ def register_user(db: Session, phone_number: str, password: str, id_number: str,
     return user_dict
 
 # 登录服务
-def login_user(db: Session, phone_number: str, password: str):
+async def login_user(db: Session, phone_number: str, password: str):
     # 查找用户
     user = db.query(User).filter(User.phone_number == phone_number).first()
     
-    # 用户不存在或密码错误
-    if not user or user.password != hash_password(password):
+    # 用户不存在或密码错误；用户不存在时同样做一次bcrypt校验，两种情况的响应时间相同
+    if user:
+        matched, needs_rehash = await verify_password(password, user.password)
+    else:
+        matched, needs_rehash = await verify_dummy_password(password)
+    if not matched:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="电话号码或密码不正确"
         )
     
+    # 旧版MD5密码在登录成功后升级为bcrypt
+    if needs_rehash:
+        user.password = await hash_password(password)
+        db.commit()
+    
     # 检查用户状态
     if user.account_status == 0:
         raise HTTPException(
@@ -41,6 +41,11 @@ def get_user_chat_sessions(db: Session, user_id: int):
             detail=f"获取聊天会话失败: {str(e)}"
         )
 
+# 获取会话类型（供限流中间件按会话类型选择规则）
+def get_chat_session_type(db: Session, session_id: int) -> Optional[int]:
+    row = db.query(ChatSession.type).filter(ChatSession.id == session_id).first()
+    return row[0] if row else None
+
 # 获取单个聊天会话及其消息
 def get_chat_session(db: Session, session_id: int, user_id: int):
     try:
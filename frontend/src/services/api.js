@@ -81,6 +81,11 @@ export const accountApi = {
   resetPassword: (data) => {
     return api.post('/account/reset_password', data)
   },
+  
+  // 退出登录（服务端吊销当前令牌）
+  logout: () => {
+    return api.post('/account/logout')
+  },
 };
 
 // 聊天相关API